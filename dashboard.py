@@ -219,7 +219,14 @@ def main():
     if fact_df.empty:
         with st.spinner("Chargement des données d'achats..."):
             fact_df = load_data_from_api("/fact_achats")
-    
+
+    # La table de faits ne porte que les clés : le nom des produits vient de la dimension
+    if not fact_df.empty and 'produit' not in fact_df.columns:
+        if dim_produits_df.empty:
+            dim_produits_df = load_data_from_api("/dim_produits")
+        if not dim_produits_df.empty:
+            fact_df = fact_df.merge(dim_produits_df, on='id_produit', how='left')
+
     if not fact_df.empty:
         # CA par produit
         ca_produit = fact_df.groupby('produit')['montant'].agg(['sum', 'count', 'mean']).reset_index()
@@ -3,16 +3,40 @@ from dotenv import load_dotenv
 load_dotenv()
 os.environ["PREFECT_API_URL"] = os.getenv("PREFECT_API_URL")
 
+import hashlib
+import tempfile
+import time
+from datetime import date, datetime
 from io import BytesIO
 from pathlib import Path
 
+import pandas as pd
+from minio.commonconfig import CopySource
 from prefect import flow, task
+from prefect.task_runners import ThreadPoolTaskRunner
 
 # Gestion des imports pour fonctionner depuis flows/ ou depuis la racine
 try:
-    from .config import BUCKET_BRONZE, BUCKET_SOURCES, get_minio_client
+    from .config import (
+        BUCKET_BRONZE, BUCKET_SOURCES, BRONZE_COPY_MODE, BRONZE_COPY_PART_SIZE,
+        BRONZE_CHUNK_ROWS, BRONZE_FORMAT, BRONZE_MAX_WORKERS, BRONZE_SOURCE_PATTERNS, MINIO_ENDPOINT,
+        MINIO_BRONZE_ENDPOINT, ensure_bucket, get_minio_client
+    )
+    from .partitions import PARTITIONED_ENTITIES, list_partition_objects, next_part_number, part_object_name, partition_prefix
+    from .schemas import SCHEMAS, stream_csv_to_parquet, to_bronze_name
+    from .state import load_state, save_state
 except ImportError:
-    from config import BUCKET_BRONZE, BUCKET_SOURCES, get_minio_client
+    from config import (
+        BUCKET_BRONZE, BUCKET_SOURCES, BRONZE_COPY_MODE, BRONZE_COPY_PART_SIZE,
+        BRONZE_CHUNK_ROWS, BRONZE_FORMAT, BRONZE_MAX_WORKERS, BRONZE_SOURCE_PATTERNS, MINIO_ENDPOINT,
+        MINIO_BRONZE_ENDPOINT, ensure_bucket, get_minio_client
+    )
+    from partitions import PARTITIONED_ENTITIES, list_partition_objects, next_part_number, part_object_name, partition_prefix
+    from schemas import SCHEMAS, stream_csv_to_parquet, to_bronze_name
+    from state import load_state, save_state
+
+MANIFEST_STATE = "bronze_manifest"
+WATERMARK_STATE = "bronze_watermarks"
 
 @task(name="upload_to_sources", retries=2)
 def upload_csv_to_souces(file_path: str, object_name: str) -> str:
@@ -28,71 +52,415 @@ def upload_csv_to_souces(file_path: str, object_name: str) -> str:
     """
 
     client = get_minio_client()
-
-    if not client.bucket_exists(BUCKET_SOURCES):
-        client.make_bucket(BUCKET_SOURCES)
+    ensure_bucket(BUCKET_SOURCES)
 
     client.fput_object(BUCKET_SOURCES, object_name, file_path)
     print(f"Uploaded {object_name} to {BUCKET_SOURCES}")
     return object_name
 
 @task(name="copy_to_bronze", retries=2)
-def copy_to_bronze_layer(object_name: str) -> str:
+def copy_to_bronze_layer(object_name: str, mode: str = BRONZE_COPY_MODE) -> str:
     """
     Copy data from sources to bronze bucket (raw data lake layer).
 
     Args:
         object_name: Name of object to copy
+        mode: 'server' (server-side copy), 'stream' (chunked multipart
+            stream, used for cross-endpoint copies) or 'memory' (full read
+            then re-upload)
 
     Returns:
         Object name in bronze layer
     """
 
-    client = get_minio_client()
+    source_client = get_minio_client()
+    bronze_client = get_minio_client(MINIO_BRONZE_ENDPOINT)
 
-    if not client.bucket_exists(BUCKET_BRONZE):
-        client.make_bucket(BUCKET_BRONZE)
-    
-    response = client.get_object(BUCKET_SOURCES, object_name)
-    data = response.read()
-    response.close()
-    response.release_conn()
-
-    client.put_object(
-        BUCKET_BRONZE,
-        object_name,
-        BytesIO(data),
-        length=len(data)
-    )
-    print(f"Copied {object_name} to {BUCKET_BRONZE}")
+    ensure_bucket(BUCKET_BRONZE, MINIO_BRONZE_ENDPOINT)
+
+    # La copie côté serveur n'est possible que si les deux buckets sont sur le même endpoint
+    if mode == "server" and MINIO_BRONZE_ENDPOINT != MINIO_ENDPOINT:
+        mode = "stream"
+
+    if mode == "server":
+        # CopyObject, ou UploadPartCopy (compose) au-delà de 5 GiB : aucun octet ne transite par le client
+        bronze_client.copy_object(
+            BUCKET_BRONZE,
+            object_name,
+            CopySource(BUCKET_SOURCES, object_name)
+        )
+    elif mode == "stream":
+        # Upload multipart alimenté directement par le flux de lecture : mémoire bornée par part_size
+        size = source_client.stat_object(BUCKET_SOURCES, object_name).size
+        response = source_client.get_object(BUCKET_SOURCES, object_name)
+        try:
+            bronze_client.put_object(
+                BUCKET_BRONZE,
+                object_name,
+                response,
+                length=size,
+                part_size=BRONZE_COPY_PART_SIZE,
+                num_parallel_uploads=1
+            )
+        finally:
+            response.close()
+            response.release_conn()
+    elif mode == "memory":
+        response = source_client.get_object(BUCKET_SOURCES, object_name)
+        data = response.read()
+        response.close()
+        response.release_conn()
+
+        bronze_client.put_object(
+            BUCKET_BRONZE,
+            object_name,
+            BytesIO(data),
+            length=len(data)
+        )
+    else:
+        raise ValueError(f"Unknown bronze copy mode: {mode}")
+
+    print(f"Copied {object_name} to {BUCKET_BRONZE} ({mode})")
     return object_name
 
-@flow(name="Bronze Ingestion Flow")
-def bronze_ingestion_flow(data_dir: str = "./data/sources") -> dict:
+def upload_as_parquet(bronze_client, response, bronze_name: str, entity: str, key: str | None = None,
+                      watermark: int | None = None) -> tuple[int, int | None, int]:
+    """
+    Convert a CSV source stream to typed Parquet (see stream_csv_to_parquet)
+    and upload it to bronze.
+
+    The conversion goes through a local temporary file so that memory stays
+    bounded by the Arrow CSV block size whatever the source size.
+
+    Args:
+        bronze_client: MinIO client of the bronze endpoint
+        response: Source object stream
+        bronze_name: Name of the Parquet object in bronze
+        entity: Entity name, selects the declared schema
+        key: Optional integer column used to keep only rows above watermark
+        watermark: Highest key already landed
+
+    Returns:
+        Tuple (number of rows written, highest key written or None, number
+        of rows skipped because their key is not above watermark)
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        local_path = os.path.join(tmp_dir, "bronze.parquet")
+        rows, max_key, skipped = stream_csv_to_parquet(response, local_path, SCHEMAS[entity], key, watermark)
+        if rows or key is None:
+            bronze_client.fput_object(BUCKET_BRONZE, bronze_name, local_path)
+    return rows, max_key, skipped
+
+@task(name="convert_to_bronze", retries=2)
+def convert_to_bronze_layer(object_name: str, entity: str) -> str:
+    """
+    Convert a CSV object from sources to typed Parquet in bronze bucket.
+
+    Args:
+        object_name: Name of object in MinIO sources bucket
+        entity: Entity name, selects the declared schema
+
+    Returns:
+        Object name in bronze layer
+    """
+
+    source_client = get_minio_client()
+    bronze_client = get_minio_client(MINIO_BRONZE_ENDPOINT)
+
+    ensure_bucket(BUCKET_BRONZE, MINIO_BRONZE_ENDPOINT)
+
+    bronze_name = to_bronze_name(object_name)
+    response = source_client.get_object(BUCKET_SOURCES, object_name)
+    try:
+        rows, _, _ = upload_as_parquet(bronze_client, response, bronze_name, entity)
+    finally:
+        response.close()
+        response.release_conn()
+
+    print(f"Converted {object_name} to {BUCKET_BRONZE}/{bronze_name} ({rows} rows)")
+    return bronze_name
+
+def log_skipped_rows(object_name: str, entity: str, key: str, watermark: int, skipped: int) -> None:
+    """Report the rows of a source object left out because their key is not above the watermark."""
+    if skipped:
+        print(f"Skipped {skipped} {entity} rows of {object_name} with {key} <= {watermark} or invalid "
+              f"(already landed ids: in-place edits are not ingested)")
+
+@task(name="land_bronze_partition", retries=2)
+def land_to_bronze_partition(object_names: list[str], entity: str, key: str, watermark: int,
+                             ingest_date: str | None = None) -> dict:
+    """
+    Append the rows of source objects whose key is above the watermark to
+    a date partition of the bronze bucket (entity/ingest_date=YYYY-MM-DD/part-N).
+
+    Sources are streamed in blocks of BRONZE_CHUNK_ROWS rows, each block
+    with new rows becoming one part object. With BRONZE_FORMAT=parquet each
+    source object becomes one typed Parquet part instead.
+
+    Only keys above the watermark are landed: rows edited in place under
+    an id already landed are not picked up (their count is logged per
+    source object). A corrected achat must come with a new id.
+
+    Args:
+        object_names: Names of objects in MinIO sources bucket, in order
+        entity: Entity name, used as partition root
+        key: Integer column holding the watermark (e.g. id_achat)
+        watermark: Highest key already landed in bronze
+        ingest_date: Partition date (defaults to today)
+
+    Returns:
+        Dictionary with the written part names and the new watermark
+    """
+    source_client = get_minio_client()
+    bronze_client = get_minio_client(MINIO_BRONZE_ENDPOINT)
+
+    ensure_bucket(BUCKET_BRONZE, MINIO_BRONZE_ENDPOINT)
+
+    prefix = partition_prefix(entity, ingest_date or date.today().isoformat())
+    part_number = next_part_number(bronze_client, BUCKET_BRONZE, prefix)
+    new_watermark = watermark
+    parts = []
+    rows = 0
+
+    for object_name in object_names:
+        response = source_client.get_object(BUCKET_SOURCES, object_name)
+        try:
+            if BRONZE_FORMAT == "parquet":
+                part_name = part_object_name(prefix, part_number, "parquet")
+                part_rows, max_key, skipped = upload_as_parquet(
+                    bronze_client, response, part_name, entity, key, watermark
+                )
+                log_skipped_rows(object_name, entity, key, watermark, skipped)
+                if part_rows:
+                    parts.append(part_name)
+                    part_number += 1
+                    rows += part_rows
+                    new_watermark = max(new_watermark, max_key)
+                continue
+
+            skipped = 0
+            for chunk in pd.read_csv(response, chunksize=BRONZE_CHUNK_ROWS):
+                # Les clés nulles ou non numériques ne dépassent jamais le watermark
+                keys = pd.to_numeric(chunk[key], errors='coerce')
+                skipped += int((~(keys > watermark)).sum())
+                chunk = chunk[keys > watermark]
+                if chunk.empty:
+                    continue
+
+                part_csv = BytesIO()
+                chunk.to_csv(part_csv, index=False, encoding='utf-8')
+                part_csv.seek(0)
+
+                part_name = part_object_name(prefix, part_number)
+                bronze_client.put_object(
+                    BUCKET_BRONZE,
+                    part_name,
+                    part_csv,
+                    length=part_csv.getbuffer().nbytes
+                )
+                parts.append(part_name)
+                part_number += 1
+                rows += len(chunk)
+                new_watermark = max(new_watermark, int(keys[keys > watermark].max()))
+            log_skipped_rows(object_name, entity, key, watermark, skipped)
+        finally:
+            response.close()
+            response.release_conn()
+
+    print(f"Landed {rows} new {entity} rows in {len(parts)} part(s) under {BUCKET_BRONZE}/{prefix} ({key} > {watermark})")
+    return {"parts": parts, "watermark": new_watermark}
+
+
+def compute_file_hash(file_path: str, chunk_size: int = 8 * 1024 * 1024) -> str:
+    """
+    Compute the SHA-256 of a local file by chunks.
+
+    Args:
+        file_path: Path to local file
+        chunk_size: Read size in bytes
+
+    Returns:
+        Hex digest of the file content
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_unchanged(file_path: str, entry: dict | None) -> tuple[bool, dict]:
+    """
+    Compare a local file with its ingestion manifest entry.
+
+    The content hash is only computed when size or mtime differ from the
+    manifest, so unchanged files cost a single stat().
+
+    Args:
+        file_path: Path to local file
+        entry: Manifest entry of the previous ingestion, if any
+
+    Returns:
+        Tuple (unchanged, file fingerprint with path, size, mtime and hash)
+    """
+    stat = os.stat(file_path)
+    fingerprint = {"path": file_path, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    if entry is None:
+        return False, fingerprint
+
+    if entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+        fingerprint["sha256"] = entry["sha256"]
+        return True, fingerprint
+
+    fingerprint["sha256"] = compute_file_hash(file_path)
+    return entry["sha256"] == fingerprint["sha256"], fingerprint
+
+
+def discover_source_files(data_dir: str, patterns: dict[str, list[str]]) -> dict[str, list[Path]]:
+    """
+    Find the source files of each entity under data_dir.
+
+    Args:
+        data_dir: Directory containing source CSV files
+        patterns: Glob patterns per entity
+
+    Returns:
+        Sorted file paths per entity
+    """
+    data_path = Path(data_dir)
+    files = {}
+    for entity, entity_patterns in patterns.items():
+        matches = {path for pattern in entity_patterns for path in data_path.glob(pattern) if path.is_file()}
+        files[entity] = sorted(matches)
+    return files
+
+
+@flow(name="Bronze Ingestion Flow", task_runner=ThreadPoolTaskRunner(max_workers=BRONZE_MAX_WORKERS))
+def bronze_ingestion_flow(
+    data_dir: str = "./data/sources",
+    force: bool = False,
+    patterns: dict[str, list[str]] | None = None
+) -> dict:
     """
     Main flow: Upload CSV files to sources and copy to bronze layer.
 
+    Partitioned entities (achats) are not copied as-is: only rows whose key
+    is above the persisted watermark are appended to a new date partition.
+    Every file matching the entity patterns is uploaded then copied
+    concurrently, bounded by BRONZE_MAX_WORKERS threads, each task keeping
+    its own retries. Files whose fingerprint matches the ingestion manifest
+    are skipped; when nothing new landed (no changed file, or only achats
+    files without rows above the watermark) the flow reports status
+    'no-op' so downstream layers can be skipped too.
+
     Args:
         data_dir: Directory containing source CSV files
+        force: Re-ingest every file even if unchanged
+        patterns: Glob patterns per entity (defaults to BRONZE_SOURCE_PATTERNS)
 
     Returns:
-        Dictionary with ingested file names
+        Dictionary with bronze object names per entity, changed files and status
     """
     data_path = Path(data_dir)
+    manifest = load_state(MANIFEST_STATE)
+    files = manifest.setdefault("files", {})
+    watermarks = load_state(WATERMARK_STATE)
+    source_files = discover_source_files(data_dir, patterns or BRONZE_SOURCE_PATTERNS)
+
+    result = {entity: [] for entity in source_files}
+    new_partitions = {}
+    pending = {}
+    landings = {}
+    partitioned_sources = set()
+    start = time.perf_counter()
+
+    for entity, paths in source_files.items():
+        uploads = {}
+        for path in paths:
+            file_path = str(path)
+            object_name = path.relative_to(data_path).as_posix()
+            result[entity].append(to_bronze_name(object_name))
+
+            unchanged, fingerprint = is_unchanged(file_path, files.get(object_name))
+            if unchanged and not force:
+                # Mise à jour du mtime si seul le fichier a été touché
+                files[object_name].update(fingerprint)
+                print(f"Skipped {object_name} (unchanged)")
+                continue
+
+            if "sha256" not in fingerprint:
+                fingerprint["sha256"] = compute_file_hash(file_path)
+
+            upload_future = upload_csv_to_souces.submit(file_path, object_name)
+            if entity in PARTITIONED_ENTITIES:
+                uploads[object_name] = (fingerprint, upload_future)
+                partitioned_sources.add(object_name)
+            else:
+                if BRONZE_FORMAT == "parquet":
+                    landing_future = convert_to_bronze_layer.submit(upload_future, entity)
+                else:
+                    landing_future = copy_to_bronze_layer.submit(upload_future)
+                pending[object_name] = (fingerprint, landing_future)
+
+        if uploads:
+            # Une seule tâche par entité : les numéros de part d'une partition restent séquentiels
+            key = PARTITIONED_ENTITIES[entity]
+            landings[entity] = land_to_bronze_partition.submit(
+                [upload_future for _, upload_future in uploads.values()], entity, key, watermarks.get(entity, 0)
+            )
+            for object_name, (fingerprint, _) in uploads.items():
+                pending[object_name] = (fingerprint, landings[entity])
+
+    sources_client = get_minio_client()
+    changed = []
+    failures = []
+
+    for object_name, (fingerprint, future) in pending.items():
+        try:
+            future.result()
+        except Exception as e:
+            failures.append(object_name)
+            print(f"Failed to ingest {object_name}: {e}")
+            continue
+
+        fingerprint["etag"] = sources_client.stat_object(BUCKET_SOURCES, object_name).etag
+        fingerprint["ingested_at"] = datetime.now().isoformat()
+        files[object_name] = fingerprint
+        changed.append(object_name)
+
+    for entity, landing_future in landings.items():
+        if landing_future.state.is_completed():
+            landing = landing_future.result()
+            new_partitions[entity] = landing["parts"]
+            watermarks[entity] = landing["watermark"]
+
+    # Les fichiers réussis sont enregistrés même en cas d'échec partiel
+    save_state(WATERMARK_STATE, watermarks)
+    save_state(MANIFEST_STATE, manifest)
 
-    clients_file = str(data_path / "clients.csv")
-    achats_file = str(data_path / "achats.csv")
+    if failures:
+        raise RuntimeError(f"Bronze ingestion failed for {len(failures)} file(s): {failures}")
 
-    clients_name = upload_csv_to_souces(clients_file, "clients.csv")
-    achats_name = upload_csv_to_souces(achats_file, "achats.csv")
+    if changed:
+        duration = time.perf_counter() - start
+        total_mb = sum(pending[name][0]["size"] for name in changed) / (1024 * 1024)
+        print(f"Ingested {len(changed)} files ({total_mb:.1f} MB) in {duration:.2f}s ({total_mb / duration:.1f} MB/s)")
 
-    bronze_clients = copy_to_bronze_layer(clients_name)
-    bronze_achats = copy_to_bronze_layer(achats_name)
+    # Les entités partitionnées sont lues en bronze depuis l'ensemble de leurs parts
+    bronze_client = get_minio_client(MINIO_BRONZE_ENDPOINT)
+    for entity in PARTITIONED_ENTITIES:
+        if entity in result:
+            result[entity] = list_partition_objects(bronze_client, BUCKET_BRONZE, entity)
 
-    return {
-        "clients": bronze_clients,
-        "achats": bronze_achats
-    }
+    result["new_partitions"] = new_partitions
+    result["changed"] = changed
+    # Fichier d'achats modifié sans ligne au-dessus du watermark : rien de nouveau pour silver
+    landed = [name for name in changed if name not in partitioned_sources] + [
+        part for parts in new_partitions.values() for part in parts
+    ]
+    result["status"] = "updated" if landed else "no-op"
+    return result
 
 if __name__ == "__main__":
     result = bronze_ingestion_flow()
@@ -1,7 +1,13 @@
 import os
+import threading
+from functools import lru_cache
 
+import certifi
+import pyarrow.fs as pafs
+import urllib3
 from dotenv import load_dotenv
 from minio import Minio
+from minio.error import S3Error
 
 load_dotenv()
 
@@ -10,10 +16,45 @@ MINIO_ENDPOINT = os.getenv("MINIO_ENDPOINT", "localhost:9000")
 MINIO_ACCESS_KEY = os.getenv("MINIO_ACCESS_KEY", "minioadmin")
 MINIO_SECRET_KEY = os.getenv("MINIO_SECRET_KEY", "minioadmin")
 MINIO_SECURE = os.getenv("MINIO_SECURE", "False").lower() == "true"
+# Endpoint hébergeant le bucket bronze (par défaut le même que les sources)
+MINIO_BRONZE_ENDPOINT = os.getenv("MINIO_BRONZE_ENDPOINT", MINIO_ENDPOINT)
+# Taille du pool de connexions HTTP partagé par toutes les tâches d'un processus
+MINIO_POOL_SIZE = int(os.getenv("MINIO_POOL_SIZE", "32"))
+MINIO_TIMEOUT_SECONDS = int(os.getenv("MINIO_TIMEOUT_SECONDS", "300"))
+MINIO_REGION = os.getenv("MINIO_REGION", "us-east-1")
 
 # Database configuration
 SQLITE_DB_PATH = os.getenv("SQLITE_DB_PATH", "./data/database/analytics.db")
 
+# Etat persistant du pipeline (manifeste d'ingestion, watermarks...)
+PIPELINE_STATE_DIR = os.getenv("PIPELINE_STATE_DIR", "./data/state")
+
+# Silver : taille des blocs du mode out-of-core des achats (0 = tout en mémoire)
+SILVER_CHUNK_ROWS = int(os.getenv("SILVER_CHUNK_ROWS", "0"))
+# Transformation silver multi-processus : nombre de shards (hash de la clé, 0 ou 1 = un seul processus)
+# et taille minimale d'un DataFrame pour le répartir
+SILVER_SHARDS = int(os.getenv("SILVER_SHARDS", "0"))
+SILVER_SHARD_MIN_ROWS = int(os.getenv("SILVER_SHARD_MIN_ROWS", "1000000"))
+# Silver : full (reconstruction complète) ou incremental (seules les nouvelles partitions bronze)
+SILVER_MODE = os.getenv("SILVER_MODE", "full").lower()
+# Gold : full (recalcul complet) ou incremental (seuls les jours, semaines, mois et pays touchés par le delta silver)
+GOLD_MODE = os.getenv("GOLD_MODE", "full").lower()
+# Gold incrémental : KPIs recalculés exactement sur toute la table de faits (audit) au lieu d'être mis à jour
+# depuis leur état fusionnable (médiane estimée par un sketch de quantile d'erreur relative QUANTILE_SKETCH_ALPHA)
+KPI_EXACT = os.getenv("KPI_EXACT", "false").lower() == "true"
+# Nombre de segments de l'index de clés silver au-delà duquel ils sont compactés
+KEY_INDEX_MAX_SEGMENTS = int(os.getenv("KEY_INDEX_MAX_SEGMENTS", "32"))
+# Moteur des étapes de nettoyage, déduplication, jointure et agrégation : pandas ou arrow (multi-thread)
+DATAFRAME_ENGINE = os.getenv("DATAFRAME_ENGINE", "pandas").lower()
+# Erreur relative maximale des sketches de quantile (seuil des montants aberrants, médiane des KPIs incrémentaux)
+QUANTILE_SKETCH_ALPHA = float(os.getenv("QUANTILE_SKETCH_ALPHA", "0.01"))
+# Sketches HyperLogLog des clients distincts stockés avec les agrégats gold, et leur erreur relative
+DISTINCT_SKETCHES = os.getenv("DISTINCT_SKETCHES", "false").lower() == "true"
+DISTINCT_SKETCH_ERROR = float(os.getenv("DISTINCT_SKETCH_ERROR", "0.01"))
+# nb_clients exact des semaines et des mois, compté sur les paires (jour, client) distinctes qui croissent avec
+# jours x clients, au lieu de l'estimation par les sketches HyperLogLog des jours fusionnés (erreur DISTINCT_SKETCH_ERROR)
+EXACT_PERIOD_CLIENTS = os.getenv("EXACT_PERIOD_CLIENTS", "false").lower() == "true"
+
 # Prefect configuration
 PREFECT_API_URL = os.getenv("PREFECT_API_URL", "http://localhost:4200/api")
 
@@ -28,16 +69,117 @@ BUCKET_BRONZE = "bronze"
 BUCKET_SILVER = "silver"
 BUCKET_GOLD = "gold"
 
-
-def get_minio_client() -> Minio:
+# Bronze ingestion
+# server : copie côté serveur (CopyObject / UploadPartCopy au-delà de 5 GiB)
+# stream : lecture/écriture en flux par parts (copie entre endpoints différents)
+# memory : lecture complète en mémoire puis ré-upload (ancien comportement)
+BRONZE_COPY_MODE = os.getenv("BRONZE_COPY_MODE", "server").lower()
+BRONZE_COPY_PART_SIZE = int(os.getenv("BRONZE_COPY_PART_SIZE", str(16 * 1024 * 1024)))
+# Motifs glob des fichiers sources par entité, format "entite=motif,motif;entite=motif"
+BRONZE_SOURCE_PATTERNS = {
+    entity.strip(): [pattern.strip() for pattern in patterns.split(",")]
+    for entity, patterns in (
+        item.split("=", 1)
+        for item in os.getenv("BRONZE_SOURCE_PATTERNS", "clients=clients*.csv;achats=achats*.csv").split(";")
+        if item.strip()
+    )
+}
+BRONZE_MAX_WORKERS = int(os.getenv("BRONZE_MAX_WORKERS", "8"))
+# Nombre de lignes lues par bloc lors de l'écriture des partitions bronze
+BRONZE_CHUNK_ROWS = int(os.getenv("BRONZE_CHUNK_ROWS", "500000"))
+# Format de stockage bronze : csv (copie brute) ou parquet (typé, converti à l'atterrissage, cellules invalides à null)
+BRONZE_FORMAT = os.getenv("BRONZE_FORMAT", "csv").lower()
+# Taille des blocs lus par le lecteur CSV Arrow en streaming (borne la mémoire de la conversion)
+BRONZE_CSV_BLOCK_SIZE = int(os.getenv("BRONZE_CSV_BLOCK_SIZE", str(32 * 1024 * 1024)))
+PARQUET_COMPRESSION = os.getenv("PARQUET_COMPRESSION", "zstd")
+# Nombre de lignes par row group Parquet (granularité du filtrage par statistiques)
+PARQUET_ROW_GROUP_SIZE = int(os.getenv("PARQUET_ROW_GROUP_SIZE", "100000"))
+
+# Format des tables silver et gold : parquet (typé, compressé, lecture par colonnes) ou csv
+SILVER_FORMAT = os.getenv("SILVER_FORMAT", "parquet").lower()
+GOLD_FORMAT = os.getenv("GOLD_FORMAT", "parquet").lower()
+
+# Exécuteur des tâches des flows silver et gold : thread, process ou sequential
+TASK_RUNNER = os.getenv("TASK_RUNNER", "thread").lower()
+TASK_RUNNER_MAX_WORKERS = int(os.getenv("TASK_RUNNER_MAX_WORKERS", "4"))
+# Persistance des résultats des tâches silver et gold (reprise, cache entre runs) :
+# DataFrames en Arrow IPC, en mémoire partagée si disponible
+PERSIST_TASK_RESULTS = os.getenv("PERSIST_TASK_RESULTS", "false").lower() == "true"
+RESULT_STORAGE_DIR = os.getenv(
+    "RESULT_STORAGE_DIR",
+    "/dev/shm/pipeline-results" if os.path.isdir("/dev/shm") else os.path.join(PIPELINE_STATE_DIR, "results")
+)
+# Durée de conservation des fichiers de résultats (purgés au démarrage des flows silver et gold)
+RESULT_RETENTION_HOURS = float(os.getenv("RESULT_RETENTION_HOURS", "24"))
+
+
+_known_buckets = set()
+_buckets_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def _create_minio_client(endpoint: str) -> Minio:
+    http_client = urllib3.PoolManager(
+        maxsize=MINIO_POOL_SIZE,
+        timeout=urllib3.util.Timeout(connect=MINIO_TIMEOUT_SECONDS, read=MINIO_TIMEOUT_SECONDS),
+        cert_reqs="CERT_REQUIRED",
+        ca_certs=os.environ.get("SSL_CERT_FILE") or certifi.where(),
+        retries=urllib3.Retry(total=5, backoff_factor=0.2, status_forcelist=[500, 502, 503, 504])
+    )
     return Minio(
-        MINIO_ENDPOINT,
+        endpoint,
         access_key=MINIO_ACCESS_KEY,
         secret_key=MINIO_SECRET_KEY,
-        secure=MINIO_SECURE
+        secure=MINIO_SECURE,
+        http_client=http_client
     )
 
 
+def get_minio_client(endpoint: str = MINIO_ENDPOINT) -> Minio:
+    """Retourne le client MinIO partagé du processus pour cet endpoint (thread-safe)"""
+    return _create_minio_client(endpoint)
+
+
+@lru_cache(maxsize=None)
+def get_arrow_filesystem(endpoint: str = MINIO_ENDPOINT) -> pafs.S3FileSystem:
+    """Retourne le système de fichiers Arrow S3 du processus (lectures Parquet par plages d'octets)"""
+    return pafs.S3FileSystem(
+        access_key=MINIO_ACCESS_KEY,
+        secret_key=MINIO_SECRET_KEY,
+        endpoint_override=endpoint,
+        scheme="https" if MINIO_SECURE else "http",
+        region=MINIO_REGION,
+        request_timeout=MINIO_TIMEOUT_SECONDS,
+        connect_timeout=MINIO_TIMEOUT_SECONDS
+    )
+
+
+def bucket_exists(bucket: str, endpoint: str = MINIO_ENDPOINT) -> bool:
+    """Vérifie l'existence d'un bucket ; seul un résultat positif est mémorisé"""
+    if (endpoint, bucket) in _known_buckets:
+        return True
+    if get_minio_client(endpoint).bucket_exists(bucket):
+        _known_buckets.add((endpoint, bucket))
+        return True
+    return False
+
+
+def ensure_bucket(bucket: str, endpoint: str = MINIO_ENDPOINT) -> None:
+    """Crée le bucket s'il n'existe pas, une seule fois par processus"""
+    if (endpoint, bucket) in _known_buckets:
+        return
+    with _buckets_lock:
+        if bucket_exists(bucket, endpoint):
+            return
+        try:
+            get_minio_client(endpoint).make_bucket(bucket)
+        except S3Error as e:
+            # Bucket créé entre-temps par un autre processus
+            if e.code not in ("BucketAlreadyOwnedByYou", "BucketAlreadyExists"):
+                raise
+        _known_buckets.add((endpoint, bucket))
+
+
 def get_mongodb_client():
     """Retourne un client MongoDB"""
     from pymongo import MongoClient
@@ -46,6 +188,30 @@ def get_mongodb_client():
     return MongoClient(MONGODB_URI)
 
 
+def get_task_runner(kind: str = TASK_RUNNER, max_workers: int = TASK_RUNNER_MAX_WORKERS):
+    """
+    Return the Prefect task runner of the silver and gold flows.
+
+    Args:
+        kind: thread (ThreadPoolTaskRunner: pandas and Arrow release the GIL
+            in their kernels, tasks share the DataFrames), process
+            (ProcessPoolTaskRunner: DataFrames are pickled between tasks)
+            or sequential (one worker, tasks run one after the other)
+        max_workers: Maximum number of tasks running at the same time
+
+    Returns:
+        Task runner instance
+    """
+    from prefect.task_runners import ProcessPoolTaskRunner, ThreadPoolTaskRunner
+    if kind == "thread":
+        return ThreadPoolTaskRunner(max_workers=max_workers)
+    if kind == "process":
+        return ProcessPoolTaskRunner(max_workers=max_workers)
+    if kind == "sequential":
+        return ThreadPoolTaskRunner(max_workers=1)
+    raise ValueError(f"Unknown task runner '{kind}' (expected thread, process or sequential)")
+
+
 def configure_prefect() -> None:
     os.environ["PREFECT_API_URL"] = PREFECT_API_URL
 
@@ -0,0 +1,71 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Format des dates sources et silver
+DATE_FORMAT = "%Y-%m-%d"
+# Colonnes de dates des entités
+DATE_COLUMNS = ("date_achat", "date_inscription")
+
+
+class DateCodec:
+    """
+    Dictionary-encoded date parser.
+
+    A date column holds few distinct values (about a thousand days for
+    millions of achats): each row is mapped to an integer code with
+    pd.factorize, only the distinct values are parsed, and the parsed
+    dates are gathered back by code. Parsed values are cached for the
+    lifetime of the codec, so a value parsed by silver is not parsed
+    again by gold in the same process. Values are parsed with
+    DATE_FORMAT only and truncated to the day: values that do not match
+    it become NaT, and are rejected by the date rules of silver.
+    """
+
+    def __init__(self, date_format: str = DATE_FORMAT):
+        self.date_format = date_format
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def _parse_uniques(self, uniques: np.ndarray) -> np.ndarray:
+        missing = [value for value in uniques if value not in self._cache]
+        if missing:
+            parsed = pd.to_datetime(pd.Series(missing, dtype=object), format=self.date_format, errors='coerce')
+            parsed = parsed.dt.normalize().to_numpy(dtype='datetime64[ns]')
+            with self._lock:
+                self._cache.update(zip(missing, parsed))
+        return np.array([self._cache[value] for value in uniques], dtype='datetime64[ns]')
+
+    def parse(self, values: pd.Series) -> pd.Series:
+        """
+        Parse a column of dates (strings or date objects) to datetime64.
+
+        Args:
+            values: Column to parse (returned as is if already datetime64)
+
+        Returns:
+            datetime64 column with the same index, NaT where unparseable
+        """
+        if pd.api.types.is_datetime64_any_dtype(values):
+            return values
+        codes, uniques = pd.factorize(values)
+        # Le code -1 (valeur manquante) désigne le NaT ajouté en fin de tableau
+        dates = np.append(self._parse_uniques(np.asarray(uniques, dtype=object)), np.datetime64('NaT', 'ns')).take(codes)
+        return pd.Series(dates, index=values.index, name=values.name)
+
+
+DATE_CODEC = DateCodec()
+
+
+def parse_dates(values: pd.Series) -> pd.Series:
+    """Parse a date column with the shared codec."""
+    return DATE_CODEC.parse(values)
+
+
+def parse_date_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Parse the known date columns of a DataFrame in place and return it."""
+    for column in DATE_COLUMNS:
+        if column in df.columns:
+            df[column] = parse_dates(df[column])
+    return df
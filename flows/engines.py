@@ -0,0 +1,262 @@
+from functools import reduce
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Gestion des imports pour fonctionner depuis flows/ ou depuis la racine
+try:
+    from .config import DATAFRAME_ENGINE
+except ImportError:
+    from config import DATAFRAME_ENGINE
+
+# Fonctions d'agrégation communes aux moteurs : nom pandas -> nom Arrow
+AGGREGATIONS = {"sum": "sum", "mean": "mean", "count": "count", "nunique": "count_distinct", "min": "min", "max": "max"}
+
+ROW_COLUMN = "__row"
+RIGHT_ROW_COLUMN = "__right_row"
+
+
+# Index dense (tableau de positions indexé par la clé) tant que l'étendue des clés reste sous ce multiple du nombre de clés
+DENSE_INDEX_MAX_SPAN_RATIO = 4
+
+
+def lookup_positions(keys: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """
+    Position of each value in keys (unique), -1 when absent.
+
+    Integer keys spanning at most DENSE_INDEX_MAX_SPAN_RATIO x their
+    count (dense ids) get a position array indexed by key - min, other
+    integer keys a sorted copy searched with binary search, other keys a
+    hash index.
+
+    Args:
+        keys: Unique keys (dimension)
+        values: Keys to look up (facts)
+
+    Returns:
+        int64 array of positions in keys, aligned on values
+    """
+    if len(keys) == 0:
+        return np.full(len(values), -1, dtype=np.int64)
+    if not (np.issubdtype(keys.dtype, np.integer) and np.issubdtype(values.dtype, np.integer)):
+        return pd.Index(keys).get_indexer(values).astype(np.int64)
+
+    keys = keys.astype(np.int64, copy=False)
+    values = values.astype(np.int64, copy=False)
+    low, high = int(keys.min()), int(keys.max())
+    if high - low + 1 <= DENSE_INDEX_MAX_SPAN_RATIO * len(keys):
+        index = np.full(high - low + 1, -1, dtype=np.int64)
+        index[keys - low] = np.arange(len(keys))
+        offsets = values - low
+        in_range = (values >= low) & (values <= high)
+        return np.where(in_range, index[np.where(in_range, offsets, 0)], -1)
+
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    found = np.minimum(np.searchsorted(sorted_keys, values), len(keys) - 1)
+    return np.where(sorted_keys[found] == values, order[found], -1)
+
+
+class PandasEngine:
+    """
+    Reference engine: the clean, dedup, join and groupby steps of silver
+    and gold, run with pandas on a single core.
+
+    Every engine takes and returns pandas DataFrames, so the Prefect tasks
+    exchange the same objects whatever the engine. Results have the
+    columns, row order and dtypes of this engine.
+    """
+
+    name = "pandas"
+
+    def dropna(self, df: pd.DataFrame, subset: list[str]) -> pd.DataFrame:
+        """Drop the rows with a missing value in one of the subset columns."""
+        return df.dropna(subset=subset)
+
+    def drop_duplicates(self, df: pd.DataFrame, subset: list[str], keep: str = 'first') -> pd.DataFrame:
+        """Keep the first (or last) row of each subset key, in the original order."""
+        return df.drop_duplicates(subset=subset, keep=keep)
+
+    def null_mask(self, df: pd.DataFrame, subset: list[str]) -> np.ndarray:
+        """Mask of the rows with a missing value in one of the subset columns."""
+        return df[subset].isna().any(axis=1).to_numpy()
+
+    def duplicated(self, df: pd.DataFrame, subset: list[str], keep: str = 'first') -> np.ndarray:
+        """Mask of the rows dropped by drop_duplicates."""
+        return df.duplicated(subset=subset, keep=keep).to_numpy()
+
+    def left_join(self, left: pd.DataFrame, right: pd.DataFrame, on: str,
+                  suffixes: tuple[str, str] = ('', '_y')) -> pd.DataFrame:
+        """Left join keeping the order of the left rows."""
+        return left.merge(right, on=on, how='left', suffixes=suffixes)
+
+    def lookup_join(self, left: pd.DataFrame, right: pd.DataFrame, on: str, columns: list[str] | None = None,
+                    suffixes: tuple[str, str] = ('', '_y')) -> pd.DataFrame:
+        """
+        Left join on a unique key of right (dimension lookup): the position
+        of each left key in right is looked up once (see lookup_positions),
+        then each right column is gathered with an array take. Nothing is
+        hashed on the left side and only the requested columns are copied.
+
+        The result is the one of left_join restricted to columns: left
+        rows in their order, unmatched rows filled with missing values
+        (integer columns become floating). Falls back to left_join when
+        right has duplicate keys or left has missing keys. Every engine
+        runs it this way: there is no hash table to build in parallel.
+
+        Args:
+            left: Fact rows
+            right: Dimension rows, unique on on
+            on: Key column
+            columns: Right columns to add (all but the key if None)
+            suffixes: Suffixes of the left and right columns present on both sides
+
+        Returns:
+            Joined DataFrame
+        """
+        if columns is None:
+            columns = [name for name in right.columns if name != on]
+        if not right[on].is_unique or left[on].hasnans:
+            return self.left_join(left, right[[on] + columns], on=on, suffixes=suffixes)
+
+        positions = lookup_positions(right[on].to_numpy(), left[on].to_numpy())
+        joined = left.reset_index(drop=True)
+        if suffixes[0]:
+            joined = joined.rename(columns={name: f"{name}{suffixes[0]}" for name in columns if name in left.columns})
+        return joined.assign(**{
+            f"{name}{suffixes[1]}" if name in left.columns else name: right[name].array.take(positions, allow_fill=True)
+            for name in columns
+        })
+
+    def group_aggregate(self, df: pd.DataFrame, keys: list[str], aggregations: dict[str, tuple[str, str]]) -> pd.DataFrame:
+        """
+        Group by keys and aggregate.
+
+        Args:
+            df: DataFrame to aggregate
+            keys: Grouping columns (rows with a missing key are dropped)
+            aggregations: Output column -> (input column, function among AGGREGATIONS)
+
+        Returns:
+            DataFrame with the keys then the aggregations, sorted by keys
+        """
+        return df.groupby(keys, observed=True, sort=True).agg(**aggregations).reset_index()
+
+
+class ArrowEngine(PandasEngine):
+    """
+    Columnar engine running the same steps with pyarrow.compute and the
+    Acero hash join / hash aggregate, which use every core of the Arrow
+    CPU pool (pa.set_cpu_count). Frames are converted to Arrow tables
+    and back with their original dtypes. Sums and means may differ from
+    pandas in the last digits: pandas uses a compensated summation, Arrow
+    sums partial results per thread.
+    """
+
+    name = "arrow"
+
+    @staticmethod
+    def _to_table(df: pd.DataFrame, columns: list[str] | None = None) -> pa.Table:
+        table = pa.Table.from_pandas(df if columns is None else df[columns], preserve_index=False)
+        # Les jointures Acero ne prennent pas de colonnes dictionnaire (catégories)
+        return pa.table({
+            name: pc.dictionary_decode(column) if pa.types.is_dictionary(column.type) else column
+            for name, column in zip(table.column_names, table.columns)
+        })
+
+    @staticmethod
+    def _to_pandas(table: pa.Table, dtypes: dict) -> pd.DataFrame:
+        df = table.to_pandas(date_as_object=False)
+        return df.astype({name: dtype for name, dtype in dtypes.items() if name in df.columns and df[name].dtype != dtype})
+
+    @staticmethod
+    def _with_int64_key(table: pa.Table, key: str) -> pa.Table:
+        # Acero exige des clés de même type des deux côtés : compact_dtypes réduit chaque côté à sa propre largeur
+        column = table.column(key)
+        if pa.types.is_integer(column.type) and column.type != pa.int64():
+            table = table.set_column(table.schema.get_field_index(key), key, column.cast(pa.int64()))
+        return table
+
+    @staticmethod
+    def _all_valid(table: pa.Table) -> pa.ChunkedArray:
+        return reduce(pc.and_kleene, [pc.is_valid(column) for column in table.columns])
+
+    def dropna(self, df: pd.DataFrame, subset: list[str]) -> pd.DataFrame:
+        return df[~self.null_mask(df, subset)]
+
+    def drop_duplicates(self, df: pd.DataFrame, subset: list[str], keep: str = 'first') -> pd.DataFrame:
+        return df[~self.duplicated(df, subset, keep)]
+
+    def null_mask(self, df: pd.DataFrame, subset: list[str]) -> np.ndarray:
+        return ~self._all_valid(self._to_table(df, subset)).to_numpy(zero_copy_only=False)
+
+    def duplicated(self, df: pd.DataFrame, subset: list[str], keep: str = 'first') -> np.ndarray:
+        table = self._to_table(df, subset).append_column(ROW_COLUMN, pa.array(np.arange(len(df))))
+        function = "min" if keep == 'first' else "max"
+        rows = table.group_by(subset, use_threads=True).aggregate([(ROW_COLUMN, function)])
+        mask = np.ones(len(df), dtype=bool)
+        mask[rows.column(f"{ROW_COLUMN}_{function}").to_numpy()] = False
+        return mask
+
+    def left_join(self, left: pd.DataFrame, right: pd.DataFrame, on: str,
+                  suffixes: tuple[str, str] = ('', '_y')) -> pd.DataFrame:
+        left_table = self._with_int64_key(self._to_table(left), on).append_column(ROW_COLUMN, pa.array(np.arange(len(left))))
+        right_table = self._with_int64_key(self._to_table(right), on).append_column(
+            RIGHT_ROW_COLUMN, pa.array(np.arange(len(right)))
+        )
+        joined = left_table.join(
+            right_table, keys=on, join_type="left outer",
+            left_suffix=suffixes[0] or None, right_suffix=suffixes[1] or None, use_threads=True
+        )
+        # Ordre pandas : lignes de gauche, puis lignes de droite correspondantes dans leur ordre
+        joined = joined.sort_by([(ROW_COLUMN, "ascending"), (RIGHT_ROW_COLUMN, "ascending")])
+
+        columns = list(left.columns) + [
+            f"{name}{suffixes[1]}" if name in left.columns else name for name in right.columns if name != on
+        ]
+        joined = joined.select(columns)
+        dtypes = left.dtypes.to_dict()
+        for name, dtype in right.dtypes.items():
+            output_name = f"{name}{suffixes[1]}" if name in left.columns and name != on else name
+            # Lignes sans correspondance : une colonne entière de droite devient flottante, comme avec pandas
+            if output_name not in dtypes and not (pd.api.types.is_integer_dtype(dtype) and joined.column(output_name).null_count):
+                dtypes[output_name] = dtype
+        return self._to_pandas(joined, dtypes)
+
+    def group_aggregate(self, df: pd.DataFrame, keys: list[str], aggregations: dict[str, tuple[str, str]]) -> pd.DataFrame:
+        columns = list(dict.fromkeys(keys + [column for column, _ in aggregations.values()]))
+        table = self._to_table(df, columns)
+        table = table.filter(self._all_valid(table.select(keys)))
+
+        result = table.group_by(keys, use_threads=True).aggregate([
+            (column, AGGREGATIONS[function]) for column, function in aggregations.values()
+        ])
+        result = result.sort_by([(key, "ascending") for key in keys])
+        result = result.select(keys + [f"{column}_{AGGREGATIONS[function]}" for column, function in aggregations.values()])
+        result = result.rename_columns(keys + list(aggregations))
+
+        expected = PandasEngine.group_aggregate(self, df.iloc[:0], keys, aggregations)
+        return self._to_pandas(result, expected.dtypes.to_dict())
+
+
+ENGINES = {engine.name: engine for engine in (PandasEngine(), ArrowEngine())}
+
+_default_engine = DATAFRAME_ENGINE
+
+
+def set_default_engine(name: str) -> None:
+    """Select the engine returned by get_engine() (used by the parity script)."""
+    global _default_engine
+    if name not in ENGINES:
+        raise ValueError(f"Unknown dataframe engine '{name}' (expected one of {sorted(ENGINES)})")
+    _default_engine = name
+
+
+def get_engine(name: str | None = None) -> PandasEngine:
+    """Return the engine named name, DATAFRAME_ENGINE by default."""
+    name = name or _default_engine
+    if name not in ENGINES:
+        raise ValueError(f"Unknown dataframe engine '{name}' (expected one of {sorted(ENGINES)})")
+    return ENGINES[name]
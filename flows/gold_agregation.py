@@ -3,73 +3,391 @@ from dotenv import load_dotenv
 load_dotenv()
 os.environ["PREFECT_API_URL"] = os.getenv("PREFECT_API_URL")
 
-from io import BytesIO
 from pathlib import Path
 
 from prefect import flow, task
 from prefect.logging import get_run_logger
 
+import numpy as np
 import pandas as pd
 
 # Gestion des imports pour fonctionner depuis flows/ ou depuis la racine
 try:
-    from .config import BUCKET_SILVER, BUCKET_GOLD, get_minio_client
+    from .config import (
+        BUCKET_SILVER, BUCKET_GOLD, DISTINCT_SKETCH_ERROR, DISTINCT_SKETCHES, EXACT_PERIOD_CLIENTS, GOLD_FORMAT, GOLD_MODE,
+        KPI_EXACT, bucket_exists, ensure_bucket, get_minio_client, get_task_runner
+    )
+    from .dates import parse_date_columns, parse_dates
+    from .engines import get_engine
+    from .key_registry import KeyRegistry
+    from .kpi_state import KpiState
+    from .schemas import SCHEMAS, compact_dtypes, gold_object_name, memory_mb, read_table, serialize_table, silver_object_name
+    from .sketches import HyperLogLog
+    from .results import purge_results, result_settings
+    from .partitions import (
+        ENTITY_KEYS, list_month_partition_objects, list_partition_objects, month_partition_prefix, part_object_name,
+        partition_month
+    )
+    from .state import load_state, save_state
 except ImportError:
-    from config import BUCKET_SILVER, BUCKET_GOLD, get_minio_client
+    from config import (
+        BUCKET_SILVER, BUCKET_GOLD, DISTINCT_SKETCH_ERROR, DISTINCT_SKETCHES, EXACT_PERIOD_CLIENTS, GOLD_FORMAT, GOLD_MODE,
+        KPI_EXACT, bucket_exists, ensure_bucket, get_minio_client, get_task_runner
+    )
+    from dates import parse_date_columns, parse_dates
+    from engines import get_engine
+    from key_registry import KeyRegistry
+    from kpi_state import KpiState
+    from schemas import SCHEMAS, compact_dtypes, gold_object_name, memory_mb, read_table, serialize_table, silver_object_name
+    from sketches import HyperLogLog
+    from results import purge_results, result_settings
+    from partitions import (
+        ENTITY_KEYS, list_month_partition_objects, list_partition_objects, month_partition_prefix, part_object_name,
+        partition_month
+    )
+    from state import load_state, save_state
 
 
 @task(name="read_from_silver", retries=2)
-def read_from_silver_layer(object_name: str) -> pd.DataFrame:
+def read_from_silver_layer(object_name: str, columns: list[str] | None = None,
+                           filters: list[tuple] | None = None) -> pd.DataFrame:
     """
-    Read CSV data from silver bucket.
+    Read Parquet or CSV data from silver bucket, with its date columns
+    parsed once by the shared date codec and compact dtypes (see
+    compact_dtypes).
 
     Args:
         object_name: Name of object in MinIO silver bucket
+        columns: Columns to read, pushed down to Parquet files (all if None)
+        filters: (column, op, value) row filters, pushed down to Parquet
+            row groups (see read_table)
 
     Returns:
         DataFrame with the data
     """
     logger = get_run_logger()
-    client = get_minio_client()
 
-    if not client.bucket_exists(BUCKET_SILVER):
+    if not bucket_exists(BUCKET_SILVER):
         logger.error(f"Bucket {BUCKET_SILVER} does not exist")
         raise ValueError(f"Bucket {BUCKET_SILVER} does not exist")
 
-    response = client.get_object(BUCKET_SILVER, object_name)
-    data = response.read()
-    response.close()
-    response.release_conn()
-
-    df = pd.read_csv(BytesIO(data))
-    logger.info(f"Read {object_name} from {BUCKET_SILVER} ({len(df)} rows)")
+    df = compact_dtypes(parse_date_columns(read_table(BUCKET_SILVER, object_name, columns, filters)))
+    logger.info(f"Read {object_name} from {BUCKET_SILVER} ({len(df)} rows, {memory_mb(df):.2f} MB)")
     return df
 
 
+@task(name="read_silver_entity", retries=2)
+def read_silver_entity(entity: str, columns: list[str] | None = None, filters: list[tuple] | None = None,
+                       part_names: list[str] | None = None) -> pd.DataFrame:
+    """
+    Read a silver entity: its incremental partitions when they exist (the
+    latest version of each key wins), its single object otherwise.
+
+    Args:
+        entity: Entity name
+        columns: Columns to read (the entity key is always read with
+            partitions, to keep the latest version of each key)
+        filters: (column, op, value) row filters (see read_table)
+        part_names: Partitions to read, oldest first (every partition if None)
+
+    Returns:
+        DataFrame with the data
+    """
+    if part_names is None:
+        part_names = list_partition_objects(get_minio_client(), BUCKET_SILVER, entity)
+        if not part_names:
+            return read_from_silver_layer(silver_object_name(entity), columns, filters)
+
+    key = ENTITY_KEYS[entity]
+    if columns is not None and key not in columns:
+        columns = [key] + list(columns)
+    df = pd.concat([read_from_silver_layer(part_name, columns, filters) for part_name in part_names], ignore_index=True)
+    # Les catégories des parties diffèrent : la concaténation les repasse en chaînes
+    return compact_dtypes(get_engine().drop_duplicates(df, [key], keep='last').reset_index(drop=True))
+
+
+# Agrégats de ventes communs aux agrégations temporelles et par pays
+SALES_AGGREGATIONS = {
+    'ca_total': ('montant', 'sum'),
+    'panier_moyen': ('montant', 'mean'),
+    'nb_achats': ('montant', 'count'),
+    'nb_clients': ('id_client', 'nunique')
+}
+
+# Colonne des sketches HyperLogLog des clients distincts (DISTINCT_SKETCHES)
+SKETCH_COLUMN = 'clients_hll'
+
+# Colonnes de périodes de la table de faits et leur fréquence
+PERIOD_COLUMNS = {'annee_mois': 'M', 'annee_semaine': 'W'}
+
+# Colonnes clients lues par les agrégats gold dans la table de faits (les autres restent dans dim_clients)
+FACT_CLIENT_COLUMNS = ['pays']
+
+
+def aggregate_by_period(fact_table: pd.DataFrame, period_column: str, aggregations: dict) -> pd.DataFrame:
+    """
+    Aggregate the fact table by a Period column, grouped on the integer
+    ordinals of the periods (a key type every engine supports).
+
+    Args:
+        fact_table: Fact table (read only)
+        period_column: Name of the Period column (one of PERIOD_COLUMNS,
+            derived from date_achat when the fact table does not hold it)
+        aggregations: Output column -> (input column, function)
+
+    Returns:
+        DataFrame with the periods then the aggregations, sorted by period
+    """
+    periods = fact_table[period_column] if period_column in fact_table.columns \
+        else fact_table['date_achat'].dt.to_period(PERIOD_COLUMNS[period_column])
+    columns = list(dict.fromkeys(column for column, _ in aggregations.values()))
+    frame = fact_table[columns].assign(**{
+        period_column: pd.arrays.IntegerArray(periods.array.asi8, periods.isna().to_numpy())
+    })
+    result = get_engine().group_aggregate(frame, [period_column], aggregations)
+    result[period_column] = pd.PeriodIndex.from_ordinals(result[period_column].astype('int64'), freq=periods.dtype.freq)
+    return result
+
+
+# Agrégats de l'état journalier des ventes, une ligne par jour : sommes et comptes fusionnables, clients distincts du jour
+DAILY_STATE_AGGREGATIONS = {
+    'ca_total': ('montant', 'sum'),
+    'nb_achats': ('montant', 'count'),
+    'nb_clients': ('id_client', 'nunique')
+}
+
+
+def daily_sales_state(fact_table: pd.DataFrame) -> pd.DataFrame:
+    """
+    Build the daily sales state in one scan of the fact table: one row per
+    day with the sum and count of montant and its distinct clients. Sums
+    and counts roll up to any coarser grain; the distinct clients of a
+    week or a month come from the client sketches of its days (see
+    sales_state), so the state grows with the number of days only.
+
+    Args:
+        fact_table: Fact table (read only)
+
+    Returns:
+        DataFrame with date_achat, ca_total, nb_achats and nb_clients,
+        sorted by day
+    """
+    return get_engine().group_aggregate(fact_table, ['date_achat'], DAILY_STATE_AGGREGATIONS)
+
+
+def client_sketches(codes: np.ndarray, n_groups: int, id_clients) -> np.ndarray:
+    """
+    HyperLogLog registers of the clients of each group, at the precision
+    of DISTINCT_SKETCH_ERROR.
+
+    Args:
+        codes: Group of each row, in [0, n_groups) (-1 rows are ignored)
+        n_groups: Number of groups
+        id_clients: id_client of each row
+
+    Returns:
+        uint8 array of shape (n_groups, 2^precision)
+    """
+    codes = np.asarray(codes)
+    kept = codes >= 0
+    return HyperLogLog.group_registers(
+        codes[kept], n_groups, np.asarray(id_clients)[kept], HyperLogLog.precision_for(DISTINCT_SKETCH_ERROR)
+    )
+
+
+def rollup_sales(state: pd.DataFrame, period_column: str | None = None,
+                 day_sketches: np.ndarray | None = None, day_clients: pd.DataFrame | None = None) -> pd.DataFrame:
+    """
+    Roll the daily sales state up to days, or to the periods of
+    period_column, with the columns of SALES_AGGREGATIONS. Sums and counts
+    cost one row per day. The nb_clients of a period is estimated from the
+    merged sketches of its days, or counted exactly from the distinct
+    (day, client) pairs when they are given (EXACT_PERIOD_CLIENTS).
+
+    Args:
+        state: Daily sales state (see daily_sales_state)
+        period_column: One of PERIOD_COLUMNS, None for days
+        day_sketches: Client sketches of each day of the state, in day
+            order; the sketches of a period are merged from its days and
+            stored in SKETCH_COLUMN when DISTINCT_SKETCHES is on
+        day_clients: Distinct (date_achat, id_client) pairs of the state
+            days, for an exact nb_clients of the periods
+
+    Returns:
+        DataFrame with date_achat (or period_column) then ca_total,
+        panier_moyen, nb_achats and nb_clients, sorted by key
+    """
+    if period_column is None:
+        result = state.copy()
+    else:
+        result = aggregate_by_period(state, period_column, {
+            'ca_total': ('ca_total', 'sum'),
+            'nb_achats': ('nb_achats', 'sum')
+        })
+        if day_sketches is not None and len(day_sketches):
+            # Jours triés : les jours d'une période sont contigus, fusionnés par maximum des registres
+            ordinals = state['date_achat'].dt.to_period(PERIOD_COLUMNS[period_column]).array.asi8
+            starts = np.flatnonzero(np.r_[True, ordinals[1:] != ordinals[:-1]])
+            day_sketches = np.maximum.reduceat(day_sketches, starts, axis=0)
+        if day_clients is not None:
+            clients = aggregate_by_period(day_clients, period_column, {'nb_clients': ('id_client', 'nunique')})
+            result['nb_clients'] = clients['nb_clients'].to_numpy()
+        else:
+            result['nb_clients'] = np.rint(HyperLogLog.estimate(day_sketches)).astype('int64')
+    result.insert(result.columns.get_loc('ca_total') + 1, 'panier_moyen', result['ca_total'] / result['nb_achats'])
+
+    if DISTINCT_SKETCHES:
+        result[SKETCH_COLUMN] = [HyperLogLog.encode(registers) for registers in day_sketches]
+    return result
+
+
+# Tables d'agrégation temporelle : colonne de période (None pour les jours) et colonne clé de la table
+TEMPORAL_TABLES = {
+    'agg_jour': (None, 'date'),
+    'agg_semaine': ('annee_semaine', 'semaine'),
+    'agg_mois': ('annee_mois', 'mois')
+}
+
+
+def sales_state(fact_table: pd.DataFrame) -> tuple[pd.DataFrame, np.ndarray | None, pd.DataFrame | None]:
+    """
+    Build the daily sales state of the fact table with what its periods
+    need for their distinct clients: the client sketches of each day
+    (unless EXACT_PERIOD_CLIENTS is on without DISTINCT_SKETCHES), and the
+    distinct (day, client) pairs when EXACT_PERIOD_CLIENTS is on. Those
+    pairs grow with days x clients, up to the size of the fact table when
+    clients rarely buy twice on the same day.
+
+    Args:
+        fact_table: Fact table (read only)
+
+    Returns:
+        Tuple (daily sales state, day sketches in day order or None,
+        distinct (day, client) pairs or None)
+    """
+    state = daily_sales_state(fact_table)
+    # Sketches des clients par jour, fusionnés pour les semaines et les mois
+    day_sketches = None
+    if DISTINCT_SKETCHES or not EXACT_PERIOD_CLIENTS:
+        day_codes, days = pd.factorize(fact_table['date_achat'], sort=True)
+        day_sketches = client_sketches(day_codes, len(days), fact_table['id_client'])
+    day_clients = None
+    if EXACT_PERIOD_CLIENTS:
+        day_clients = get_engine().drop_duplicates(fact_table[['date_achat', 'id_client']], ['date_achat', 'id_client'])
+    return state, day_sketches, day_clients
+
+
+def temporal_table(state: pd.DataFrame, name: str, day_sketches: np.ndarray | None = None,
+                   day_clients: pd.DataFrame | None = None) -> pd.DataFrame:
+    """
+    Roll the daily sales state up to one of TEMPORAL_TABLES, with its key
+    column renamed (and periods written as strings).
+
+    Args:
+        state: Daily sales state (see sales_state)
+        name: Table name (agg_jour, agg_semaine or agg_mois)
+        day_sketches: Client sketches of each day of the state
+        day_clients: Distinct (day, client) pairs of the state days
+
+    Returns:
+        Aggregation table sorted by key
+    """
+    period_column, key = TEMPORAL_TABLES[name]
+    table = rollup_sales(state, period_column, day_sketches, day_clients)
+    table = table.rename(columns={period_column or 'date_achat': key})
+    if period_column is not None:
+        table[key] = table[key].astype(str)
+    return table
+
+
+def country_sales(fact_table: pd.DataFrame) -> pd.DataFrame:
+    """
+    Aggregate the fact table by country (SALES_AGGREGATIONS, with the
+    client sketches of each country when DISTINCT_SKETCHES is on).
+
+    Args:
+        fact_table: Fact table (read only)
+
+    Returns:
+        DataFrame sorted by decreasing ca_total
+    """
+    ca_par_pays = get_engine().group_aggregate(fact_table, ['pays'], SALES_AGGREGATIONS)
+    if DISTINCT_SKETCHES:
+        codes = pd.Categorical(fact_table['pays'], categories=ca_par_pays['pays']).codes
+        ca_par_pays[SKETCH_COLUMN] = [
+            HyperLogLog.encode(registers) for registers in client_sketches(codes, len(ca_par_pays), fact_table['id_client'])
+        ]
+    return ca_par_pays.sort_values('ca_total', ascending=False).reset_index(drop=True)
+
+
+def add_period_columns(fact_table: pd.DataFrame) -> pd.DataFrame:
+    """Compute the PERIOD_COLUMNS of a fact table from date_achat, in place, and return it."""
+    for period_column, freq in PERIOD_COLUMNS.items():
+        fact_table[period_column] = fact_table['date_achat'].dt.to_period(freq)
+    return fact_table
+
+
 @task(name="join_data", retries=2)
-def join_clients_and_achats(clients_df: pd.DataFrame, achats_df: pd.DataFrame) -> pd.DataFrame:
+def join_clients_and_achats(clients_df: pd.DataFrame, achats_df: pd.DataFrame,
+                            columns: list[str] | None = None) -> pd.DataFrame:
     """
-    Join clients and achats data to create a fact table.
+    Join clients and achats data to create a fact table, with its period
+    columns (PERIOD_COLUMNS) computed once: the downstream tasks run
+    concurrently on the same fact table and only read it.
+
+    Clients are a dimension unique on id_client: each achat gets its
+    client columns by a lookup on id_client (see lookup_join) rather than
+    a hash join.
 
     Args:
         clients_df: DataFrame with clients data
         achats_df: DataFrame with achats data
+        columns: Client columns to add (all if None, FACT_CLIENT_COLUMNS
+            for the gold tables)
 
     Returns:
         Joined DataFrame (fact table)
     """
     logger = get_run_logger()
-    fact_table = achats_df.merge(
-        clients_df,
-        on='id_client',
-        how='left',
-        suffixes=('', '_client')
+    fact_table = add_period_columns(
+        get_engine().lookup_join(achats_df, clients_df, on='id_client', columns=columns, suffixes=('', '_client'))
     )
     
-    logger.info(f"Joined data: {len(fact_table)} rows (from {len(achats_df)} achats and {len(clients_df)} clients)")
+    logger.info(f"Joined data: {len(fact_table)} rows (from {len(achats_df)} achats and {len(clients_df)} clients), "
+                f"{memory_mb(fact_table):.2f} MB")
     return fact_table
 
 
+def kpis_frame(kpis: dict, id_clients: np.ndarray) -> pd.DataFrame:
+    """
+    Build the KPI table from the KPI values, and log them.
+
+    Args:
+        kpis: KPI name -> value
+        id_clients: id_client of the achats (for the client sketch)
+
+    Returns:
+        DataFrame with KPIs
+    """
+    logger = get_run_logger()
+    kpis_df = pd.DataFrame([kpis])
+    if DISTINCT_SKETCHES:
+        kpis_df[SKETCH_COLUMN] = HyperLogLog.for_error(DISTINCT_SKETCH_ERROR).add(id_clients).to_string()
+    
+    logger.info("="*50)
+    logger.info("KPIs CALCULÉS:")
+    logger.info("="*50)
+    for key, value in kpis.items():
+        if value is not None:
+            if isinstance(value, float):
+                logger.info(f"  • {key}: {value:,.2f}")
+            else:
+                logger.info(f"  • {key}: {value:,}")
+    logger.info("="*50)
+    
+    return kpis_df
+
+
 @task(name="calculate_kpis", retries=2)
 def calculate_kpis(fact_table: pd.DataFrame) -> pd.DataFrame:
     """
@@ -81,11 +399,8 @@ def calculate_kpis(fact_table: pd.DataFrame) -> pd.DataFrame:
     Returns:
         DataFrame with KPIs
     """
-    logger = get_run_logger()
     kpis = {}
     
-    fact_table['date_achat'] = pd.to_datetime(fact_table['date_achat'])
-    
     # 1. CA total
     kpis['ca_total'] = fact_table['montant'].sum()
     
@@ -99,12 +414,11 @@ def calculate_kpis(fact_table: pd.DataFrame) -> pd.DataFrame:
     kpis['nb_clients_uniques'] = fact_table['id_client'].nunique()
     
     # 5. Montant moyen par client
-    ca_par_client = fact_table.groupby('id_client')['montant'].sum()
-    kpis['montant_moyen_par_client'] = ca_par_client.mean()
+    ca_par_client = get_engine().group_aggregate(fact_table, ['id_client'], {'ca_total': ('montant', 'sum')})
+    kpis['montant_moyen_par_client'] = ca_par_client['ca_total'].mean()
     
     # 6. Taux de croissance (comparaison mois actuel vs mois précédent)
-    fact_table['annee_mois'] = fact_table['date_achat'].dt.to_period('M')
-    ca_par_mois = fact_table.groupby('annee_mois')['montant'].sum().sort_index()
+    ca_par_mois = aggregate_by_period(fact_table, 'annee_mois', {'ca_total': ('montant', 'sum')})['ca_total']
     if len(ca_par_mois) >= 2:
         dernier_mois = ca_par_mois.iloc[-1]
         mois_precedent = ca_par_mois.iloc[-2]
@@ -119,30 +433,88 @@ def calculate_kpis(fact_table: pd.DataFrame) -> pd.DataFrame:
     kpis['montant_max'] = fact_table['montant'].max()
     
     # Créer un DataFrame avec les KPIs
-    kpis_df = pd.DataFrame([kpis])
-    
-    logger.info("="*50)
-    logger.info("KPIs CALCULÉS:")
-    logger.info("="*50)
-    for key, value in kpis.items():
-        if value is not None:
-            if isinstance(value, float):
-                logger.info(f"  • {key}: {value:,.2f}")
-            else:
-                logger.info(f"  • {key}: {value:,}")
-    logger.info("="*50)
-    
-    return kpis_df
+    return kpis_frame(kpis, fact_table['id_client'].to_numpy())
+
+
+@task(name="save_kpi_state", retries=2)
+def save_kpi_state(fact_table: pd.DataFrame, part_names: list[str]) -> None:
+    """
+    Rebuild the mergeable KPI state (see KpiState) from the whole fact
+    table, for the next incremental run.
+
+    Args:
+        fact_table: Fact table with joined data
+        part_names: Silver achats partitions reflected by the fact table
+    """
+    KpiState.from_facts(fact_table, part_names).save()
+
+
+@task(name="update_kpis", retries=2)
+def update_kpis(achats: pd.DataFrame, affected: dict, processed: list[str], part_names: list[str],
+                previous_produits: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    KPIs of the incremental mode: the achats removed from and added to the
+    fact table are folded into the persisted KPI state, in O(delta). The
+    median comes from the quantile sketch of the state; the other KPIs
+    match the exact computation up to the summation order.
+
+    With KPI_EXACT (audits), or when the state does not match the previous
+    run, the KPIs are computed exactly on the whole fact table, read back
+    from gold, and the state is rebuilt.
+
+    Args:
+        achats: Achats of the months touched by the delta (see apply_silver_delta)
+        affected: Affected keys and achats (see apply_silver_delta)
+        processed: Silver achats partitions of the previous run
+        part_names: Silver achats partitions reflected by the fact table
+        previous_produits: dim_produits of the previous run (decodes the
+            months read back from gold)
+
+    Returns:
+        Tuple (DataFrame with KPIs, CA and number of achats per id_client
+        of the state)
+    """
+    logger = get_run_logger()
+    state = None if KPI_EXACT else KpiState.load()
+    if state is None or state.parts != processed:
+        logger.info("KPIs recalculés exactement sur toute la table de faits")
+        previous_achats = read_fact_achats(previous_produits)
+        is_replaced = previous_achats['id_achat'].isin(affected['added_achats']['id_achat']).to_numpy()
+        fact_table = add_period_columns(pd.concat(
+            [previous_achats.loc[~is_replaced, KPI_COLUMNS], affected['added_achats']], ignore_index=True
+        ))
+        state = KpiState.from_facts(fact_table, part_names)
+        state.save()
+        return calculate_kpis.fn(fact_table), state.clients
+
+    state.remove(affected['removed_achats']).add(affected['added_achats'])
+    if state.stale_extremes:
+        # Un minimum ou un maximum a été retiré : seuls les montants sont relus, mois touchés compris en mémoire
+        montants = [read_table(BUCKET_GOLD, name, columns=['montant'])['montant']
+                    for name in fact_partition_names(affected['months'], exclude=True)]
+        state.refresh_extremes(pd.concat([*montants, achats['montant']], ignore_index=True))
+    state.parts = part_names
+    state.save()
+    logger.info(f"✓ État des KPIs mis à jour: {len(affected['removed_achats'])} achats retirés, "
+                f"{len(affected['added_achats'])} ajoutés")
+    return kpis_frame(state.kpis(), state.clients.index.to_numpy()), state.clients
 
 
 @task(name="create_dimension_tables", retries=2)
-def create_dimension_tables(clients_df: pd.DataFrame, fact_table: pd.DataFrame) -> dict:
+def create_dimension_tables(clients_df: pd.DataFrame, fact_table: pd.DataFrame,
+                            registry: KeyRegistry | None = None) -> dict:
     """
     Create dimension tables (dim_clients, dim_produits, dim_dates).
 
+    Surrogate keys are stable across runs: id_produit comes from the key
+    registry (existing products keep their id, new ones get the next ids)
+    and id_date is derived from the date itself (YYYYMMDD).
+
     Args:
         clients_df: DataFrame with clients data
         fact_table: Fact table with joined data
+        registry: Key registry of the products (in memory if None: ids by
+            first appearance)
 
     Returns:
         Dictionary with dimension tables
@@ -156,17 +528,51 @@ def create_dimension_tables(clients_df: pd.DataFrame, fact_table: pd.DataFrame)
     logger.info(f"✓ Dimension Clients créée: {len(dim_clients)} clients")
     
     # Dimension Produits
-    dim_produits = fact_table[['produit']].drop_duplicates().reset_index(drop=True)
-    dim_produits['id_produit'] = range(1, len(dim_produits) + 1)
-    dim_produits = dim_produits[['id_produit', 'produit']]
+    dim_produits = product_dimension(fact_table['produit'], registry)
     dimensions['dim_produits'] = dim_produits
     logger.info(f"✓ Dimension Produits créée: {len(dim_produits)} produits")
     
     # Dimension Dates (avec agrégations temporelles)
-    fact_table['date_achat'] = pd.to_datetime(fact_table['date_achat'])
-    dates_unique = fact_table['date_achat'].dt.date.unique()
-    dim_dates = pd.DataFrame({'date': dates_unique})
-    dim_dates['date'] = pd.to_datetime(dim_dates['date'])
+    dim_dates = date_dimension(fact_table['date_achat'])
+    dimensions['dim_dates'] = dim_dates
+    logger.info(f"✓ Dimension Dates créée: {len(dim_dates)} dates avec agrégations temporelles")
+    
+    return dimensions
+
+
+def product_dimension(produits: pd.Series, registry: KeyRegistry | None = None) -> pd.DataFrame:
+    """
+    Build dim_produits from the products of the achats.
+
+    Args:
+        produits: Product of each achat
+        registry: Key registry of the products (in memory if None: ids by
+            first appearance)
+
+    Returns:
+        DataFrame with id_produit and produit, sorted by id_produit
+    """
+    if registry is None:
+        registry = KeyRegistry()
+    dim_produits = get_engine().drop_duplicates(produits.to_frame('produit'), ['produit']).reset_index(drop=True)
+    dim_produits['id_produit'] = registry.assign(dim_produits['produit'])
+    # Produits réapparus ou nouveaux : ordre des clés
+    dim_produits = dim_produits.sort_values('id_produit', kind='stable').reset_index(drop=True)
+    return dim_produits[['id_produit', 'produit']]
+
+
+def date_dimension(dates: pd.Series) -> pd.DataFrame:
+    """
+    Build dim_dates from the dates of the achats: one row per distinct day
+    with its calendar attributes and its key id_date.
+
+    Args:
+        dates: datetime column (missing values ignored)
+
+    Returns:
+        DataFrame sorted by date
+    """
+    dim_dates = pd.DataFrame({'date': dates.dropna().unique()})
     dim_dates['jour'] = dim_dates['date'].dt.day
     dim_dates['mois'] = dim_dates['date'].dt.month
     dim_dates['annee'] = dim_dates['date'].dt.year
@@ -174,18 +580,175 @@ def create_dimension_tables(clients_df: pd.DataFrame, fact_table: pd.DataFrame)
     dim_dates['semaine'] = dim_dates['date'].dt.isocalendar().week
     dim_dates['trimestre'] = dim_dates['date'].dt.quarter
     dim_dates = dim_dates.sort_values('date').reset_index(drop=True)
-    dim_dates['id_date'] = range(1, len(dim_dates) + 1)
-    dimensions['dim_dates'] = dim_dates
-    logger.info(f"✓ Dimension Dates créée: {len(dim_dates)} dates avec agrégations temporelles")
-    
+    dim_dates['id_date'] = date_keys(dim_dates['date'])
+    return dim_dates
+
+
+@task(name="refresh_dimension_tables", retries=2)
+def refresh_dimension_tables(clients_df: pd.DataFrame, previous_produits: pd.DataFrame, achats: pd.DataFrame,
+                             temporal_aggs: dict, registry: KeyRegistry | None = None) -> dict:
+    """
+    Dimension tables of the incremental mode, built without reading the
+    whole fact table: dim_produits keeps the products of the previous run
+    and adds those of the touched months, dim_dates holds the days of the
+    refreshed agg_jour (every day with achats).
+
+    Args:
+        clients_df: DataFrame with clients data
+        previous_produits: dim_produits of the previous run
+        achats: Achats of the months touched by the delta (see apply_silver_delta)
+        temporal_aggs: Refreshed temporal aggregations
+        registry: Key registry of the products
+
+    Returns:
+        Dictionary with dimension tables
+    """
+    logger = get_run_logger()
+    produits = pd.concat([previous_produits['produit'].astype(object), achats['produit'].astype(object)],
+                         ignore_index=True).astype('category')
+    dimensions = {
+        'dim_clients': clients_df.copy(),
+        'dim_produits': product_dimension(produits, registry),
+        'dim_dates': date_dimension(temporal_aggs['agg_jour']['date'])
+    }
+    logger.info(f"✓ Dimensions: {len(dimensions['dim_clients'])} clients, {len(dimensions['dim_produits'])} produits, "
+                f"{len(dimensions['dim_dates'])} dates")
     return dimensions
 
 
+# Colonnes de la table de faits gold : clés de substitution entières (date, client, produit) et mesure
+FACT_COLUMNS = ['id_achat', 'id_date', 'id_client', 'id_produit', 'montant']
+# Types écrits : identiques dans toutes les partitions, quelles que soient les valeurs du run qui les réécrit
+FACT_DTYPES = {'id_achat': 'int64', 'id_date': 'int32', 'id_client': 'int64', 'id_produit': 'Int32', 'montant': 'float64'}
+
+
+def date_keys(dates: pd.Series) -> pd.Series:
+    """Integer date keys YYYYMMDD (id_date of dim_dates) of a datetime column."""
+    return (dates.dt.year * 10000 + dates.dt.month * 100 + dates.dt.day).astype('int32')
+
+
+def dates_from_keys(keys: pd.Series) -> pd.Series:
+    """Datetime column of integer date keys YYYYMMDD (unit of the silver dates, ms)."""
+    keys = keys.astype('int64')
+    dates = pd.to_datetime(pd.DataFrame({'year': keys // 10000, 'month': keys // 100 % 100, 'day': keys % 100}))
+    return dates.astype('datetime64[ms]')
+
+
+@task(name="build_fact_achats", retries=2)
+def build_fact_achats(fact_table: pd.DataFrame, dimensions: dict) -> pd.DataFrame:
+    """
+    Build the gold fact table (star schema): one row per achat with
+    integer surrogate keys to dim_dates (id_date, YYYYMMDD), dim_clients
+    (id_client) and dim_produits (id_produit), and the amount. Descriptive
+    columns stay in the dimensions.
+
+    Args:
+        fact_table: Fact table with joined data (read only)
+        dimensions: Dimension tables (see create_dimension_tables)
+
+    Returns:
+        Gold fact table with FACT_COLUMNS
+    """
+    logger = get_run_logger()
+    dim_produits = dimensions['dim_produits']
+    positions = pd.Index(dim_produits['produit'].astype(object)).get_indexer(fact_table['produit'].astype(object))
+    id_produit = pd.array(dim_produits['id_produit'].to_numpy()[positions], dtype='Int64')
+    id_produit[positions < 0] = pd.NA
+
+    fact_achats = compact_dtypes(pd.DataFrame({
+        'id_achat': fact_table['id_achat'].to_numpy(),
+        'id_date': date_keys(fact_table['date_achat']).to_numpy(),
+        'id_client': fact_table['id_client'].to_numpy(),
+        'id_produit': id_produit,
+        'montant': fact_table['montant'].to_numpy()
+    }))
+    logger.info(f"✓ Table de faits: {len(fact_achats)} achats, {memory_mb(fact_achats):.2f} MB "
+                f"(table jointe: {memory_mb(fact_table):.2f} MB)")
+    return fact_achats
+
+
+def achats_from_fact(fact_achats: pd.DataFrame, dim_produits: pd.DataFrame) -> pd.DataFrame:
+    """
+    Silver achats columns of a gold fact table, decoded with its
+    dimensions (inverse of build_fact_achats).
+
+    Args:
+        fact_achats: Gold fact table
+        dim_produits: dim_produits written with it
+
+    Returns:
+        DataFrame with the columns of the achats schema
+    """
+    produits = pd.Series(dim_produits['produit'].to_numpy(), index=dim_produits['id_produit'].to_numpy())
+    return compact_dtypes(pd.DataFrame({
+        'id_achat': fact_achats['id_achat'].to_numpy(),
+        'id_client': fact_achats['id_client'].to_numpy(),
+        'date_achat': dates_from_keys(fact_achats['id_date']).to_numpy(),
+        'montant': fact_achats['montant'].to_numpy(),
+        'produit': produits.reindex(fact_achats['id_produit'].to_numpy()).to_numpy()
+    }, columns=SCHEMAS["achats"].names))
+
+
+def fact_partition_names(months: list[int] | None = None, exclude: bool = False) -> list[str]:
+    """
+    Part objects of the gold fact table, oldest month first.
+
+    Args:
+        months: Months YYYYMM to keep (every month if None)
+        exclude: Keep every month except months instead
+
+    Returns:
+        Sorted part object names
+    """
+    part_names = list_month_partition_objects(get_minio_client(), BUCKET_GOLD, 'fact_achats')
+    if months is None:
+        return part_names
+    months = set(months)
+    return [name for name in part_names if (partition_month(name) in months) != exclude]
+
+
+def read_fact_achats(dim_produits: pd.DataFrame, months: list[int] | None = None, exclude: bool = False) -> pd.DataFrame:
+    """
+    Read month partitions of the gold fact table of the previous run,
+    decoded to silver achats columns (see achats_from_fact).
+
+    Args:
+        dim_produits: dim_produits written with the fact table
+        months: Months YYYYMM to read (every month if None)
+        exclude: Read every month except months instead
+
+    Returns:
+        DataFrame with the columns of the achats schema, oldest month first
+    """
+    frames = [read_table(BUCKET_GOLD, name) for name in fact_partition_names(months, exclude)]
+    fact_achats = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=FACT_COLUMNS)
+    return achats_from_fact(fact_achats.astype(FACT_DTYPES), dim_produits)
+
+
+def covering_months(days: pd.DatetimeIndex) -> list[int]:
+    """
+    Months YYYYMM holding every day of the months and ISO weeks of days
+    (a week overlapping two months needs both).
+
+    Args:
+        days: Days
+
+    Returns:
+        Sorted months
+    """
+    weeks = days.to_period(PERIOD_COLUMNS['annee_semaine'])
+    bounds = days.append([weeks.start_time, weeks.end_time.normalize()])
+    return sorted(set((bounds.year * 100 + bounds.month).tolist()))
+
+
 @task(name="calculate_temporal_aggregations", retries=2)
 def calculate_temporal_aggregations(fact_table: pd.DataFrame) -> dict:
     """
     Calculate temporal aggregations (by day, week, month).
 
+    The fact table is scanned once into the daily sales state (see
+    daily_sales_state); days, weeks and months are rolled up from it.
+
     Args:
         fact_table: Fact table with joined data
 
@@ -193,38 +756,22 @@ def calculate_temporal_aggregations(fact_table: pd.DataFrame) -> dict:
         Dictionary with temporal aggregations
     """
     logger = get_run_logger()
-    fact_table['date_achat'] = pd.to_datetime(fact_table['date_achat'])
-    
     aggregations = {}
     
+    state, day_sketches, day_clients = sales_state(fact_table)
+
     # Agrégation par jour
-    agg_jour = fact_table.groupby(fact_table['date_achat'].dt.date).agg({
-        'montant': ['sum', 'mean', 'count'],
-        'id_client': 'nunique'
-    }).reset_index()
-    agg_jour.columns = ['date', 'ca_total', 'panier_moyen', 'nb_achats', 'nb_clients']
+    agg_jour = temporal_table(state, 'agg_jour', day_sketches, day_clients)
     aggregations['agg_jour'] = agg_jour
     logger.info(f"✓ Agrégation par jour: {len(agg_jour)} jours")
     
     # Agrégation par semaine
-    fact_table['annee_semaine'] = fact_table['date_achat'].dt.to_period('W')
-    agg_semaine = fact_table.groupby('annee_semaine').agg({
-        'montant': ['sum', 'mean', 'count'],
-        'id_client': 'nunique'
-    }).reset_index()
-    agg_semaine.columns = ['semaine', 'ca_total', 'panier_moyen', 'nb_achats', 'nb_clients']
-    agg_semaine['semaine'] = agg_semaine['semaine'].astype(str)
+    agg_semaine = temporal_table(state, 'agg_semaine', day_sketches, day_clients)
     aggregations['agg_semaine'] = agg_semaine
     logger.info(f"✓ Agrégation par semaine: {len(agg_semaine)} semaines")
     
     # Agrégation par mois
-    fact_table['annee_mois'] = fact_table['date_achat'].dt.to_period('M')
-    agg_mois = fact_table.groupby('annee_mois').agg({
-        'montant': ['sum', 'mean', 'count'],
-        'id_client': 'nunique'
-    }).reset_index()
-    agg_mois.columns = ['mois', 'ca_total', 'panier_moyen', 'nb_achats', 'nb_clients']
-    agg_mois['mois'] = agg_mois['mois'].astype(str)
+    agg_mois = temporal_table(state, 'agg_mois', day_sketches, day_clients)
     aggregations['agg_mois'] = agg_mois
     logger.info(f"✓ Agrégation par mois: {len(agg_mois)} mois")
     
@@ -243,12 +790,7 @@ def calculate_ca_by_country(fact_table: pd.DataFrame) -> pd.DataFrame:
         DataFrame with CA by country
     """
     logger = get_run_logger()
-    ca_par_pays = fact_table.groupby('pays').agg({
-        'montant': ['sum', 'mean', 'count'],
-        'id_client': 'nunique'
-    }).reset_index()
-    ca_par_pays.columns = ['pays', 'ca_total', 'panier_moyen', 'nb_achats', 'nb_clients']
-    ca_par_pays = ca_par_pays.sort_values('ca_total', ascending=False).reset_index(drop=True)
+    ca_par_pays = country_sales(fact_table)
     
     logger.info(f"✓ CA par pays calculé: {len(ca_par_pays)} pays")
     return ca_par_pays
@@ -269,71 +811,471 @@ def save_to_gold_layer(df: pd.DataFrame, object_name: str) -> str:
     logger = get_run_logger()
     client = get_minio_client()
 
-    if not client.bucket_exists(BUCKET_GOLD):
-        client.make_bucket(BUCKET_GOLD)
+    ensure_bucket(BUCKET_GOLD)
 
-    # Sauvegarder le DataFrame en CSV en mémoire
-    gold_csv = BytesIO()
-    df.to_csv(gold_csv, index=False, encoding='utf-8')
-    gold_csv.seek(0)
+    # Sérialiser le DataFrame en mémoire (Parquet ou CSV selon l'extension)
+    gold_data = serialize_table(df, object_name)
 
     client.put_object(
         BUCKET_GOLD,
         object_name,
-        gold_csv,
-        length=gold_csv.getbuffer().nbytes
+        gold_data,
+        length=gold_data.getbuffer().nbytes
     )
     logger.info(f"Saved {object_name} to {BUCKET_GOLD} ({len(df)} rows)")
     return object_name
 
 
-@flow(name="Gold Aggregation Flow")
-def gold_ingestion_flow() -> dict:
+# Ordre des lignes dans chaque partition mensuelle de la table de faits (statistiques resserrées par row group)
+FACT_SORT_COLUMNS = ['id_date', 'id_client', 'id_achat']
+
+
+@task(name="save_fact_partitions", retries=2)
+def save_fact_partitions(fact_achats: pd.DataFrame, months: list[int] | None = None) -> str:
+    """
+    Save the gold fact table as a Hive-style dataset partitioned by the
+    month of its date key, fact_achats/annee=YYYY/mois=MM/part-00000.<ext>
+    (GOLD_FORMAT). Rows are sorted by FACT_SORT_COLUMNS in each partition,
+    so that the Parquet row-group statistics of id_date and id_client
+    cover narrow ranges: date-range readers skip the other months and row
+    groups (see read_month_partitions). Columns are written with
+    FACT_DTYPES, so that every partition has the same schema.
+
+    Args:
+        fact_achats: Gold fact table (see build_fact_achats)
+        months: Months YYYYMM whose partitions are rewritten (every month
+            if None); the other partitions are left untouched
+
+    Returns:
+        Prefix of the partitions in gold layer
+    """
+    logger = get_run_logger()
+    client = get_minio_client()
+    table = 'fact_achats'
+
+    ensure_bucket(BUCKET_GOLD)
+
+    fact_achats = fact_achats.astype(FACT_DTYPES).sort_values(FACT_SORT_COLUMNS, kind='stable', ignore_index=True)
+    fact_months = fact_achats['id_date'].to_numpy().astype(np.int64) // 100
+    rewritten = np.unique(fact_months) if months is None else np.unique(np.asarray(months, dtype=np.int64))
+    starts = np.searchsorted(fact_months, rewritten, side='left')
+    ends = np.searchsorted(fact_months, rewritten, side='right')
+
+    written = set()
+    for month, start, end in zip(rewritten, starts, ends):
+        if start == end:
+            continue
+        object_name = part_object_name(month_partition_prefix(table, int(month)), 0, GOLD_FORMAT)
+        gold_data = serialize_table(fact_achats.iloc[start:end], object_name)
+        client.put_object(BUCKET_GOLD, object_name, gold_data, length=gold_data.getbuffer().nbytes)
+        written.add(object_name)
+
+    # Parties périmées des mois réécrits (mois vidés, autre format), et ancienne table non partitionnée
+    prefixes = {month_partition_prefix(table, int(month)) for month in rewritten}
+    stale = [
+        name for name in list_month_partition_objects(client, BUCKET_GOLD, table)
+        if name not in written and (months is None or name.rsplit('/', 1)[0] + '/' in prefixes)
+    ]
+    if months is None:
+        stale += [f"{table}.parquet", f"{table}.csv"]
+    for name in stale:
+        client.remove_object(BUCKET_GOLD, name)
+
+    logger.info(f"Saved {gold_object_name(table)} to {BUCKET_GOLD} ({len(written)} partitions mensuelles réécrites, "
+                f"{int((ends - starts).sum())} rows)")
+    return gold_object_name(table)
+
+
+# Document d'état gold : partitions silver d'achats déjà agrégées, plus grand id_achat agrégé et options des tables écrites
+GOLD_STATE = "gold_state"
+# Tables écrites par le flow gold, et celles relues par le mode incrémental
+GOLD_TABLES = ('fact_achats', 'kpis', 'dim_clients', 'dim_produits', 'dim_dates', *TEMPORAL_TABLES, 'ca_par_pays')
+INCREMENTAL_TABLES = ('fact_achats', 'dim_clients', 'dim_produits', *TEMPORAL_TABLES, 'ca_par_pays')
+# Colonnes des achats lues par l'état des KPIs
+KPI_COLUMNS = ['id_achat', 'id_client', 'date_achat', 'montant']
+
+
+@task(name="read_from_gold", retries=2)
+def read_from_gold_layer(name: str) -> pd.DataFrame:
+    """
+    Read a gold table written by a previous run, with its date columns
+    parsed.
+
+    Args:
+        name: Table name
+
+    Returns:
+        DataFrame with the data
+    """
+    df = parse_date_columns(read_table(BUCKET_GOLD, gold_object_name(name)))
+    if 'date' in df.columns:
+        df['date'] = parse_dates(df['date'])
+    return df
+
+
+def changed_client_ids(clients_df: pd.DataFrame, previous_clients: pd.DataFrame) -> np.ndarray:
+    """
+    id_client of the clients added or modified since the previous run.
+
+    Args:
+        clients_df: Silver clients
+        previous_clients: dim_clients of the previous run
+
+    Returns:
+        Array of id_client
+    """
+    def row_hashes(df: pd.DataFrame) -> pd.Series:
+        df = compact_dtypes(df[list(clients_df.columns)].copy())
+        # Le hash d'une date dépend de son unité, qui diffère entre une relecture CSV et Parquet
+        dates = [column for column in df.columns if pd.api.types.is_datetime64_any_dtype(df[column])]
+        return pd.util.hash_pandas_object(df.astype({column: 'datetime64[ns]' for column in dates}), index=False)
+
+    is_changed = ~row_hashes(clients_df).isin(row_hashes(previous_clients)).to_numpy()
+    return clients_df['id_client'][is_changed].to_numpy()
+
+
+@task(name="apply_silver_delta", retries=2)
+def apply_silver_delta(previous_produits: pd.DataFrame, delta_achats: pd.DataFrame | None, clients_df: pd.DataFrame,
+                       previous_clients: pd.DataFrame, max_id_achat: int | None = None) -> tuple[pd.DataFrame | None, dict | None]:
+    """
+    Apply the new or changed silver rows to the achats of the previous
+    run, reading only the month partitions of the fact table they touch.
+
+    The previous versions of the changed achats are located first with a
+    key-only read (id_achat and id_date columns) of the fact table, skipped
+    when every delta id is above max_id_achat, the highest id already
+    aggregated. The months of the days of the previous and new versions
+    and of their ISO weeks (see covering_months) are then read and
+    decoded: a previous version is dropped and the new one appended, as a
+    full read of the silver partitions would order it. Only these months
+    are rebuilt. Nothing is joined with the clients: the fact table,
+    temporal aggregations and KPIs do not need their columns, and the CA
+    by country comes from the per-client sums of the KPI state.
+
+    Args:
+        previous_produits: dim_produits of the previous run
+        delta_achats: Silver achats of the partitions not yet aggregated
+            (None if there are none)
+        clients_df: Silver clients
+        previous_clients: dim_clients of the previous run
+        max_id_achat: Highest id_achat of the previous run (None if unknown)
+
+    Returns:
+        Tuple (achats of the months read, with their period columns,
+        affected keys), both None when nothing changed. Affected keys:
+        'days' (DatetimeIndex of the days whose rows changed), 'months'
+        (months YYYYMM read), 'removed_achats' and 'added_achats'
+        (previous and new versions of the changed achats, with
+        KPI_COLUMNS) and 'max_id_achat'
+    """
+    logger = get_run_logger()
+    changed_clients = changed_client_ids(clients_df, previous_clients)
+    if delta_achats is None and len(changed_clients) == 0:
+        return None, None
+    if delta_achats is None:
+        delta_achats = read_fact_achats(previous_produits, months=[])
+
+    # Les ids au-dessus du plus grand id agrégé sont nouveaux : seuls les autres ont une version précédente
+    candidates = delta_achats['id_achat']
+    if max_id_achat is not None:
+        candidates = candidates[candidates <= max_id_achat]
+    days = pd.DatetimeIndex(delta_achats['date_achat'].dropna().unique())
+    if len(candidates):
+        previous_keys = read_table(BUCKET_GOLD, gold_object_name('fact_achats'), columns=['id_achat', 'id_date'],
+                                   filters=[('id_achat', 'in', candidates.tolist())])
+        days = days.append(pd.DatetimeIndex(dates_from_keys(previous_keys['id_date']).unique()))
+    months = covering_months(days)
+
+    previous_achats = read_fact_achats(previous_produits, months)
+    is_replaced = previous_achats['id_achat'].isin(delta_achats['id_achat']).to_numpy()
+    achats = add_period_columns(compact_dtypes(pd.concat([previous_achats[~is_replaced], delta_achats], ignore_index=True)))
+
+    removed = previous_achats[is_replaced]
+    new_ids = delta_achats['id_achat'].max() if len(delta_achats) else None
+    affected = {
+        'days': pd.DatetimeIndex(pd.concat([removed['date_achat'], delta_achats['date_achat']]).dropna().unique()),
+        'months': months,
+        'removed_achats': removed[KPI_COLUMNS],
+        'added_achats': delta_achats[KPI_COLUMNS],
+        'max_id_achat': max((int(key) for key in (max_id_achat, new_ids) if key is not None), default=None)
+    }
+    logger.info(f"✓ Delta silver: {len(delta_achats)} achats nouveaux ou modifiés ({int(is_replaced.sum())} remplacés), "
+                f"{len(changed_clients)} clients modifiés → {len(affected['days'])} jours touchés, "
+                f"{len(months)} mois de faits relus ({len(previous_achats)} lignes)")
+    return achats, affected
+
+
+def merge_aggregation(existing: pd.DataFrame, recomputed: pd.DataFrame, key: str, keys,
+                      ascending: bool = True, sort_by: str | None = None) -> pd.DataFrame:
+    """
+    Replace the rows of the affected keys of an aggregation table.
+
+    Args:
+        existing: Table of the previous run
+        recomputed: Rows recomputed for the affected keys (a key with no
+            more facts is absent and removed from the table)
+        key: Key column
+        keys: Affected keys
+        ascending: Sort order of the merged table
+        sort_by: Sort column of the merged table (key if None)
+
+    Returns:
+        Merged table
+    """
+    kept = existing[~existing[key].isin(keys).to_numpy()]
+    merged = compact_dtypes(pd.concat([kept, recomputed], ignore_index=True))
+    return merged.sort_values(sort_by or key, ascending=ascending).reset_index(drop=True)
+
+
+@task(name="refresh_temporal_aggregations", retries=2)
+def refresh_temporal_aggregations(fact_table: pd.DataFrame, affected: dict) -> dict:
+    """
+    Recompute the rows of the affected days, ISO weeks and months only,
+    from the facts of those periods, and merge them into the temporal
+    aggregations of the previous run.
+
+    Args:
+        fact_table: Achats of the months touched by the delta, which hold
+            every day of the affected periods (see apply_silver_delta)
+        affected: Affected keys (see apply_silver_delta)
+
+    Returns:
+        Dictionary with temporal aggregations
+    """
+    logger = get_run_logger()
+    aggregations = {}
+    days = affected['days']
+    for name, (period_column, key) in TEMPORAL_TABLES.items():
+        if period_column is None:
+            keys = days
+            rows = fact_table['date_achat'].isin(days).to_numpy()
+        else:
+            periods = days.to_period(PERIOD_COLUMNS[period_column]).unique()
+            keys = periods.astype(str)
+            rows = fact_table[period_column].isin(periods).to_numpy()
+        state, day_sketches, day_clients = sales_state(fact_table[rows])
+        recomputed = temporal_table(state, name, day_sketches, day_clients)
+        aggregations[name] = merge_aggregation(read_from_gold_layer(name), recomputed, key, keys)
+        logger.info(f"✓ {name}: {len(keys)} clés touchées, recalculées sur {int(rows.sum())} lignes de faits "
+                    f"({len(aggregations[name])} lignes)")
+    return aggregations
+
+
+def client_country_sales(client_sums: pd.DataFrame, clients_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    CA by country rolled up from the CA and number of achats of each
+    client. The country of an achat is the current country of its client,
+    so each client adds its sums to a single country and nb_clients counts
+    the clients with achats. Same columns as country_sales; sums may
+    differ from a scan of the facts in the last digits (summation order).
+
+    Args:
+        client_sums: ca_total and nb_achats indexed by id_client (see KpiState)
+        clients_df: Silver clients
+
+    Returns:
+        DataFrame sorted by decreasing ca_total
+    """
+    engine = get_engine()
+    sums = pd.DataFrame({
+        'id_client': client_sums.index.to_numpy(dtype=np.int64),
+        'ca_total': client_sums['ca_total'].to_numpy(),
+        'nb_achats': client_sums['nb_achats'].to_numpy()
+    })
+    sums = engine.lookup_join(sums, clients_df, on='id_client', columns=['pays'])
+    ca_par_pays = engine.group_aggregate(sums, ['pays'], {
+        'ca_total': ('ca_total', 'sum'),
+        'nb_achats': ('nb_achats', 'sum'),
+        'nb_clients': ('id_client', 'count')
+    })
+    ca_par_pays.insert(1, 'panier_moyen', ca_par_pays['ca_total'] / ca_par_pays['nb_achats'])
+    ca_par_pays = ca_par_pays[['pays', *SALES_AGGREGATIONS]]
+    if DISTINCT_SKETCHES:
+        codes = pd.Categorical(sums['pays'], categories=ca_par_pays['pays']).codes
+        ca_par_pays[SKETCH_COLUMN] = [
+            HyperLogLog.encode(registers) for registers in client_sketches(codes, len(ca_par_pays), sums['id_client'])
+        ]
+    return ca_par_pays.sort_values('ca_total', ascending=False).reset_index(drop=True)
+
+
+@task(name="refresh_ca_by_country", retries=2)
+def refresh_ca_by_country(client_sums: pd.DataFrame, clients_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Recompute the CA by country from the per-client sums of the KPI state
+    (see client_country_sales), in O(clients) whatever the size of the
+    fact table: client country changes are picked up as well.
+
+    Args:
+        client_sums: ca_total and nb_achats indexed by id_client
+        clients_df: Silver clients
+
+    Returns:
+        DataFrame with CA by country
+    """
+    logger = get_run_logger()
+    ca_par_pays = client_country_sales(client_sums, clients_df)
+    logger.info(f"✓ CA par pays: {len(ca_par_pays)} pays recalculés à partir de {len(client_sums)} clients")
+    return ca_par_pays
+
+
+def gold_state(part_names: list[str], max_id_achat: int | None) -> dict:
+    """Gold state document of a run (see GOLD_STATE)."""
+    max_id_achat = None if max_id_achat is None or pd.isna(max_id_achat) else int(max_id_achat)
+    return {"achats": {"processed": part_names, "max_id_achat": max_id_achat}, "sketches": DISTINCT_SKETCHES,
+            "exact_period_clients": EXACT_PERIOD_CLIENTS}
+
+
+def incremental_fallback_reason(state: dict, part_names: list[str]) -> str | None:
+    """
+    Reason why the gold tables cannot be updated incrementally (None when
+    they can).
+
+    The delta is the silver partitions missing from the list recorded by
+    the previous run: without that list (no gold state yet, or a previous
+    run that recorded no partition), the whole silver history would be
+    the delta, so the tables are recomputed instead.
+
+    Args:
+        state: Gold state of the previous run
+        part_names: Current silver achats partitions
+
+    Returns:
+        Reason, logged before the full recompute
+    """
+    processed = state.get("achats", {}).get("processed")
+    if processed is None:
+        return "aucun état gold, pas de base pour le delta : tout l'historique silver serait le delta"
+    if not processed:
+        return "aucune partition silver enregistrée au run précédent : tout l'historique silver serait le delta"
+    if not part_names:
+        return "achats silver non partitionnés"
+    if not set(processed) <= set(part_names):
+        return "partitions silver reconstruites"
+    if state.get("sketches") != DISTINCT_SKETCHES:
+        return "DISTINCT_SKETCHES modifié"
+    if state.get("exact_period_clients") != EXACT_PERIOD_CLIENTS:
+        return "EXACT_PERIOD_CLIENTS modifié"
+    existing = {obj.object_name for obj in get_minio_client().list_objects(BUCKET_GOLD)}
+    missing = [name for name in INCREMENTAL_TABLES if gold_object_name(name) not in existing]
+    if missing:
+        return f"tables gold manquantes: {', '.join(missing)}"
+    return None
+
+
+@flow(name="Gold Aggregation Flow", task_runner=get_task_runner(), **result_settings())
+def gold_ingestion_flow(incremental: bool | None = None) -> dict:
     """
     Main flow: Read data from silver, calculate KPIs, create fact/dimension tables,
     calculate temporal aggregations, and save to gold layer.
 
+    The tasks are submitted to the task runner as a graph: both silver
+    reads run together, then the four computations on the fact table,
+    then every save as soon as its table is ready.
+
+    In incremental mode, only the silver achats partitions not yet
+    aggregated and the changed clients are read; the previous fact table
+    is read back only for the months touched by the delta, which replace
+    their stored rows without any join (see apply_silver_delta). The
+    temporal aggregations are recomputed for the affected days, weeks and
+    months only, the CA by country comes from the per-client sums of the
+    KPI state, and only the touched month partitions of the fact table
+    are rewritten. The run falls
+    back to a full recompute when the previous gold tables cannot be
+    reused.
+
+    The delta baseline is the list of silver partitions recorded in
+    GOLD_STATE by the previous run, full or incremental. The first
+    GOLD_MODE=incremental run on a gold layer written without that state
+    (or after the state was reset) has no baseline: the whole silver
+    history would be its delta, so it runs as a full recompute and logs
+    why; the following runs are incremental.
+
+    Args:
+        incremental: Apply only the silver delta (defaults to
+            GOLD_MODE == 'incremental')
+
     Returns:
         Dictionary with all created file names
     """
     logger = get_run_logger()
-    clients_df = read_from_silver_layer("clients.csv")
-    achats_df = read_from_silver_layer("achats.csv")
+    purge_results()
+    if incremental is None:
+        incremental = GOLD_MODE == "incremental"
 
-    fact_table = join_clients_and_achats(clients_df, achats_df)
+    state = load_state(GOLD_STATE)
+    part_names = list_partition_objects(get_minio_client(), BUCKET_SILVER, "achats")
+    if incremental:
+        reason = incremental_fallback_reason(state, part_names)
+        if reason is not None:
+            logger.info(f"Gold incrémental impossible ({reason}) : recalcul complet")
+            incremental = False
 
-    kpis_df = calculate_kpis(fact_table)
+    clients_df = read_from_silver_layer.submit(silver_object_name("clients"))
 
-    dimensions = create_dimension_tables(clients_df, fact_table)
-
-    temporal_aggs = calculate_temporal_aggregations(fact_table)
+    if incremental:
+        processed = set(state["achats"]["processed"])
+        new_parts = [name for name in part_names if name not in processed]
+        delta_achats = read_silver_entity.submit("achats", part_names=new_parts) if new_parts else None
+        previous_produits = read_from_gold_layer.submit("dim_produits")
+        previous_clients = read_from_gold_layer.submit("dim_clients")
+        max_id_achat = state["achats"].get("max_id_achat")
+        # Seuls les mois touchés par le delta sont relus : fact_table ne contient que leurs achats
+        fact_table, affected = apply_silver_delta.submit(
+            previous_produits, delta_achats, clients_df, previous_clients, max_id_achat
+        ).result()
+        if affected is None:
+            logger.info("✓ GOLD INCRÉMENTAL: aucun achat ni client modifié, tables gold inchangées")
+            save_state(GOLD_STATE, gold_state(part_names, max_id_achat))
+            return {name: gold_object_name(name) for name in GOLD_TABLES}
+        max_id_achat = affected['max_id_achat']
+        temporal_aggs = refresh_temporal_aggregations.submit(fact_table, affected)
+        kpis_df, client_sums = update_kpis.submit(
+            fact_table, affected, state["achats"]["processed"], part_names, previous_produits
+        ).result()
+        ca_par_pays = refresh_ca_by_country.submit(client_sums, clients_df)
+        # Seuls les mois des achats ajoutés ou retirés changent dans la table de faits
+        fact_months = np.unique(date_keys(pd.Series(affected['days'])).to_numpy() // 100).tolist()
+        dimensions = refresh_dimension_tables.submit(
+            clients_df, previous_produits, fact_table, temporal_aggs, KeyRegistry.load("produit")
+        )
+    else:
+        achats_df = read_silver_entity.submit("achats")
+        fact_table = join_clients_and_achats.submit(clients_df, achats_df, FACT_CLIENT_COLUMNS)
+        kpis_df = calculate_kpis.submit(fact_table)
+        kpi_state = save_kpi_state.submit(fact_table, part_names)
+        temporal_aggs = calculate_temporal_aggregations.submit(fact_table)
+        ca_par_pays = calculate_ca_by_country.submit(fact_table)
+        fact_months = None
+        dimensions = create_dimension_tables.submit(clients_df, fact_table, KeyRegistry.load("produit"))
 
-    ca_par_pays = calculate_ca_by_country(fact_table)
+    saves = {}
 
-    saved_files = {}
+    fact_achats = build_fact_achats.submit(fact_table, dimensions)
+    saves['fact_achats'] = save_fact_partitions.submit(fact_achats, fact_months)
 
-    saved_files['fact_achats'] = save_to_gold_layer(fact_table, "fact_achats.csv")
+    saves['kpis'] = save_to_gold_layer.submit(kpis_df, gold_object_name("kpis"))
 
-    saved_files['kpis'] = save_to_gold_layer(kpis_df, "kpis.csv")
+    saves['ca_par_pays'] = save_to_gold_layer.submit(ca_par_pays, gold_object_name("ca_par_pays"))
 
-    saved_files['dim_clients'] = save_to_gold_layer(dimensions['dim_clients'], "dim_clients.csv")
-    saved_files['dim_produits'] = save_to_gold_layer(dimensions['dim_produits'], "dim_produits.csv")
-    saved_files['dim_dates'] = save_to_gold_layer(dimensions['dim_dates'], "dim_dates.csv")
-    saved_files['agg_jour'] = save_to_gold_layer(temporal_aggs['agg_jour'], "agg_jour.csv")
-    saved_files['agg_semaine'] = save_to_gold_layer(temporal_aggs['agg_semaine'], "agg_semaine.csv")
-    saved_files['agg_mois'] = save_to_gold_layer(temporal_aggs['agg_mois'], "agg_mois.csv")
+    # Les tables des dictionnaires ne sont connues qu'une fois leur tâche terminée
+    for name, table in {**dimensions.result(), **temporal_aggs.result()}.items():
+        saves[name] = save_to_gold_layer.submit(table, gold_object_name(name))
 
-    saved_files['ca_par_pays'] = save_to_gold_layer(ca_par_pays, "ca_par_pays.csv")
+    saved_files = {name: future.result() for name, future in saves.items()}
+    if not incremental:
+        kpi_state.result()
+        max_id_achat = fact_table.result()['id_achat'].max()
+    save_state(GOLD_STATE, gold_state(part_names, max_id_achat))
 
     logger.info("="*50)
     logger.info("✓ GOLD AGGREGATION TERMINÉE AVEC SUCCÈS")
     logger.info("="*50)
     logger.info("  Tables créées:")
-    logger.info(f"    • Table de faits: fact_achats.csv")
-    logger.info(f"    • KPIs: kpis.csv")
-    logger.info(f"    • Dimensions: dim_clients.csv, dim_produits.csv, dim_dates.csv")
-    logger.info(f"    • Agrégations temporelles: agg_jour.csv, agg_semaine.csv, agg_mois.csv")
-    logger.info(f"    • CA par pays: ca_par_pays.csv")
+    logger.info(f"    • Table de faits: {saved_files['fact_achats']}")
+    logger.info(f"    • KPIs: {saved_files['kpis']}")
+    logger.info(f"    • Dimensions: {saved_files['dim_clients']}, {saved_files['dim_produits']}, {saved_files['dim_dates']}")
+    logger.info(f"    • Agrégations temporelles: {saved_files['agg_jour']}, {saved_files['agg_semaine']}, {saved_files['agg_mois']}")
+    logger.info(f"    • CA par pays: {saved_files['ca_par_pays']}")
     logger.info("="*50)
 
     return saved_files
@@ -3,7 +3,6 @@ from dotenv import load_dotenv
 load_dotenv()
 os.environ["PREFECT_API_URL"] = os.getenv("PREFECT_API_URL")
 
-from io import BytesIO
 from prefect import flow, task
 from prefect.logging import get_run_logger
 import pandas as pd
@@ -12,38 +11,47 @@ import time
 from datetime import datetime
 
 try:
-    from .config import BUCKET_GOLD, get_minio_client, MONGODB_URI, MONGODB_DATABASE, MONGODB_COLLECTION_PREFIX
+    from .config import BUCKET_GOLD, bucket_exists, MONGODB_URI, MONGODB_DATABASE, MONGODB_COLLECTION_PREFIX
+    from .gold_agregation import SKETCH_COLUMN
+    from .schemas import gold_object_name, read_table
 except ImportError:
-    from config import BUCKET_GOLD, get_minio_client, MONGODB_URI, MONGODB_DATABASE, MONGODB_COLLECTION_PREFIX
+    from config import BUCKET_GOLD, bucket_exists, MONGODB_URI, MONGODB_DATABASE, MONGODB_COLLECTION_PREFIX
+    from gold_agregation import SKETCH_COLUMN
+    from schemas import gold_object_name, read_table
 
 
 @task(name="read_parquet_from_gold", retries=2)
-def read_parquet_from_gold(object_name: str) -> pd.DataFrame:
-    """Lit un fichier Parquet depuis le bucket Gold"""
+def read_parquet_from_gold(object_name: str, columns: list[str] | None = None,
+                           filters: list[tuple] | None = None) -> pd.DataFrame:
+    """Lit un fichier Parquet (ou CSV) depuis le bucket Gold, avec projection de colonnes et filtres de lignes"""
     logger = get_run_logger()
-    client = get_minio_client()
-    
-    if not client.bucket_exists(BUCKET_GOLD):
+
+    if not bucket_exists(BUCKET_GOLD):
         logger.error(f"Bucket {BUCKET_GOLD} does not exist")
         raise ValueError(f"Bucket {BUCKET_GOLD} does not exist")
 
-    if object_name.endswith('.csv'):
-        response = client.get_object(BUCKET_GOLD, object_name)
-        df = pd.read_csv(BytesIO(response.read()))
-    else:
-        response = client.get_object(BUCKET_GOLD, object_name)
-        df = pd.read_parquet(BytesIO(response.read()))
-    
-    response.close()
-    response.release_conn()
-    
+    df = read_table(BUCKET_GOLD, object_name, columns, filters)
+
     logger.info(f"Read {object_name} from {BUCKET_GOLD} ({len(df)} rows)")
     return df
 
 
+def to_records(df: pd.DataFrame) -> list[dict]:
+    """Convertit un DataFrame en documents : dates au format YYYY-MM-DD, valeurs manquantes à None"""
+    df = df.copy()
+    for column in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[column]):
+            df[column] = df[column].dt.strftime('%Y-%m-%d')
+    df = df.astype(object).where(df.notna(), None)
+    return df.to_dict('records')
+
+
 @task(name="write_to_mongodb", retries=2)
-def write_to_mongodb(df: pd.DataFrame, collection_name: str) -> str:
-    """Écrit un DataFrame dans MongoDB et enregistre les métadonnées de timing"""
+def write_to_mongodb(df: pd.DataFrame, collection_name: str, replace_filter: dict | None = None) -> str:
+    """
+    Écrit un DataFrame dans MongoDB et enregistre les métadonnées de timing.
+    Seuls les documents correspondant à replace_filter sont remplacés (toute la collection si None)
+    """
     logger = get_run_logger()
     
     if not MONGODB_URI:
@@ -57,9 +65,9 @@ def write_to_mongodb(df: pd.DataFrame, collection_name: str) -> str:
     db = client[MONGODB_DATABASE]
     collection = db[collection_name]
 
-    records = df.to_dict('records')
+    records = to_records(df)
 
-    collection.delete_many({})
+    collection.delete_many(replace_filter or {})
     if records:
         collection.insert_many(records)
 
@@ -92,32 +100,68 @@ def write_to_mongodb(df: pd.DataFrame, collection_name: str) -> str:
     return collection_name
 
 
+def date_key(value) -> int:
+    """Clé de date entière AAAAMMJJ (id_date) d'une date"""
+    return int(pd.Timestamp(value).strftime('%Y%m%d'))
+
+
+def fact_date_range(start_date: str | None, end_date: str | None) -> tuple[list[tuple] | None, dict | None]:
+    """
+    Filtres de lecture de la table de faits et filtre MongoDB des documents remplacés
+    pour une plage de dates (bornes incluses), (None, None) sans plage
+    """
+    bounds = {}
+    if start_date is not None:
+        bounds[">="] = date_key(start_date)
+    if end_date is not None:
+        bounds["<="] = date_key(end_date)
+    if not bounds:
+        return None, None
+    filters = [("id_date", op, key) for op, key in bounds.items()]
+    replace_filter = {"id_date": {{">=": "$gte", "<=": "$lte"}[op]: key for op, key in bounds.items()}}
+    return filters, replace_filter
+
+
 @flow(name="Gold to MongoDB Flow")
-def gold_to_mongodb_flow() -> dict:
-    """Flow qui lit depuis Gold et écrit dans MongoDB"""
+def gold_to_mongodb_flow(start_date: str | None = None, end_date: str | None = None) -> dict:
+    """
+    Flow qui lit depuis Gold et écrit dans MongoDB.
+
+    Avec start_date et/ou end_date (YYYY-MM-DD, inclus), seuls les faits de la plage sont exportés :
+    les partitions mensuelles et row groups hors plage ne sont pas lus, et seuls les documents de la
+    plage sont remplacés dans la collection des faits. Les autres tables sont exportées entièrement,
+    sans la colonne de sketches des clients distincts (SKETCH_COLUMN), réservée à gold.
+    """
     logger = get_run_logger()
-
-    files_to_export = [
-        "fact_achats.csv",
-        "kpis.csv",
-        "dim_clients.csv",
-        "dim_produits.csv",
-        "dim_dates.csv",
-        "agg_jour.csv",
-        "agg_semaine.csv",
-        "agg_mois.csv",
-        "ca_par_pays.csv"
+    fact_filters, fact_replace_filter = fact_date_range(start_date, end_date)
+
+    tables_to_export = [
+        "fact_achats",
+        "kpis",
+        "dim_clients",
+        "dim_produits",
+        "dim_dates",
+        "agg_jour",
+        "agg_semaine",
+        "agg_mois",
+        "ca_par_pays"
     ]
     
     results = {}
     
-    for file_name in files_to_export:
+    for table_name in tables_to_export:
+        file_name = gold_object_name(table_name)
         try:
-            df = read_parquet_from_gold(file_name)
-
-            collection_name = MONGODB_COLLECTION_PREFIX + file_name.replace('.csv', '')
-
-            collection = write_to_mongodb(df, collection_name)
+            collection_name = MONGODB_COLLECTION_PREFIX + table_name
+
+            if table_name == "fact_achats" and fact_filters:
+                df = read_parquet_from_gold(file_name, filters=fact_filters)
+                collection = write_to_mongodb(df, collection_name, replace_filter=fact_replace_filter)
+            else:
+                df = read_parquet_from_gold(file_name)
+                # Les sketches HyperLogLog sont un état interne de gold : ils ne sont pas publiés
+                df = df.drop(columns=[SKETCH_COLUMN], errors='ignore')
+                collection = write_to_mongodb(df, collection_name)
             results[file_name] = collection
             
         except Exception as e:
@@ -0,0 +1,172 @@
+from pathlib import Path
+
+import numpy as np
+
+# Gestion des imports pour fonctionner depuis flows/ ou depuis la racine
+try:
+    from .config import BUCKET_SILVER, KEY_INDEX_MAX_SEGMENTS, PIPELINE_STATE_DIR, ensure_bucket, get_minio_client
+except ImportError:
+    from config import BUCKET_SILVER, KEY_INDEX_MAX_SEGMENTS, PIPELINE_STATE_DIR, ensure_bucket, get_minio_client
+
+SEGMENT_DTYPE = np.dtype([("key", "<i8"), ("row_hash", "<u8")])
+
+
+class KeyIndex:
+    """
+    Persistent key index of a silver entity: key -> hash of the current row.
+
+    The index is a list of immutable segments, each a key-sorted array of
+    (key, row_hash) stored as a .npy object under _index/<entity>/ in the
+    silver bucket and cached on local disk, where it is memory-mapped.
+    Each merge adds one segment holding only the keys of its batch, so
+    writing costs O(batch). Lookups are vectorized over a whole batch: a
+    segment is skipped when the batch falls outside its [min, max] key
+    range (always the case for older segments when keys grow, as id_achat
+    does), and searched with np.searchsorted otherwise. Newer segments win
+    over older ones. Past KEY_INDEX_MAX_SEGMENTS segments, they are
+    compacted into one.
+    """
+
+    def __init__(self, entity: str | None = None):
+        self.entity = entity
+        self.segments = []
+        self.segment_names = []
+        self._next_segment = 0
+
+    @property
+    def local_dir(self) -> Path:
+        return Path(PIPELINE_STATE_DIR) / "index" / self.entity
+
+    @property
+    def prefix(self) -> str:
+        return f"_index/{self.entity}/"
+
+    @classmethod
+    def load(cls, entity: str) -> "KeyIndex":
+        """
+        Load the index of an entity, downloading only the segments missing
+        from the local cache.
+
+        Args:
+            entity: Entity name
+
+        Returns:
+            KeyIndex with memory-mapped segments
+        """
+        index = cls(entity)
+        client = get_minio_client()
+        ensure_bucket(BUCKET_SILVER)
+        index.local_dir.mkdir(parents=True, exist_ok=True)
+
+        names = sorted(
+            obj.object_name for obj in client.list_objects(BUCKET_SILVER, prefix=index.prefix)
+            if obj.object_name.endswith(".npy")
+        )
+        local_names = {path.name for path in index.local_dir.glob("*.npy")}
+        for name in names:
+            file_name = name.rsplit("/", 1)[-1]
+            if file_name not in local_names:
+                client.fget_object(BUCKET_SILVER, name, str(index.local_dir / file_name))
+        # Segments supprimés par une compaction
+        for file_name in local_names - {name.rsplit("/", 1)[-1] for name in names}:
+            (index.local_dir / file_name).unlink()
+
+        index.segments = [np.load(index.local_dir / name.rsplit("/", 1)[-1], mmap_mode="r") for name in names]
+        index.segment_names = names
+        if names:
+            index._next_segment = int(names[-1].rsplit("-", 1)[-1].split(".")[0]) + 1
+        return index
+
+    def __len__(self) -> int:
+        return sum(len(segment) for segment in self.segments)
+
+    def lookup(self, keys: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Look up a batch of keys.
+
+        Args:
+            keys: Keys to look up
+
+        Returns:
+            Tuple (found mask, row hash of found keys, 0 elsewhere)
+        """
+        keys = np.asarray(keys, dtype="int64")
+        found = np.zeros(len(keys), dtype=bool)
+        hashes = np.zeros(len(keys), dtype="uint64")
+
+        for segment in reversed(self.segments):
+            if len(segment) == 0:
+                continue
+            segment_keys = segment["key"]
+            candidates = ~found & (keys >= segment_keys[0]) & (keys <= segment_keys[-1])
+            if not candidates.any():
+                continue
+            candidate_keys = keys[candidates]
+            positions = np.searchsorted(segment_keys, candidate_keys)
+            hit = segment_keys[np.minimum(positions, len(segment) - 1)] == candidate_keys
+            candidate_rows = np.flatnonzero(candidates)[hit]
+            found[candidate_rows] = True
+            hashes[candidate_rows] = segment["row_hash"][positions[hit]]
+
+        return found, hashes
+
+    def contains(self, keys: np.ndarray) -> np.ndarray:
+        return self.lookup(keys)[0]
+
+    def add(self, keys: np.ndarray, hashes: np.ndarray | None = None) -> None:
+        """
+        Add (or update) a batch of keys as a new segment, persisted when
+        the index belongs to an entity.
+
+        Args:
+            keys: Unique keys of the batch
+            hashes: Row hash of each key (0 when only membership matters)
+        """
+        if len(keys) == 0:
+            return
+        segment = np.empty(len(keys), dtype=SEGMENT_DTYPE)
+        segment["key"] = keys
+        segment["row_hash"] = 0 if hashes is None else hashes
+        segment.sort(order="key")
+        self.segments.append(segment)
+        self.segment_names.append(self._persist_segment(segment) if self.entity is not None else None)
+
+        if len(self.segments) > KEY_INDEX_MAX_SEGMENTS:
+            self.compact()
+
+    def compact(self) -> None:
+        """Merge every segment into one, newest value of each key first."""
+        merged = np.concatenate(self.segments[::-1])
+        # Tri stable : pour une clé donnée, la version du segment le plus récent reste en premier
+        merged = merged[np.argsort(merged["key"], kind="stable")]
+        keep = np.ones(len(merged), dtype=bool)
+        keep[1:] = merged["key"][1:] != merged["key"][:-1]
+        merged = merged[keep]
+
+        old_names = self.segment_names
+        self.segments = [merged]
+        self.segment_names = [self._persist_segment(merged) if self.entity is not None else None]
+        if self.entity is not None:
+            client = get_minio_client()
+            for name in old_names:
+                client.remove_object(BUCKET_SILVER, name)
+                (self.local_dir / name.rsplit("/", 1)[-1]).unlink(missing_ok=True)
+
+    def _persist_segment(self, segment: np.ndarray) -> str:
+        file_name = f"segment-{self._next_segment:06d}.npy"
+        self._next_segment += 1
+        self.local_dir.mkdir(parents=True, exist_ok=True)
+        local_path = self.local_dir / file_name
+        np.save(local_path, segment)
+        get_minio_client().fput_object(BUCKET_SILVER, self.prefix + file_name, str(local_path))
+        return self.prefix + file_name
+
+    @classmethod
+    def clear(cls, entity: str) -> None:
+        """Remove every segment of an entity, in silver and in the local cache."""
+        index = cls(entity)
+        client = get_minio_client()
+        for obj in client.list_objects(BUCKET_SILVER, prefix=index.prefix):
+            client.remove_object(BUCKET_SILVER, obj.object_name)
+        for path in index.local_dir.glob("*.npy"):
+            path.unlink()
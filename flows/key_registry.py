@@ -0,0 +1,67 @@
+import pandas as pd
+
+# Gestion des imports pour fonctionner depuis flows/ ou depuis la racine
+try:
+    from .state import load_state, save_state
+except ImportError:
+    from state import load_state, save_state
+
+# Document d'état des clés de substitution, par dimension
+KEY_REGISTRY_STATE = "key_registry"
+
+
+class KeyRegistry:
+    """
+    Surrogate keys of the members of a dimension: natural key -> integer id.
+
+    Members get ids 1, 2, ... in order of first appearance. A member keeps
+    its id for the lifetime of the registry, even when it disappears from
+    the data and comes back, and ids are never reused: a new member only
+    adds a row to its dimension, and the ids already stored in the fact
+    table, in MongoDB or in consumers' caches stay valid.
+
+    A registry belonging to a dimension is persisted in the
+    KEY_REGISTRY_STATE document as soon as new members are assigned; an
+    unnamed registry lives in memory only (ids by first appearance, as in
+    a full recompute).
+    """
+
+    def __init__(self, dimension: str | None = None, keys: dict | None = None):
+        self.dimension = dimension
+        self.keys = dict(keys or {})
+        self.next_id = max(self.keys.values(), default=0) + 1
+
+    @classmethod
+    def load(cls, dimension: str) -> "KeyRegistry":
+        """Load the persisted registry of a dimension (empty if never saved)."""
+        return cls(dimension, load_state(KEY_REGISTRY_STATE).get(dimension, {}))
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def assign(self, members) -> pd.arrays.IntegerArray:
+        """
+        Return the id of each member, assigning the next ids to new
+        members (in order of first appearance).
+
+        Args:
+            members: Natural keys (strings), missing values allowed
+
+        Returns:
+            Int64 array of ids, <NA> for missing members
+        """
+        members = pd.Series(members, dtype=object)
+        uniques = members.dropna().unique()
+        new_members = [member for member in uniques if member not in self.keys]
+        if new_members:
+            for member in new_members:
+                self.keys[member] = self.next_id
+                self.next_id += 1
+            if self.dimension is not None:
+                self.save()
+        return pd.array(members.map(self.keys), dtype="Int64")
+
+    def save(self) -> None:
+        state = load_state(KEY_REGISTRY_STATE)
+        state[self.dimension] = self.keys
+        save_state(KEY_REGISTRY_STATE, state)
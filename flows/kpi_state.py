@@ -0,0 +1,201 @@
+import math
+from pathlib import Path
+from uuid import uuid4
+
+import numpy as np
+import pandas as pd
+
+# Gestion des imports pour fonctionner depuis flows/ ou depuis la racine
+try:
+    from .config import PIPELINE_STATE_DIR, QUANTILE_SKETCH_ALPHA
+    from .sketches import QuantileSketch
+    from .state import load_state, save_state
+except ImportError:
+    from config import PIPELINE_STATE_DIR, QUANTILE_SKETCH_ALPHA
+    from sketches import QuantileSketch
+    from state import load_state, save_state
+
+# Document d'état des KPIs (accumulateurs, sketch, CA par mois) et fichier des sommes par client
+KPI_STATE = "kpi_state"
+CLIENTS_DTYPE = np.dtype([("id_client", "<i8"), ("ca_total", "<f8"), ("nb_achats", "<i8")])
+
+
+class KpiState:
+    """
+    Mergeable state of the gold KPIs, updated with the achats added to or
+    removed from the fact table instead of a scan of the whole table.
+
+    Accumulators: count, sum and sum of squared deviations of the amounts
+    (merged with Chan's formulas, numerically stable where a raw sum of
+    squares is not), min and max, a QuantileSketch of the amounts for the
+    median (relative error QUANTILE_SKETCH_ALPHA), the CA and count of each
+    month, and the CA and count of each client. Adding or removing a batch
+    costs O(batch), except when a removed amount was the min or the max:
+    the extremes are then stale until refresh_extremes is called.
+
+    The scalars, the sketch and the months are stored in a state document
+    (see load_state), the per-client sums in a .npy file next to it,
+    renamed on each save so that the document always points to a complete
+    file.
+    """
+
+    def __init__(self, alpha: float = QUANTILE_SKETCH_ALPHA):
+        self.count = 0
+        self.total = 0.0
+        self.m2 = 0.0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+        self.stale_extremes = False
+        self.sketch = QuantileSketch(alpha=alpha)
+        # CA et nombre d'achats par mois (YYYY-MM) et par id_client
+        self.months = self._empty_sums(pd.Index([], dtype=object))
+        self.clients = self._empty_sums(pd.Index([], dtype="int64"))
+        # Partitions silver d'achats reflétées par l'état
+        self.parts = []
+
+    @classmethod
+    def from_facts(cls, fact_table: pd.DataFrame, parts: list[str] | None = None) -> "KpiState":
+        """Build the state of a whole fact table (exact recompute)."""
+        state = cls()
+        state.add(fact_table)
+        state.parts = list(parts or [])
+        return state
+
+    @staticmethod
+    def _empty_sums(index: pd.Index) -> pd.DataFrame:
+        return pd.DataFrame({"ca_total": pd.Series(dtype="float64"), "nb_achats": pd.Series(dtype="int64")}, index=index)
+
+    @staticmethod
+    def _group_sums(achats: pd.DataFrame, keys) -> pd.DataFrame:
+        return achats['montant'].groupby(keys, observed=True).agg(['sum', 'count']).set_axis(
+            ['ca_total', 'nb_achats'], axis=1
+        )
+
+    @staticmethod
+    def _merge_sums(current: pd.DataFrame, delta: pd.DataFrame, sign: int) -> pd.DataFrame:
+        merged = current.add(delta * sign, fill_value=0)
+        merged['nb_achats'] = merged['nb_achats'].astype('int64')
+        # Groupes vidés par des suppressions
+        return merged[merged['nb_achats'] > 0]
+
+    def add(self, achats: pd.DataFrame, sign: int = 1) -> "KpiState":
+        """
+        Fold a batch of achats into the state, or remove it with sign=-1.
+
+        Args:
+            achats: Rows with montant, id_client and date_achat
+            sign: 1 to add the rows, -1 to remove rows previously added
+
+        Returns:
+            The same state
+        """
+        achats = achats.dropna(subset=['montant'])
+        montants = achats['montant'].to_numpy(dtype=np.float64)
+        if montants.size == 0:
+            return self
+
+        batch_count = montants.size
+        batch_mean = montants.mean()
+        batch_m2 = float(((montants - batch_mean) ** 2).sum())
+        if sign > 0:
+            count = self.count + batch_count
+            delta = batch_mean - (self.total / self.count if self.count else 0.0)
+            self.m2 += batch_m2 + delta ** 2 * self.count * batch_count / count
+            self.total += float(montants.sum())
+            self.minimum = min(self.minimum, float(montants.min()))
+            self.maximum = max(self.maximum, float(montants.max()))
+        else:
+            count = self.count - batch_count
+            total = self.total - float(montants.sum())
+            delta = batch_mean - (total / count if count else 0.0)
+            self.m2 = max(self.m2 - batch_m2 - delta ** 2 * count * batch_count / self.count, 0.0) if count else 0.0
+            self.total = total if count else 0.0
+            if montants.min() <= self.minimum or montants.max() >= self.maximum:
+                self.stale_extremes = True
+        self.count = count
+        self.sketch.add(montants, sign)
+
+        months = achats['date_achat'].dt.to_period('M').astype(str)
+        self.months = self._merge_sums(self.months, self._group_sums(achats, months.to_numpy()), sign)
+        id_clients = achats['id_client'].to_numpy(dtype=np.int64)
+        self.clients = self._merge_sums(self.clients, self._group_sums(achats, id_clients), sign)
+        return self
+
+    def remove(self, achats: pd.DataFrame) -> "KpiState":
+        """Remove a batch of achats previously added."""
+        return self.add(achats, sign=-1)
+
+    def refresh_extremes(self, montants: pd.Series) -> None:
+        """Recompute the min and max from every amount, after removals made them stale."""
+        self.minimum = float(montants.min()) if self.count else math.inf
+        self.maximum = float(montants.max()) if self.count else -math.inf
+        self.stale_extremes = False
+
+    def kpis(self) -> dict:
+        """KPIs of the state, with the keys and order of the exact computation."""
+        months = self.months.sort_index()['ca_total']
+        growth = None
+        if len(months) >= 2:
+            growth = ((months.iloc[-1] - months.iloc[-2]) / months.iloc[-2]) * 100
+        return {
+            'ca_total': self.total,
+            'nb_achats_total': self.count,
+            'panier_moyen': self.total / self.count if self.count else math.nan,
+            'nb_clients_uniques': len(self.clients),
+            'montant_moyen_par_client': self.clients['ca_total'].mean(),
+            'taux_croissance_mensuel': growth,
+            'montant_median': self.sketch.quantile(0.5),
+            'montant_std': math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else math.nan,
+            'montant_min': self.minimum if self.count else math.nan,
+            'montant_max': self.maximum if self.count else math.nan
+        }
+
+    @classmethod
+    def load(cls) -> "KpiState | None":
+        """Load the persisted state, None if it was never saved."""
+        data = load_state(KPI_STATE)
+        if not data:
+            return None
+        state = cls(alpha=data["sketch"]["alpha"])
+        state.count = data["count"]
+        state.total = data["total"]
+        state.m2 = data["m2"]
+        state.minimum = data["minimum"]
+        state.maximum = data["maximum"]
+        state.stale_extremes = data["stale_extremes"]
+        state.sketch = QuantileSketch.from_dict(data["sketch"])
+        state.months = pd.DataFrame(
+            data["months"].values(), index=list(data["months"]), columns=["ca_total", "nb_achats"]
+        ).astype({"ca_total": "float64", "nb_achats": "int64"})
+        clients = np.load(Path(PIPELINE_STATE_DIR) / data["clients_file"])
+        state.clients = pd.DataFrame(
+            {"ca_total": clients["ca_total"], "nb_achats": clients["nb_achats"]}, index=clients["id_client"]
+        )
+        state.parts = data["parts"]
+        return state
+
+    def save(self) -> None:
+        """Persist the state: the per-client file first, then the document pointing to it."""
+        previous = load_state(KPI_STATE).get("clients_file")
+        clients = np.empty(len(self.clients), dtype=CLIENTS_DTYPE)
+        clients["id_client"] = self.clients.index.to_numpy()
+        clients["ca_total"] = self.clients["ca_total"].to_numpy()
+        clients["nb_achats"] = self.clients["nb_achats"].to_numpy()
+        clients_file = f"{KPI_STATE}-clients-{uuid4().hex}.npy"
+        Path(PIPELINE_STATE_DIR).mkdir(parents=True, exist_ok=True)
+        np.save(Path(PIPELINE_STATE_DIR) / clients_file, clients)
+
+        save_state(KPI_STATE, {
+            "count": self.count,
+            "total": self.total,
+            "m2": self.m2,
+            "minimum": self.minimum,
+            "maximum": self.maximum,
+            "stale_extremes": self.stale_extremes,
+            "sketch": self.sketch.to_dict(),
+            "months": {month: [row.ca_total, int(row.nb_achats)] for month, row in self.months.iterrows()},
+            "clients_file": clients_file,
+            "parts": self.parts
+        })
+        if previous and previous != clients_file:
+            (Path(PIPELINE_STATE_DIR) / previous).unlink(missing_ok=True)
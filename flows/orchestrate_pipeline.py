@@ -27,13 +27,16 @@ except ImportError:
 
 
 @flow(name="ELT Pipeline Orchestrator", log_prints=True)
-def elt_pipeline_orchestrator(data_dir: str = "./data/sources") -> dict:
+def elt_pipeline_orchestrator(data_dir: str = "./data/sources", force: bool = False) -> dict:
     """
     Orchestrateur principal du pipeline ELT.
     Exécute les trois couches dans l'ordre : Bronze → Silver → Gold -> MongoDB.
+    Si aucun fichier source n'a changé depuis la dernière ingestion, les
+    couches suivantes ne sont pas relancées.
 
     Args:
         data_dir: Répertoire contenant les fichiers sources CSV
+        force: Ré-ingère et recalcule toutes les couches même sans changement
 
     Returns:
         Dictionnaire avec les résultats de chaque couche
@@ -51,19 +54,26 @@ def elt_pipeline_orchestrator(data_dir: str = "./data/sources") -> dict:
     logger.info("COUCHE BRONZE - Ingestion des données")
     logger.info("="*60)
     try:
-        bronze_result = bronze_ingestion_flow(data_dir=data_dir)
+        bronze_result = bronze_ingestion_flow(data_dir=data_dir, force=force)
         results["bronze"] = bronze_result
         logger.info(f"Bronze terminé : {bronze_result}")
     except Exception as e:
         logger.error(f"Erreur dans la couche Bronze : {e}")
         raise
+
+    if bronze_result["status"] == "no-op":
+        logger.info("\n" + "="*60)
+        logger.info("AUCUNE NOUVELLE DONNÉE - Silver, Gold et MongoDB ne sont pas relancés")
+        logger.info("="*60)
+        results["status"] = "no-op"
+        return results
     
     # 2. Couche Silver
     logger.info("\n" + "="*60)
     logger.info("COUCHE SILVER - Transformation des données")
     logger.info("="*60)
     try:
-        silver_result = silver_ingestion_flow()
+        silver_result = silver_ingestion_flow(bronze_objects=bronze_result)
         results["silver"] = silver_result
         logger.info(f"Silver terminé : {silver_result}")
     except Exception as e:
@@ -104,7 +114,8 @@ def elt_pipeline_orchestrator(data_dir: str = "./data/sources") -> dict:
     logger.info(f"  Gold   : {len(results.get('gold', {}))} tables créées")
     logger.info(f"  MongoDB: {len([r for r in results.get('mongodb', {}).values() if not str(r).startswith('ERROR')])} collections créées")
     logger.info("="*60)
-    
+
+    results["status"] = "updated"
     return results
 
 
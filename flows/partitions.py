@@ -0,0 +1,96 @@
+import re
+
+from minio import Minio
+
+# Entités stockées en partitions append-only, avec leur clé de watermark
+PARTITIONED_ENTITIES = {"achats": "id_achat"}
+# Clé métier de chaque entité (déduplication et fusion silver)
+ENTITY_KEYS = {"clients": "id_client", "achats": "id_achat"}
+
+PART_PATTERN = re.compile(r"part-(\d+)\.\w+$")
+# Partitions Hive par mois de date des tables gold (annee=YYYY/mois=MM/)
+MONTH_PARTITION_PATTERN = re.compile(r"annee=(\d{4})/mois=(\d{2})/")
+
+
+def partition_prefix(entity: str, ingest_date: str) -> str:
+    return f"{entity}/ingest_date={ingest_date}/"
+
+
+def part_object_name(prefix: str, part_number: int, extension: str = "csv") -> str:
+    return f"{prefix}part-{part_number:05d}.{extension}"
+
+
+def list_partition_objects(client: Minio, bucket: str, entity: str) -> list[str]:
+    """
+    List every part object of a partitioned entity, oldest partition first.
+
+    Args:
+        client: MinIO client
+        bucket: Bucket holding the partitions
+        entity: Entity name (prefix of the partitions)
+
+    Returns:
+        Sorted part object names
+    """
+    return sorted(
+        obj.object_name
+        for obj in client.list_objects(bucket, prefix=f"{entity}/", recursive=True)
+        if PART_PATTERN.search(obj.object_name)
+    )
+
+
+def next_part_number(client: Minio, bucket: str, prefix: str) -> int:
+    """
+    Return the first unused part number under a partition prefix.
+
+    Args:
+        client: MinIO client
+        bucket: Bucket holding the partition
+        prefix: Partition prefix
+
+    Returns:
+        Next part number (0 for an empty partition)
+    """
+    numbers = [
+        int(match.group(1))
+        for obj in client.list_objects(bucket, prefix=prefix)
+        if (match := PART_PATTERN.search(obj.object_name))
+    ]
+    return max(numbers, default=-1) + 1
+
+
+def month_partition_prefix(table: str, month: int) -> str:
+    """Prefix of the partition of a month YYYYMM of a month-partitioned table."""
+    return f"{table}/annee={month // 100:04d}/mois={month % 100:02d}/"
+
+
+def partition_month(object_name: str) -> int | None:
+    """Month YYYYMM of an object of a month-partitioned table (None outside any month partition)."""
+    match = MONTH_PARTITION_PATTERN.search(object_name)
+    return int(match.group(1)) * 100 + int(match.group(2)) if match else None
+
+
+def list_month_partition_objects(client: Minio, bucket: str, table: str,
+                                 first_month: int | None = None, last_month: int | None = None) -> list[str]:
+    """
+    List the part objects of a month-partitioned table, oldest month
+    first, skipping the months outside [first_month, last_month].
+
+    Args:
+        client: MinIO client
+        bucket: Bucket holding the table
+        table: Table name (prefix of the partitions)
+        first_month: First month YYYYMM to keep (no lower bound if None)
+        last_month: Last month YYYYMM to keep (no upper bound if None)
+
+    Returns:
+        Sorted part object names
+    """
+    names = []
+    for obj in client.list_objects(bucket, prefix=f"{table}/", recursive=True):
+        month = partition_month(obj.object_name)
+        if month is None or not PART_PATTERN.search(obj.object_name):
+            continue
+        if (first_month is None or month >= first_month) and (last_month is None or month <= last_month):
+            names.append(obj.object_name)
+    return sorted(names)
@@ -0,0 +1,111 @@
+import os
+import time
+from pathlib import Path
+from uuid import uuid4
+
+import pandas as pd
+import pyarrow as pa
+from prefect.serializers import PickleSerializer, Serializer
+from pydantic import Field
+
+# Gestion des imports pour fonctionner depuis flows/ ou depuis la racine
+try:
+    from .config import PERSIST_TASK_RESULTS, RESULT_RETENTION_HOURS, RESULT_STORAGE_DIR
+except ImportError:
+    from config import PERSIST_TASK_RESULTS, RESULT_RETENTION_HOURS, RESULT_STORAGE_DIR
+
+# Sous-dossier des tables Arrow IPC et préfixe des références stockées dans les résultats Prefect
+FRAMES_DIR = "frames"
+REFERENCE_PREFIX = b"arrow-ipc:"
+# Métadonnées du schéma IPC : types pandas d'origine (l'aller-retour Arrow change le type des catégories)
+DTYPES_METADATA_KEY = b"pipeline.dtypes"
+
+
+class ArrowIPCSerializer(Serializer):
+    """
+    Prefect result serializer storing DataFrames as Arrow IPC files.
+
+    A DataFrame result is written once, uncompressed, to a file under
+    FRAMES_DIR (in shared memory by default, see RESULT_STORAGE_DIR) and
+    the result record only holds a reference to it. Loading memory-maps
+    the file: the Arrow buffers are views of the mapping, and numeric,
+    date and string columns are handed to pandas without a copy. The
+    pandas dtypes are kept in the schema metadata and restored on load.
+    Other results (dicts, names) are pickled like with the default
+    serializer.
+    """
+
+    type: str = Field(default="arrow-ipc", frozen=True)
+
+    directory: str = RESULT_STORAGE_DIR
+
+    def dumps(self, obj) -> bytes:
+        if not isinstance(obj, pd.DataFrame):
+            return PickleSerializer().dumps(obj)
+        try:
+            table = pa.Table.from_pandas(obj)
+            table = table.replace_schema_metadata({
+                **table.schema.metadata, DTYPES_METADATA_KEY: PickleSerializer().dumps(obj.dtypes.to_dict())
+            })
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            # Colonne objet de types mélangés : pas de représentation Arrow
+            return PickleSerializer().dumps(obj)
+
+        path = Path(self.directory) / FRAMES_DIR / f"{uuid4().hex}.arrow"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        with pa.OSFile(str(tmp_path), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp_path, path)
+        return REFERENCE_PREFIX + str(path).encode()
+
+    def loads(self, blob: bytes):
+        if not blob.startswith(REFERENCE_PREFIX):
+            return PickleSerializer().loads(blob)
+        path = blob[len(REFERENCE_PREFIX):].decode()
+        table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+        df = table.to_pandas(split_blocks=True, date_as_object=False)
+        dtypes = PickleSerializer().loads(table.schema.metadata[DTYPES_METADATA_KEY])
+        return df.astype({name: dtype for name, dtype in dtypes.items() if df[name].dtype != dtype})
+
+
+def result_settings(persist: bool = PERSIST_TASK_RESULTS) -> dict:
+    """
+    Result options of the silver and gold flows, inherited by their tasks:
+    Arrow IPC serializer, records stored locally next to the Arrow files.
+
+    Args:
+        persist: Persist the task results (a serializer alone would turn
+            persistence on)
+
+    Returns:
+        Keyword arguments for @flow
+    """
+    return {
+        "persist_result": persist,
+        "result_serializer": ArrowIPCSerializer(),
+        "result_storage": Path(RESULT_STORAGE_DIR),
+    }
+
+
+def purge_results(max_age_hours: float = RESULT_RETENTION_HOURS) -> int:
+    """
+    Remove the result records and Arrow files older than max_age_hours.
+
+    Args:
+        max_age_hours: Retention of the results
+
+    Returns:
+        Number of removed files
+    """
+    cutoff = time.time() - max_age_hours * 3600
+    removed = 0
+    for path in Path(RESULT_STORAGE_DIR).rglob("*"):
+        try:
+            if path.is_file() and path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed += 1
+        except FileNotFoundError:
+            # Fichier supprimé par un autre processus
+            continue
+    return removed
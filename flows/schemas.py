@@ -0,0 +1,348 @@
+import operator
+from io import BytesIO
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+# Gestion des imports pour fonctionner depuis flows/ ou depuis la racine
+try:
+    from .config import (
+        BRONZE_CSV_BLOCK_SIZE, BRONZE_FORMAT, GOLD_FORMAT, PARQUET_COMPRESSION, PARQUET_ROW_GROUP_SIZE, SILVER_FORMAT,
+        get_arrow_filesystem, get_minio_client
+    )
+    from .dates import parse_date_columns, parse_dates
+    from .partitions import list_month_partition_objects
+except ImportError:
+    from config import (
+        BRONZE_CSV_BLOCK_SIZE, BRONZE_FORMAT, GOLD_FORMAT, PARQUET_COMPRESSION, PARQUET_ROW_GROUP_SIZE, SILVER_FORMAT,
+        get_arrow_filesystem, get_minio_client
+    )
+    from dates import parse_date_columns, parse_dates
+    from partitions import list_month_partition_objects
+
+# Schémas déclarés des fichiers sources
+SCHEMAS = {
+    "clients": pa.schema([
+        ("id_client", pa.int64()),
+        ("nom", pa.string()),
+        ("email", pa.string()),
+        ("date_inscription", pa.date32()),
+        ("pays", pa.string()),
+    ]),
+    "achats": pa.schema([
+        ("id_achat", pa.int64()),
+        ("id_client", pa.int64()),
+        ("date_achat", pa.date32()),
+        ("montant", pa.float64()),
+        ("produit", pa.string()),
+    ]),
+}
+
+# Colonnes à faible cardinalité, stockées en catégories en mémoire
+CATEGORICAL_COLUMNS = ("pays", "produit")
+
+
+def compact_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cast the columns of an entity DataFrame to compact dtypes, in place:
+    ids to the narrowest signed integer type holding their values,
+    CATEGORICAL_COLUMNS to categoricals (one code per row instead of one
+    string) and other text columns to Arrow-backed strings. Amounts stay
+    float64 so that sums are unchanged.
+
+    Args:
+        df: DataFrame to compact
+
+    Returns:
+        The same DataFrame
+    """
+    for column in df.columns:
+        series = df[column]
+        if column in CATEGORICAL_COLUMNS:
+            if not isinstance(series.dtype, pd.CategoricalDtype):
+                df[column] = series.astype('string[pyarrow]').astype('category')
+        elif column.startswith('id_') and pd.api.types.is_integer_dtype(series):
+            df[column] = pd.to_numeric(series, downcast='integer')
+        elif pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+            df[column] = series.astype('string[pyarrow]')
+    return df
+
+
+def memory_mb(df: pd.DataFrame) -> float:
+    """Memory footprint of a DataFrame in MB, string contents included."""
+    return df.memory_usage(deep=True).sum() / (1024 * 1024)
+
+
+def to_bronze_name(object_name: str) -> str:
+    """Return the bronze object name of a source object for BRONZE_FORMAT."""
+    if BRONZE_FORMAT == "parquet" and object_name.endswith(".csv"):
+        return object_name[:-len(".csv")] + ".parquet"
+    return object_name
+
+
+def silver_object_name(name: str) -> str:
+    """Return the silver object name of a table for SILVER_FORMAT."""
+    return f"{name}.{SILVER_FORMAT}"
+
+
+# Tables gold partitionnées par mois (annee=/mois=), avec leur clé de date AAAAMMJJ
+MONTH_PARTITIONED_TABLES = {"fact_achats": "id_date"}
+
+
+def gold_object_name(name: str) -> str:
+    """
+    Return the gold object name of a table for GOLD_FORMAT: the prefix of
+    its partitions for MONTH_PARTITIONED_TABLES.
+    """
+    if name in MONTH_PARTITIONED_TABLES:
+        return f"{name}/"
+    return f"{name}.{GOLD_FORMAT}"
+
+
+def to_arrow_table(df: pd.DataFrame, schema: pa.Schema | None = None) -> pa.Table:
+    """
+    Convert a DataFrame to an Arrow table. Period columns are written as
+    strings, as in CSV outputs.
+
+    Args:
+        df: DataFrame to convert
+        schema: Target schema (columns selected and cast), inferred if None
+
+    Returns:
+        Arrow table
+    """
+    periods = [column for column in df.columns if isinstance(df[column].dtype, pd.PeriodDtype)]
+    if periods:
+        df = df.assign(**{column: df[column].astype(str) for column in periods})
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if schema is None:
+        return table
+    return table.select(schema.names).cast(schema)
+
+
+def serialize_table(df: pd.DataFrame, object_name: str, schema: pa.Schema | None = None) -> BytesIO:
+    """
+    Serialize a DataFrame in the format given by the extension of its
+    object name: Parquet (typed, compressed, with row-group statistics)
+    or CSV.
+
+    Args:
+        df: DataFrame to serialize
+        object_name: Target object name (.parquet or .csv)
+        schema: Parquet schema, inferred if None
+
+    Returns:
+        Buffer positioned at its start
+    """
+    buffer = BytesIO()
+    if object_name.endswith(".parquet"):
+        pq.write_table(
+            to_arrow_table(df, schema),
+            buffer,
+            compression=PARQUET_COMPRESSION,
+            row_group_size=PARQUET_ROW_GROUP_SIZE,
+            write_statistics=True
+        )
+    else:
+        df.to_csv(buffer, index=False, encoding='utf-8')
+    buffer.seek(0)
+    return buffer
+
+
+FILTER_OPERATORS = {
+    "=": operator.eq, "==": operator.eq, "!=": operator.ne,
+    "<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge,
+    "in": lambda series, values: series.isin(values),
+    "not in": lambda series, values: ~series.isin(values),
+}
+
+
+def apply_filters(df: pd.DataFrame, filters: list[tuple] | None) -> pd.DataFrame:
+    """Apply (column, op, value) filters, all required to match, to a DataFrame."""
+    if not filters:
+        return df
+    mask = pd.Series(True, index=df.index)
+    for column, op, value in filters:
+        series = df[column]
+        if pd.api.types.is_datetime64_any_dtype(series) and op not in ("in", "not in"):
+            value = pd.Timestamp(value)
+        mask &= FILTER_OPERATORS[op](series, value)
+    return df[mask.to_numpy()]
+
+
+def month_bounds(filters: list[tuple] | None, column: str) -> tuple[int | None, int | None]:
+    """
+    First and last months YYYYMM that rows matching the filters on a date
+    key column (YYYYMMDD) can belong to, None when unbounded.
+    """
+    first, last = None, None
+    for name, op, value in filters or []:
+        if name != column:
+            continue
+        if op == "in":
+            value = list(value)
+            if not value:
+                continue
+            low, high = min(value) // 100, max(value) // 100
+        elif op in ("=", "=="):
+            low = high = value // 100
+        else:
+            low = value // 100 if op in (">", ">=") else None
+            high = value // 100 if op in ("<", "<=") else None
+        if low is not None:
+            first = low if first is None else max(first, low)
+        if high is not None:
+            last = high if last is None else min(last, high)
+    return first, last
+
+
+def read_month_partitions(bucket: str, table: str, columns: list[str] | None = None,
+                          filters: list[tuple] | None = None) -> pd.DataFrame:
+    """
+    Read a month-partitioned table (see MONTH_PARTITIONED_TABLES). Months
+    excluded by the filters on its date key are not read at all; each
+    remaining part is read with the filters, and its row groups, sorted
+    by date, are skipped when their statistics exclude them.
+
+    Args:
+        bucket: Bucket name
+        table: Table name (prefix of the partitions)
+        columns: Columns to read, all if None
+        filters: (column, op, value) tuples, all required to match
+
+    Returns:
+        DataFrame with the selected rows and columns, oldest month first
+    """
+    first_month, last_month = month_bounds(filters, MONTH_PARTITIONED_TABLES[table])
+    part_names = list_month_partition_objects(get_minio_client(), bucket, table, first_month, last_month)
+    frames = [read_table(bucket, part_name, columns, filters) for part_name in part_names]
+    if not frames:
+        return pd.DataFrame(columns=columns or [])
+    return pd.concat(frames, ignore_index=True)
+
+
+def read_table(bucket: str, object_name: str, columns: list[str] | None = None,
+               filters: list[tuple] | None = None) -> pd.DataFrame:
+    """
+    Read a silver or gold table with column projection and row filters.
+
+    Parquet objects are read through the Arrow S3 filesystem: only the
+    requested column chunks are fetched, and row groups whose statistics
+    exclude the filters are skipped. CSV objects are read whole, then
+    projected and filtered. Date columns come back as datetime64. A
+    prefix (name ending with /) is read as a month-partitioned table (see
+    read_month_partitions).
+
+    Args:
+        bucket: Bucket name
+        object_name: Object name (.parquet or .csv), or partitions prefix
+        columns: Columns to read, all if None
+        filters: (column, op, value) tuples, all required to match
+            (op among =, ==, !=, <, <=, >, >=, in, not in)
+
+    Returns:
+        DataFrame with the selected rows and columns
+    """
+    if object_name.endswith("/"):
+        return read_month_partitions(bucket, object_name.rstrip("/"), columns, filters)
+    if object_name.endswith(".parquet"):
+        table = pq.read_table(f"{bucket}/{object_name}", filesystem=get_arrow_filesystem(), columns=columns,
+                              filters=filters)
+        return table.to_pandas(date_as_object=False)
+
+    usecols = None
+    if columns is not None:
+        usecols = list(dict.fromkeys(list(columns) + [column for column, _, _ in filters or []]))
+    response = get_minio_client().get_object(bucket, object_name)
+    try:
+        # round_trip : les flottants relus sont ceux qui ont été écrits (tables gold fusionnées en incrémental)
+        df = parse_date_columns(pd.read_csv(BytesIO(response.read()), usecols=usecols, float_precision='round_trip'))
+    finally:
+        response.close()
+        response.release_conn()
+    df = apply_filters(df, filters)
+    return df[columns] if columns is not None else df
+
+
+def cast_to_schema(batch: pa.RecordBatch, schema: pa.Schema) -> pa.RecordBatch:
+    """
+    Cast the string columns of a CSV record batch to their declared types.
+    A value that does not convert becomes null: non-numeric or, for
+    integer columns, non-integral numbers, and dates not in DATE_FORMAT.
+
+    Args:
+        batch: Record batch with the columns of schema read as strings
+        schema: Declared schema of the entity
+
+    Returns:
+        Record batch with the schema
+    """
+    columns = []
+    for field in schema:
+        values = batch.column(field.name)
+        if pa.types.is_integer(field.type) or pa.types.is_floating(field.type):
+            numbers = pd.to_numeric(values.to_pandas(), errors='coerce')
+            if pa.types.is_integer(field.type):
+                numbers = numbers.where(numbers % 1 == 0)
+            values = pa.array(numbers, type=field.type, from_pandas=True)
+        elif pa.types.is_date(field.type):
+            values = pa.array(parse_dates(values.to_pandas()), type=field.type, from_pandas=True)
+        columns.append(values)
+    return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+
+def stream_csv_to_parquet(source, output_path: str, schema: pa.Schema, key: str | None = None,
+                          watermark: int | None = None) -> tuple[int, int | None, int]:
+    """
+    Convert a CSV stream to a typed Parquet file batch by batch.
+
+    Each record batch read by the streaming Arrow CSV reader is cast to
+    the declared schema (see cast_to_schema) and becomes one row group, so
+    memory stays bounded by BRONZE_CSV_BLOCK_SIZE. A malformed cell
+    (non-numeric amount, date not in DATE_FORMAT) lands as null instead
+    of failing the file, and silver rejects its row as valeur_manquante.
+
+    Args:
+        source: File-like object or path of the CSV data
+        output_path: Local path of the Parquet file to write
+        schema: Declared schema of the entity (selects the columns)
+        key: Optional integer column used to keep only rows above watermark
+        watermark: Highest key already landed
+
+    Returns:
+        Tuple (number of rows written, highest key written or None, number
+        of rows skipped because their key is not above watermark)
+    """
+    reader = pacsv.open_csv(
+        source,
+        read_options=pacsv.ReadOptions(block_size=BRONZE_CSV_BLOCK_SIZE),
+        convert_options=pacsv.ConvertOptions(
+            column_types={name: pa.string() for name in schema.names},
+            include_columns=schema.names,
+            strings_can_be_null=True
+        )
+    )
+    rows = 0
+    skipped = 0
+    max_key = None
+
+    with pq.ParquetWriter(output_path, schema, compression=PARQUET_COMPRESSION) as writer:
+        for batch in reader:
+            batch = cast_to_schema(batch, schema)
+            if key is not None:
+                # Les clés nulles (absentes ou non numériques) ne dépassent jamais le watermark
+                keys = batch.column(key).to_pandas()
+                above = (keys > watermark).to_numpy()
+                skipped += int((~above).sum())
+                batch = batch.filter(pa.array(above))
+            if batch.num_rows == 0:
+                continue
+            writer.write_batch(batch)
+            rows += batch.num_rows
+            if key is not None:
+                batch_max = int(keys[above].max())
+                max_key = batch_max if max_key is None else max(max_key, batch_max)
+
+    return rows, max_key, skipped
@@ -3,25 +3,76 @@ from dotenv import load_dotenv
 load_dotenv()
 os.environ["PREFECT_API_URL"] = os.getenv("PREFECT_API_URL")
 
+import multiprocessing
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from fnmatch import fnmatch
 from io import BytesIO
 from pathlib import Path
 
+from minio.error import S3Error
 from prefect import flow, task
 from prefect.logging import get_run_logger
 
+import numpy as np
 import pandas as pd
+import pyarrow.parquet as pq
 
 # Gestion des imports pour fonctionner depuis flows/ ou depuis la racine
 try:
-    from .config import BUCKET_BRONZE, BUCKET_SILVER, get_minio_client
+    from .config import (
+        BUCKET_BRONZE, BUCKET_SILVER, BRONZE_SOURCE_PATTERNS, PARQUET_COMPRESSION, PARQUET_ROW_GROUP_SIZE,
+        QUANTILE_SKETCH_ALPHA, SILVER_CHUNK_ROWS, SILVER_FORMAT, SILVER_MODE, SILVER_SHARD_MIN_ROWS, SILVER_SHARDS,
+        bucket_exists, ensure_bucket, get_minio_client, get_task_runner
+    )
+    from .dates import parse_dates
+    from .engines import get_engine
+    from .key_index import KeyIndex
+    from .partitions import (
+        ENTITY_KEYS, PARTITIONED_ENTITIES, list_partition_objects, next_part_number, part_object_name, partition_prefix
+    )
+    from .results import purge_results, result_settings
+    from .schemas import (
+        SCHEMAS, compact_dtypes, memory_mb, read_table, serialize_table, silver_object_name, to_arrow_table,
+        to_bronze_name
+    )
+    from .sketches import QuantileSketch
+    from .state import load_state, save_state
+    from .validation import DUPLICATE_RULE, REASONS_COLUMN, ValidationReport, duplicate_keys, missing_values, validate
 except ImportError:
-    from config import BUCKET_BRONZE, BUCKET_SILVER, get_minio_client
+    from config import (
+        BUCKET_BRONZE, BUCKET_SILVER, BRONZE_SOURCE_PATTERNS, PARQUET_COMPRESSION, PARQUET_ROW_GROUP_SIZE,
+        QUANTILE_SKETCH_ALPHA, SILVER_CHUNK_ROWS, SILVER_FORMAT, SILVER_MODE, SILVER_SHARD_MIN_ROWS, SILVER_SHARDS,
+        bucket_exists, ensure_bucket, get_minio_client, get_task_runner
+    )
+    from dates import parse_dates
+    from engines import get_engine
+    from key_index import KeyIndex
+    from partitions import (
+        ENTITY_KEYS, PARTITIONED_ENTITIES, list_partition_objects, next_part_number, part_object_name, partition_prefix
+    )
+    from results import purge_results, result_settings
+    from schemas import (
+        SCHEMAS, compact_dtypes, memory_mb, read_table, serialize_table, silver_object_name, to_arrow_table,
+        to_bronze_name
+    )
+    from sketches import QuantileSketch
+    from state import load_state, save_state
+    from validation import DUPLICATE_RULE, REASONS_COLUMN, ValidationReport, duplicate_keys, missing_values, validate
+
+SILVER_STATE = "silver_state"
+# Préfixe des lignes rejetées par la validation, dans le bucket silver
+QUARANTINE_PREFIX = "_quarantine"
+
+CLIENTS_REQUIRED_COLUMNS = ['id_client', 'nom', 'email', 'date_inscription']
+ACHATS_REQUIRED_COLUMNS = ['id_achat', 'id_client', 'date_achat', 'montant']
 
 
 @task(name="read_from_bronze", retries=2)
 def read_from_bronze_layer(object_name: str) -> pd.DataFrame:
     """
-    Read CSV data from bronze bucket.
+    Read CSV or Parquet data from bronze bucket.
 
     Args:
         object_name: Name of object in MinIO bronze bucket
@@ -32,7 +83,7 @@ def read_from_bronze_layer(object_name: str) -> pd.DataFrame:
     logger = get_run_logger()
     client = get_minio_client()
 
-    if not client.bucket_exists(BUCKET_BRONZE):
+    if not bucket_exists(BUCKET_BRONZE):
         logger.error(f"Bucket {BUCKET_BRONZE} does not exist")
         raise ValueError(f"Bucket {BUCKET_BRONZE} does not exist")
 
@@ -41,39 +92,324 @@ def read_from_bronze_layer(object_name: str) -> pd.DataFrame:
     response.close()
     response.release_conn()
 
-    df = pd.read_csv(BytesIO(data))
-    logger.info(f"Read {object_name} from {BUCKET_BRONZE} ({len(df)} rows)")
+    if object_name.endswith('.parquet'):
+        df = pd.read_parquet(BytesIO(data))
+    else:
+        df = pd.read_csv(BytesIO(data))
+    logger.info(f"Read {object_name} from {BUCKET_BRONZE} ({len(df)} rows, {memory_mb(df):.2f} MB)")
     return df
 
 
+def discover_bronze_objects() -> dict[str, list[str]]:
+    """
+    List bronze objects of each entity: every part of partitioned entities,
+    objects matching the source patterns for the others.
+
+    Returns:
+        Sorted object names per entity
+    """
+    client = get_minio_client()
+    object_names = [obj.object_name for obj in client.list_objects(BUCKET_BRONZE)]
+    return {
+        entity: list_partition_objects(client, BUCKET_BRONZE, entity) if entity in PARTITIONED_ENTITIES
+        else sorted(name for name in object_names if any(fnmatch(name, to_bronze_name(pattern)) for pattern in patterns))
+        for entity, patterns in BRONZE_SOURCE_PATTERNS.items()
+    }
+
+
+@task(name="read_entity_from_bronze", retries=2)
+def read_entity_from_bronze(object_names: list[str]) -> pd.DataFrame:
+    """
+    Read and concatenate every bronze object of one entity.
+
+    Args:
+        object_names: Names of objects in MinIO bronze bucket
+
+    Returns:
+        DataFrame with the data of all objects
+    """
+    if not object_names:
+        raise ValueError("No bronze object to read")
+    frames = [read_from_bronze_layer(object_name) for object_name in object_names]
+    return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+
+def download_bronze_objects(object_names: list[str], tmp_dir: str) -> list[str]:
+    """
+    Download bronze objects to local files, once, so that several passes
+    can stream them without downloading them again.
+
+    Args:
+        object_names: Names of objects in MinIO bronze bucket, in order
+        tmp_dir: Local directory receiving the files
+
+    Returns:
+        Local paths, in the order of object_names
+    """
+    client = get_minio_client()
+    local_paths = []
+    for i, object_name in enumerate(object_names):
+        # Noms indexés : les parties de dates d'ingestion différentes partagent le même nom de fichier
+        local_path = os.path.join(tmp_dir, f"bronze-{i:05d}{os.path.splitext(object_name)[1]}")
+        client.fget_object(BUCKET_BRONZE, object_name, local_path)
+        local_paths.append(local_path)
+    return local_paths
+
+
+def iter_bronze_chunks(local_paths: list[str], chunk_rows: int, columns: list[str] | None = None):
+    """
+    Stream downloaded bronze objects as DataFrame blocks of at most
+    chunk_rows rows.
+
+    Args:
+        local_paths: Local copies of the bronze objects (see
+            download_bronze_objects), in order
+        chunk_rows: Maximum number of rows per block
+        columns: Optional subset of columns to read
+
+    Yields:
+        DataFrame blocks
+    """
+    for local_path in local_paths:
+        if local_path.endswith('.parquet'):
+            for batch in pq.ParquetFile(local_path).iter_batches(batch_size=chunk_rows, columns=columns):
+                yield batch.to_pandas()
+        else:
+            yield from pd.read_csv(local_path, chunksize=chunk_rows, usecols=columns)
+
+
+@task(name="transform_achats_chunked", retries=2)
+def transform_achats_chunked(object_names: list[str], object_name: str) -> str:
+    """
+    Transform achats out-of-core, SILVER_CHUNK_ROWS rows at a time, and
+    save the result to silver bucket.
+
+    The bronze objects are downloaded once to local files read by both
+    passes. A first pass reads only the columns needed by the outlier
+    filter and feeds valid amounts to a mergeable quantile sketch. Its q99 is within
+    QUANTILE_SKETCH_ALPHA relative error of the exact order statistic, so
+    the 2 x q99 threshold drifts by at most that ratio from the in-memory
+    path (rows with a montant within that margin of the threshold may be
+    kept or dropped differently). The second pass transforms each block
+    with this threshold, drops ids already kept by previous blocks and
+    appends the rows to a local file (one Parquet row group per block, or
+    CSV) uploaded once complete.
+
+    Args:
+        object_names: Names of achats objects in MinIO bronze bucket
+        object_name: Name of object in MinIO silver bucket
+
+    Returns:
+        Object name in silver layer
+    """
+    logger = get_run_logger()
+    ensure_bucket(BUCKET_SILVER)
+    seen_ids = KeyIndex()
+    rejected = []
+    rows = 0
+    header = True
+    schema = SCHEMAS["achats"]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Objets bronze téléchargés une seule fois, relus par les deux passes
+        bronze_paths = download_bronze_objects(object_names, tmp_dir)
+
+        sketch = QuantileSketch(alpha=QUANTILE_SKETCH_ALPHA)
+        for chunk in iter_bronze_chunks(bronze_paths, SILVER_CHUNK_ROWS, columns=ACHATS_REQUIRED_COLUMNS):
+            sketch.add(valid_montants(chunk))
+        q99 = sketch.quantile(0.99)
+        if q99 is not None:
+            logger.info(f"✓ Seuil aberrants achats (sketch, α={QUANTILE_SKETCH_ALPHA}): q99 ≈ {q99:,.2f} "
+                        f"sur {sketch.count} montants")
+
+        local_path = os.path.join(tmp_dir, os.path.basename(object_name))
+        parquet = object_name.endswith(".parquet")
+        with (pq.ParquetWriter(local_path, schema, compression=PARQUET_COMPRESSION) if parquet
+              else open(local_path, "w", encoding="utf-8", newline="")) as f:
+            for raw_chunk in iter_bronze_chunks(bronze_paths, SILVER_CHUNK_ROWS):
+                chunk = transform_achats_data(raw_chunk, q99=q99, rejected=rejected)
+
+                # Déduplication entre blocs : ids déjà conservés par un bloc précédent
+                seen = seen_ids.contains(chunk['id_achat'].to_numpy())
+                if seen.any():
+                    rejected.append(raw_chunk.loc[chunk.index[seen]].assign(**{REASONS_COLUMN: DUPLICATE_RULE}))
+                chunk = chunk[~seen]
+                seen_ids.add(chunk['id_achat'].to_numpy())
+
+                if parquet:
+                    f.write_table(to_arrow_table(chunk, schema), row_group_size=PARQUET_ROW_GROUP_SIZE)
+                else:
+                    chunk.to_csv(f, index=False, header=header)
+                    header = False
+                rows += len(chunk)
+
+        get_minio_client().fput_object(BUCKET_SILVER, object_name, local_path)
+
+    save_quarantine(rejected, "achats", replace=True)
+    logger.info(f"Saved {object_name} to {BUCKET_SILVER} ({rows} rows, out-of-core)")
+    return object_name
+
+
+def valid_montants(df: pd.DataFrame) -> np.ndarray:
+    """Amounts taken into account by the outlier threshold of transform_achats_data."""
+    montants = df.dropna(subset=ACHATS_REQUIRED_COLUMNS)['montant']
+    return montants[montants >= 0].to_numpy()
+
+
+@task(name="merge_into_silver", retries=2)
+def merge_into_silver_partitions(df: pd.DataFrame, entity: str) -> list[str]:
+    """
+    Write the new or changed rows of a transformed delta to a new silver
+    partition (entity/ingest_date=YYYY-MM-DD/part-N.<SILVER_FORMAT>).
+
+    Rows are compared by key and row hash to the persistent key index of
+    the entity (see KeyIndex): unchanged rows are dropped, changed rows are
+    written again and win over their previous version when partitions are
+    read in order. Only the keys of the delta are looked up and added, so
+    the cost of a merge does not grow with the size of silver.
+
+    Args:
+        df: Transformed delta (deduplicated on its key)
+        entity: Entity name
+
+    Returns:
+        Names of the written partition objects (empty if nothing changed)
+    """
+    logger = get_run_logger()
+    client = get_minio_client()
+    ensure_bucket(BUCKET_SILVER)
+    key = ENTITY_KEYS[entity]
+
+    index = KeyIndex.load(entity)
+    hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    found, index_hashes = index.lookup(df[key].to_numpy())
+    is_new = ~found
+    is_changed = found & (index_hashes != hashes)
+
+    delta = df[is_new | is_changed]
+    if delta.empty:
+        logger.info(f"✓ Fusion silver {entity}: aucune ligne nouvelle ou modifiée")
+        return []
+
+    prefix = partition_prefix(entity, date.today().isoformat())
+    part_name = part_object_name(prefix, next_part_number(client, BUCKET_SILVER, prefix), SILVER_FORMAT)
+    save_to_silver_layer.fn(delta, part_name, entity)
+
+    # Mise à jour de l'index : un segment avec le hash courant des clés nouvelles ou modifiées
+    index.add(delta[key].to_numpy(), hashes[is_new | is_changed])
+
+    logger.info(f"✓ Fusion silver {entity}: {int(is_new.sum())} nouvelles lignes, {int(is_changed.sum())} modifiées, "
+                f"{int(len(df) - is_new.sum() - is_changed.sum())} inchangées ignorées")
+    return [part_name]
+
+
+@task(name="upsert_silver", retries=2)
+def upsert_into_silver(df: pd.DataFrame, object_name: str, entity: str) -> str:
+    """
+    Upsert a transformed delta into a silver object keyed on the entity key
+    (used for clients, a small dimension kept as one object).
+
+    Args:
+        df: Transformed delta
+        object_name: Name of object in MinIO silver bucket
+        entity: Entity name
+
+    Returns:
+        Object name in silver layer
+    """
+    key = ENTITY_KEYS[entity]
+    client = get_minio_client()
+    ensure_bucket(BUCKET_SILVER)
+    try:
+        client.stat_object(BUCKET_SILVER, object_name)
+        existing = read_table(BUCKET_SILVER, object_name)
+    except S3Error as e:
+        if e.code != "NoSuchKey":
+            raise
+        existing = df.iloc[0:0]
+
+    merged = get_engine().drop_duplicates(pd.concat([existing, df], ignore_index=True), [key], keep='last')
+    return save_to_silver_layer.fn(compact_dtypes(merged), object_name, entity)
+
+
+def clear_silver_partitions(entity: str) -> None:
+    """Remove the incremental partitions, key index and state of a silver entity."""
+    client = get_minio_client()
+    for part_name in list_partition_objects(client, BUCKET_SILVER, entity):
+        client.remove_object(BUCKET_SILVER, part_name)
+    KeyIndex.clear(entity)
+    state = load_state(SILVER_STATE)
+    if state.pop(entity, None) is not None:
+        save_state(SILVER_STATE, state)
+
+
 @task(name="transform_to_silver", retries=2)
-def transform_to_silver_layer(df: pd.DataFrame, file_type: str = "clients") -> pd.DataFrame:
+def transform_to_silver_layer(df: pd.DataFrame, file_type: str = "clients", replace_quarantine: bool = True) -> pd.DataFrame:
     """
-    Transform data: clean, standardize, normalize, deduplicate.
+    Transform data: clean, standardize, normalize, deduplicate, and save
+    the rejected rows to the quarantine of the entity.
 
     Args:
         df: DataFrame to transform
         file_type: Type of file ('clients' or 'achats')
+        replace_quarantine: Replace the previous quarantine of the entity
+            (full rebuild) instead of adding a part to it
 
     Returns:
         Transformed DataFrame
     """
-    if file_type == "clients":
-        df = transform_clients_data(df)
-    elif file_type == "achats":
-        df = transform_achats_data(df)
-    
+    rejected = []
+    df = transform_entity(df, file_type, rejected=rejected)
+
+    save_quarantine(rejected, file_type, replace=replace_quarantine)
     return df
 
 
+def save_quarantine(rejected: list[pd.DataFrame], entity: str, replace: bool = False) -> str | None:
+    """
+    Save the rows rejected by the validation of an entity, with their
+    reasons, as a new part under _quarantine/<entity>/ingest_date=YYYY-MM-DD/
+    in the silver bucket.
+
+    Args:
+        rejected: Rejected rows, as collected by the transform functions
+        entity: Entity name
+        replace: Remove the previous parts of the entity first (full rebuild)
+
+    Returns:
+        Name of the written object (None if no row was rejected)
+    """
+    logger = get_run_logger()
+    client = get_minio_client()
+    ensure_bucket(BUCKET_SILVER)
+
+    if replace:
+        for part_name in list_partition_objects(client, BUCKET_SILVER, f"{QUARANTINE_PREFIX}/{entity}"):
+            client.remove_object(BUCKET_SILVER, part_name)
+
+    rejected = [frame for frame in rejected if not frame.empty]
+    if not rejected:
+        return None
+    df = pd.concat(rejected, ignore_index=True)
+
+    prefix = partition_prefix(f"{QUARANTINE_PREFIX}/{entity}", date.today().isoformat())
+    part_name = part_object_name(prefix, next_part_number(client, BUCKET_SILVER, prefix), SILVER_FORMAT)
+    quarantine_data = serialize_table(df, part_name)
+    client.put_object(BUCKET_SILVER, part_name, quarantine_data, length=quarantine_data.getbuffer().nbytes)
+    logger.info(f"Saved {part_name} to {BUCKET_SILVER} ({len(df)} rejected rows)")
+    return part_name
+
+
 @task(name="save_to_silver", retries=2)
-def save_to_silver_layer(df: pd.DataFrame, object_name: str) -> str:
+def save_to_silver_layer(df: pd.DataFrame, object_name: str, entity: str | None = None) -> str:
     """
-    Save transformed DataFrame to silver bucket.
+    Save transformed DataFrame to silver bucket, as Parquet with the
+    declared schema of the entity or as CSV, depending on the extension.
 
     Args:
         df: DataFrame to save
         object_name: Name of object in MinIO silver bucket
+        entity: Entity name, selecting the Parquet schema (inferred if None)
 
     Returns:
         Object name in silver layer
@@ -81,167 +417,389 @@ def save_to_silver_layer(df: pd.DataFrame, object_name: str) -> str:
     logger = get_run_logger()
     client = get_minio_client()
 
-    if not client.bucket_exists(BUCKET_SILVER):
-        client.make_bucket(BUCKET_SILVER)
+    ensure_bucket(BUCKET_SILVER)
 
-    silver_csv = BytesIO()
-    df.to_csv(silver_csv, index=False, encoding='utf-8')
-    silver_csv.seek(0)
+    silver_data = serialize_table(df, object_name, SCHEMAS.get(entity))
 
     client.put_object(
         BUCKET_SILVER,
         object_name,
-        silver_csv,
-        length=silver_csv.getbuffer().nbytes
+        silver_data,
+        length=silver_data.getbuffer().nbytes
     )
     logger.info(f"Saved {object_name} to {BUCKET_SILVER} ({len(df)} rows)")
     return object_name
 
 
-def transform_clients_data(df: pd.DataFrame) -> pd.DataFrame:
+def clients_rules(dates: pd.Series, now: pd.Timestamp) -> dict:
     """
-    Transform clients data: clean nulls and outliers, standardize dates, 
-    normalize data types, deduplicate records.
+    Validation rules of clients, in evaluation order (see validate).
+
+    Args:
+        dates: date_inscription parsed by the date codec
+        now: Upper bound of the dates
+    """
+    return {
+        'valeur_manquante': missing_values(CLIENTS_REQUIRED_COLUMNS),
+        'email_invalide': lambda df, valid: df['email'].notna() & ~df['email'].str.contains('@', na=False),
+        'date_invalide': lambda df, valid: dates.isna() & df['date_inscription'].notna(),
+        'date_future': lambda df, valid: dates > now,
+        DUPLICATE_RULE: duplicate_keys(['id_client']),
+    }
+
+
+def achats_rules(dates: pd.Series, now: pd.Timestamp, q99: float | None = None) -> dict:
+    """
+    Validation rules of achats, in evaluation order (see validate).
+
+    Args:
+        dates: date_achat parsed by the date codec
+        now: Upper bound of the dates (the lower bound is ten years before)
+        q99: 99th percentile of valid amounts (computed on the rows passing
+            the previous rules if None)
+    """
+    def outlier(df: pd.DataFrame, valid: np.ndarray) -> pd.Series:
+        threshold = df.loc[valid, 'montant'].quantile(0.99) if q99 is None else q99
+        return df['montant'] > threshold * 2
+
+    return {
+        'valeur_manquante': missing_values(ACHATS_REQUIRED_COLUMNS),
+        'montant_negatif': lambda df, valid: df['montant'] < 0,
+        'montant_aberrant': outlier,
+        'date_invalide': lambda df, valid: dates.isna() & df['date_achat'].notna(),
+        'date_future': lambda df, valid: dates > now,
+        'date_trop_ancienne': lambda df, valid: dates < now - pd.Timedelta(days=3650),
+        DUPLICATE_RULE: duplicate_keys(['id_achat']),
+    }
+
+
+# Types des colonnes silver, pour le journal de normalisation
+TYPES_INFO = {
+    "clients": "id_client(int), nom(string), email(string), date_inscription(date), pays(category)",
+    "achats": "id_achat(int), id_client(int), date_achat(date), montant(float), produit(category)",
+}
+
+
+def clean_clients_data(df: pd.DataFrame, now: pd.Timestamp) -> tuple[pd.DataFrame, ValidationReport]:
+    """
+    Validate raw clients in one pass (see clients_rules), keep the valid
+    rows and normalize their types. Does not log, so that it can run in
+    shard processes.
+
+    Args:
+        df: Raw clients data
+        now: Upper bound of the dates
+
+    Returns:
+        Tuple (valid rows, validation report of the raw rows)
+    """
+    dates = parse_dates(df['date_inscription'])
+    report = validate(df, clients_rules(dates, now))
+
+    valid = report.valid
+    df = df[valid]
+    df['date_inscription'] = dates[valid]
+    df['id_client'] = df['id_client'].astype('int64')
+    return df, report
+
+
+def clean_achats_data(df: pd.DataFrame, now: pd.Timestamp,
+                      q99: float | None = None) -> tuple[pd.DataFrame, ValidationReport]:
+    """
+    Validate raw achats in one pass (see achats_rules), keep the valid
+    rows and normalize their types. Does not log, so that it can run in
+    shard processes.
+
+    Args:
+        df: Raw achats data
+        now: Upper bound of the dates
+        q99: 99th percentile of valid amounts (computed on df if None)
+
+    Returns:
+        Tuple (valid rows, validation report of the raw rows)
+    """
+    dates = parse_dates(df['date_achat'])
+    report = validate(df, achats_rules(dates, now, q99))
+
+    valid = report.valid
+    df = df[valid]
+    df['date_achat'] = dates[valid]
+    df['id_achat'] = df['id_achat'].astype('int64')
+    df['id_client'] = df['id_client'].astype('int64')
+    df['montant'] = df['montant'].astype('float64')
+    return df, report
+
+
+def finalize_silver(entity: str, df: pd.DataFrame, initial_count: int, rejected_count: int,
+                    counts: dict[str, int]) -> pd.DataFrame:
+    """
+    Compact the dtypes of the cleaned rows of an entity and log its
+    validation, cleaning, type and deduplication summary.
+
+    Args:
+        entity: Entity name
+        df: Valid rows with normalized types
+        initial_count: Number of raw rows
+        rejected_count: Number of rows failing at least one rule
+        counts: Number of rows failing each rule
+
+    Returns:
+        DataFrame with compact dtypes
     """
     logger = get_run_logger()
-    initial_count = len(df)
-    dates_standardized = False
-    types_normalized = False
-
-    df = df.dropna(subset=['id_client', 'nom', 'email', 'date_inscription'])
-
-    df = df[df['email'].str.contains('@', na=False)]
-
-    if 'date_inscription' in df.columns:
-        df['date_inscription'] = pd.to_datetime(df['date_inscription'], errors='coerce')
-        df = df[df['date_inscription'] <= pd.Timestamp.now()]
-        df['date_inscription'] = df['date_inscription'].dt.strftime('%Y-%m-%d')
-        dates_standardized = True
-
-    if 'id_client' in df.columns:
-        df['id_client'] = df['id_client'].astype('int64')
-    if 'nom' in df.columns:
-        df['nom'] = df['nom'].astype('string')
-    if 'email' in df.columns:
-        df['email'] = df['email'].astype('string')
-    if 'date_inscription' in df.columns:
-        df['date_inscription'] = df['date_inscription'].astype('string')
-    if 'pays' in df.columns:
-        df['pays'] = df['pays'].astype('string')
-    types_normalized = True
-
-    before_dedup_count = len(df)
-    duplicates_count = df.duplicated(subset=['id_client']).sum()
-    df = df.drop_duplicates(subset=['id_client'], keep='first')
+    rules = ", ".join(f"{name}={count}" for name, count in counts.items())
+    logger.info(f"✓ Validation {entity}: {rejected_count} lignes rejetées ({rules})")
+
+    duplicates_count = counts[DUPLICATE_RULE]
     after_dedup_count = len(df)
+    before_dedup_count = after_dedup_count + duplicates_count
+
+    memory_before = memory_mb(df)
+    df = compact_dtypes(df)
 
     removed_count = initial_count - before_dedup_count
-    final_count = len(df)
 
     if removed_count > 0:
-        logger.info(f"✓ Nettoyage clients: {removed_count} lignes supprimées ({initial_count} → {before_dedup_count})")
+        logger.info(f"✓ Nettoyage {entity}: {removed_count} lignes supprimées ({initial_count} → {before_dedup_count})")
     else:
-        logger.info(f"✓ Nettoyage clients: Aucune ligne supprimée ({before_dedup_count} lignes valides)")
+        logger.info(f"✓ Nettoyage {entity}: Aucune ligne supprimée ({before_dedup_count} lignes valides)")
 
-    if dates_standardized:
-        logger.info(f"✓ Standardisation dates clients: Format unifié (YYYY-MM-DD)")
+    logger.info(f"✓ Standardisation dates {entity}: Format unifié (YYYY-MM-DD)")
 
-    if types_normalized:
-        types_info = "id_client(int), nom(string), email(string), date_inscription(string), pays(string)"
-        logger.info(f"✓ Normalisation types clients: {types_info}")
+    logger.info(f"✓ Normalisation types {entity}: {TYPES_INFO[entity]}")
+    logger.info(f"✓ Mémoire {entity}: {memory_before:.2f} MB → {memory_mb(df):.2f} MB")
 
     if duplicates_count > 0:
-        logger.info(f"✓ Déduplication clients: {duplicates_count} doublons supprimés ({before_dedup_count} → {after_dedup_count})")
+        logger.info(f"✓ Déduplication {entity}: {duplicates_count} doublons supprimés ({before_dedup_count} → {after_dedup_count})")
     else:
-        logger.info(f"✓ Déduplication clients: Aucun doublon détecté ({after_dedup_count} enregistrements uniques)")
+        logger.info(f"✓ Déduplication {entity}: Aucun doublon détecté ({after_dedup_count} enregistrements uniques)")
 
     return df
 
 
-def transform_achats_data(df: pd.DataFrame) -> pd.DataFrame:
+def transform_clients_data(df: pd.DataFrame, rejected: list | None = None) -> pd.DataFrame:
+    """
+    Transform clients data: clean nulls and outliers, standardize dates,
+    normalize data types, deduplicate records.
+
+    Every rule is evaluated in one pass over the raw rows (see
+    clients_rules), then the valid rows are selected once.
+
+    Args:
+        df: Raw clients data
+        rejected: List receiving the rejected rows with their reasons
+    """
+    cleaned, report = clean_clients_data(df, pd.Timestamp.now())
+    if rejected is not None:
+        rejected.append(report.rejected(df))
+    return finalize_silver("clients", cleaned, len(df), int((~report.valid).sum()), report.counts())
+
+
+def transform_achats_data(df: pd.DataFrame, q99: float | None = None, rejected: list | None = None) -> pd.DataFrame:
     """
     Transform achats data: clean nulls and outliers, standardize dates,
     normalize data types, deduplicate records.
+
+    The outlier threshold is 2 x the 99th percentile of valid amounts,
+    computed on df unless q99 is given (chunked mode). Every rule is
+    evaluated in one pass over the raw rows (see achats_rules), then the
+    valid rows are selected once.
+
+    Args:
+        df: Raw achats data
+        q99: 99th percentile of valid amounts
+        rejected: List receiving the rejected rows with their reasons
+    """
+    cleaned, report = clean_achats_data(df, pd.Timestamp.now(), q99)
+    if rejected is not None:
+        rejected.append(report.rejected(df))
+    return finalize_silver("achats", cleaned, len(df), int((~report.valid).sum()), report.counts())
+
+
+def clean_shard(entity: str, shard: pd.DataFrame, now: pd.Timestamp, q99: float | None) -> tuple:
+    """
+    Clean one shard of an entity in a worker process (see transform_sharded).
+
+    Returns:
+        Tuple (valid rows, rejected rows with their reasons, number of
+        rejected rows, number of rows failing each rule)
+    """
+    if entity == "clients":
+        cleaned, report = clean_clients_data(shard, now)
+    else:
+        cleaned, report = clean_achats_data(shard, now, q99)
+    return cleaned, report.rejected(shard), int((~report.valid).sum()), report.counts()
+
+
+def transform_sharded(df: pd.DataFrame, entity: str, shards: int = SILVER_SHARDS,
+                      q99: float | None = None, rejected: list | None = None) -> pd.DataFrame:
+    """
+    Transform an entity on several cores: rows are hash-partitioned on the
+    entity key into shards, cleaned by a pool of worker processes, then put
+    back in their original order.
+
+    The output is identical to the single-process transform. Every
+    duplicate of a key lands in the same shard, in its original order, so
+    keep-first deduplication is unchanged. The date bound and the outlier
+    threshold (q99 of the valid amounts of the whole frame) are computed
+    once and shared by the shards, and dtypes are compacted on the
+    reassembled frame.
+
+    Args:
+        df: Raw data of the entity
+        entity: Entity name ('clients' or 'achats')
+        shards: Number of shards and worker processes
+        q99: 99th percentile of valid amounts (achats, computed on df if None)
+        rejected: List receiving the rejected rows with their reasons
+
+    Returns:
+        Transformed DataFrame
     """
     logger = get_run_logger()
-    initial_count = len(df)
-    dates_standardized = False
-    types_normalized = False
-
-    df = df.dropna(subset=['id_achat', 'id_client', 'date_achat', 'montant'])
-
-    if 'montant' in df.columns:
-
-        df = df[df['montant'] >= 0]
-
-        q99 = df['montant'].quantile(0.99)
-        df = df[df['montant'] <= q99 * 2]
-
-    if 'date_achat' in df.columns:
-        df['date_achat'] = pd.to_datetime(df['date_achat'], errors='coerce')
-        df = df[df['date_achat'] <= pd.Timestamp.now()]
-        min_date = pd.Timestamp.now() - pd.Timedelta(days=3650)
-        df = df[df['date_achat'] >= min_date]
-        df['date_achat'] = df['date_achat'].dt.strftime('%Y-%m-%d')
-        dates_standardized = True
-
-    if 'id_achat' in df.columns:
-        df['id_achat'] = df['id_achat'].astype('int64')
-    if 'id_client' in df.columns:
-        df['id_client'] = df['id_client'].astype('int64')
-    if 'date_achat' in df.columns:
-        df['date_achat'] = df['date_achat'].astype('string')
-    if 'montant' in df.columns:
-        df['montant'] = df['montant'].astype('float64')
-    if 'produit' in df.columns:
-        df['produit'] = df['produit'].astype('string')
-    types_normalized = True
-
-    before_dedup_count = len(df)
-    duplicates_count = df.duplicated(subset=['id_achat']).sum()
-    df = df.drop_duplicates(subset=['id_achat'], keep='first')
-    after_dedup_count = len(df)
+    now = pd.Timestamp.now()
+    if entity == "achats" and q99 is None:
+        q99 = pd.Series(valid_montants(df)).quantile(0.99)
 
-    removed_count = initial_count - before_dedup_count
-    final_count = len(df)
+    shard_ids = pd.util.hash_array(df[ENTITY_KEYS[entity]].to_numpy()) % np.uint64(shards)
+    parts = [df[shard_ids == shard] for shard in range(shards)]
 
-    if removed_count > 0:
-        logger.info(f"✓ Nettoyage achats: {removed_count} lignes supprimées ({initial_count} → {before_dedup_count})")
+    # spawn : un fork copierait les verrous tenus par les threads de Prefect
+    with ProcessPoolExecutor(max_workers=shards, mp_context=multiprocessing.get_context("spawn")) as pool:
+        results = list(pool.map(clean_shard, [entity] * shards, parts, [now] * shards, [q99] * shards))
+    logger.info(f"✓ Transformation {entity} répartie sur {shards} processus ({len(df)} lignes)")
+
+    cleaned = pd.concat([result[0] for result in results]).sort_index(kind="stable")
+    if rejected is not None:
+        rejected.append(pd.concat([result[1] for result in results]).sort_index(kind="stable"))
+    rejected_count = sum(result[2] for result in results)
+    counts = {name: sum(result[3][name] for result in results) for name in results[0][3]}
+    return finalize_silver(entity, cleaned, len(df), rejected_count, counts)
+
+
+def transform_entity(df: pd.DataFrame, entity: str, q99: float | None = None,
+                     rejected: list | None = None) -> pd.DataFrame:
+    """
+    Transform the raw rows of an entity, in SILVER_SHARDS processes when
+    the frame holds at least SILVER_SHARD_MIN_ROWS rows, in the current
+    process otherwise.
+    """
+    if SILVER_SHARDS > 1 and len(df) >= SILVER_SHARD_MIN_ROWS:
+        return transform_sharded(df, entity, SILVER_SHARDS, q99=q99, rejected=rejected)
+    if entity == "clients":
+        return transform_clients_data(df, rejected=rejected)
+    return transform_achats_data(df, q99=q99, rejected=rejected)
+
+
+def silver_incremental(bronze_objects: dict) -> dict:
+    """
+    Incremental silver: transform only the bronze achats partitions not yet
+    processed and the changed clients objects, then merge them into silver.
+
+    The outlier threshold comes from a quantile sketch of every valid amount
+    seen so far, persisted in the silver state and merged with the delta.
+
+    Args:
+        bronze_objects: Bronze object names per entity (with 'changed' files)
+
+    Returns:
+        Dictionary with silver object names and new silver partitions
+    """
+    logger = get_run_logger()
+    state = load_state(SILVER_STATE)
+    achats_state = state.setdefault("achats", {"processed": []})
+
+    # Clients : seuls les objets bronze modifiés par l'ingestion sont relus
+    changed = bronze_objects.get("changed")
+    clients_objects = bronze_objects["clients"] if changed is None else [
+        name for name in bronze_objects["clients"] if name in {to_bronze_name(c) for c in changed}
+    ]
+    # La branche clients tourne sur le task runner pendant le traitement des achats
+    clients_upsert = None
+    if clients_objects:
+        clients_df = read_entity_from_bronze.submit(clients_objects)
+        transformed_clients = transform_to_silver_layer.submit(clients_df, file_type="clients", replace_quarantine=False)
+        clients_upsert = upsert_into_silver.submit(transformed_clients, silver_object_name("clients"), "clients")
     else:
-        logger.info(f"✓ Nettoyage achats: Aucune ligne supprimée ({before_dedup_count} lignes valides)")
+        logger.info("✓ Silver clients: aucun objet bronze modifié")
 
-    if dates_standardized:
-        logger.info(f"✓ Standardisation dates achats: Format unifié (YYYY-MM-DD)")
+    processed = set(achats_state["processed"])
+    new_bronze_parts = [name for name in bronze_objects["achats"] if name not in processed]
+    new_partitions = []
 
-    if types_normalized:
-        types_info = "id_achat(int), id_client(int), date_achat(string), montant(float), produit(string)"
-        logger.info(f"✓ Normalisation types achats: {types_info}")
+    if new_bronze_parts:
+        achats_df = read_entity_from_bronze(new_bronze_parts)
 
-    if duplicates_count > 0:
-        logger.info(f"✓ Déduplication achats: {duplicates_count} doublons supprimés ({before_dedup_count} → {after_dedup_count})")
+        sketch = QuantileSketch.from_dict(achats_state["montant_sketch"]) if "montant_sketch" in achats_state \
+            else QuantileSketch(alpha=QUANTILE_SKETCH_ALPHA)
+        sketch.add(valid_montants(achats_df))
+
+        rejected = []
+        transformed_achats = transform_entity(achats_df, "achats", q99=sketch.quantile(0.99), rejected=rejected)
+        save_quarantine(rejected, "achats")
+        new_partitions = merge_into_silver_partitions(transformed_achats, "achats")
+
+        achats_state["processed"] = sorted(processed | set(new_bronze_parts))
+        achats_state["montant_sketch"] = sketch.to_dict()
+        save_state(SILVER_STATE, state)
     else:
-        logger.info(f"✓ Déduplication achats: Aucun doublon détecté ({after_dedup_count} enregistrements uniques)")
+        logger.info("✓ Silver achats: aucune nouvelle partition bronze")
 
-    return df
+    if clients_upsert is not None:
+        clients_upsert.result()
+
+    logger.info(f"✓ SILVER INCRÉMENTAL: {len(new_bronze_parts)} partitions bronze traitées, "
+                f"{len(new_partitions)} partitions silver écrites")
+
+    return {
+        "clients": silver_object_name("clients"),
+        "achats": list_partition_objects(get_minio_client(), BUCKET_SILVER, "achats"),
+        "new_partitions": {"achats": new_partitions}
+    }
 
 
-@flow(name="Silver Transformation Flow")
-def silver_ingestion_flow() -> dict:
+@flow(name="Silver Transformation Flow", task_runner=get_task_runner(), **result_settings())
+def silver_ingestion_flow(bronze_objects: dict | None = None, incremental: bool | None = None) -> dict:
     """
     Main flow: Read data from bronze, transform it, and save to silver layer.
 
+    The clients and achats branches are independent: they are submitted
+    to the task runner and run concurrently.
+
+    Args:
+        bronze_objects: Bronze object names per entity, as returned by the
+            bronze flow (discovered in the bronze bucket if omitted)
+        incremental: Process only new bronze partitions (defaults to
+            SILVER_MODE == 'incremental')
+
     Returns:
         Dictionary with transformed file names
     """
     logger = get_run_logger()
-    clients_df = read_from_bronze_layer("clients.csv")
-    achats_df = read_from_bronze_layer("achats.csv")
+    purge_results()
+    if bronze_objects is None:
+        bronze_objects = discover_bronze_objects()
+    if incremental is None:
+        incremental = SILVER_MODE == "incremental"
+
+    if incremental:
+        return silver_incremental(bronze_objects)
+
+    clients_df = read_entity_from_bronze.submit(bronze_objects["clients"])
+    transformed_clients = transform_to_silver_layer.submit(clients_df, file_type="clients")
+    silver_clients = save_to_silver_layer.submit(transformed_clients, silver_object_name("clients"), "clients")
+
+    if SILVER_CHUNK_ROWS > 0:
+        # Mode out-of-core : les achats ne sont jamais chargés en entier
+        silver_achats = transform_achats_chunked.submit(bronze_objects["achats"], silver_object_name("achats"))
+    else:
+        achats_df = read_entity_from_bronze.submit(bronze_objects["achats"])
+        transformed_achats = transform_to_silver_layer.submit(achats_df, file_type="achats")
+        silver_achats = save_to_silver_layer.submit(transformed_achats, silver_object_name("achats"), "achats")
 
-    transformed_clients = transform_to_silver_layer(clients_df, file_type="clients")
-    transformed_achats = transform_to_silver_layer(achats_df, file_type="achats")
+    silver_clients, silver_achats = silver_clients.result(), silver_achats.result()
 
-    silver_clients = save_to_silver_layer(transformed_clients, "clients.csv")
-    silver_achats = save_to_silver_layer(transformed_achats, "achats.csv")
+    # Une reconstruction complète remplace les partitions incrémentales
+    clear_silver_partitions("achats")
 
     logger.info("="*50)
     logger.info("✓ SILVER TRANSFORMATION TERMINÉE AVEC SUCCÈS")
@@ -0,0 +1,237 @@
+import base64
+import math
+import zlib
+
+import numpy as np
+import pandas as pd
+
+
+class QuantileSketch:
+    """
+    Mergeable streaming quantile sketch with relative-error guarantee
+    (DDSketch: logarithmic buckets of ratio gamma = (1 + alpha) / (1 - alpha)).
+
+    For any q, quantile(q) returns a value within a relative error alpha of
+    the exact order statistic of rank floor(q * (n - 1)): with alpha=0.01 an
+    estimated q99 of 1000 means the exact one lies in [990, 1010]. Merging
+    two sketches with the same alpha is exact, so partial sketches built
+    per chunk or per partition combine without any loss of accuracy.
+    """
+
+    def __init__(self, alpha: float = 0.01, min_value: float = 1e-9):
+        self.alpha = alpha
+        self.min_value = min_value
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self.log_gamma = math.log(self.gamma)
+        self.positive = {}
+        self.negative = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def _add_to_store(self, store: dict, values: np.ndarray, sign: int = 1) -> None:
+        indexes = np.ceil(np.log(values) / self.log_gamma).astype(np.int64)
+        buckets, counts = np.unique(indexes, return_counts=True)
+        for bucket, bucket_count in zip(buckets.tolist(), counts.tolist()):
+            store[bucket] = store.get(bucket, 0) + sign * bucket_count
+            if store[bucket] <= 0:
+                del store[bucket]
+
+    def add(self, values, sign: int = 1) -> "QuantileSketch":
+        """Add a batch of values (NaN are ignored), or remove it with sign=-1."""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return self
+
+        self._add_to_store(self.positive, values[values > self.min_value], sign)
+        self._add_to_store(self.negative, -values[values < -self.min_value], sign)
+        self.zero_count += sign * int(np.count_nonzero(np.abs(values) <= self.min_value))
+        self.count += sign * int(values.size)
+        return self
+
+    def remove(self, values) -> "QuantileSketch":
+        """
+        Remove a batch of values previously added (the sketch is then the
+        one of the remaining values, with the same error guarantee).
+        """
+        return self.add(values, sign=-1)
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        """Merge another sketch built with the same alpha into this one."""
+        if other.alpha != self.alpha:
+            raise ValueError("Cannot merge sketches with different alpha")
+        for store, other_store in ((self.positive, other.positive), (self.negative, other.negative)):
+            for bucket, bucket_count in other_store.items():
+                store[bucket] = store.get(bucket, 0) + bucket_count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        return self
+
+    def _bucket_value(self, bucket: int) -> float:
+        return 2 * self.gamma ** bucket / (self.gamma + 1)
+
+    def quantile(self, q: float) -> float | None:
+        """Estimate the q-quantile (0 <= q <= 1), None if the sketch is empty."""
+        if self.count == 0:
+            return None
+
+        rank = math.floor(q * (self.count - 1))
+        seen = 0
+        for bucket in sorted(self.negative, reverse=True):
+            seen += self.negative[bucket]
+            if seen > rank:
+                return -self._bucket_value(bucket)
+        seen += self.zero_count
+        if seen > rank:
+            return 0.0
+        for bucket in sorted(self.positive):
+            seen += self.positive[bucket]
+            if seen > rank:
+                return self._bucket_value(bucket)
+        return self._bucket_value(max(self.positive))
+
+    def to_dict(self) -> dict:
+        return {
+            "alpha": self.alpha,
+            "min_value": self.min_value,
+            "positive": {str(k): v for k, v in self.positive.items()},
+            "negative": {str(k): v for k, v in self.negative.items()},
+            "zero_count": self.zero_count,
+            "count": self.count,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "QuantileSketch":
+        sketch = cls(alpha=data["alpha"], min_value=data["min_value"])
+        sketch.positive = {int(k): v for k, v in data["positive"].items()}
+        sketch.negative = {int(k): v for k, v in data["negative"].items()}
+        sketch.zero_count = data["zero_count"]
+        sketch.count = data["count"]
+        return sketch
+
+
+class HyperLogLog:
+    """
+    Mergeable distinct-count sketch (HyperLogLog, 2^precision one-byte
+    registers fed by a 64-bit hash).
+
+    The relative standard error of count() is about 1.04 / sqrt(2^precision):
+    1 % with precision 14 (16 KB of registers). Merging takes the maximum of
+    each register, which is exactly the sketch of the union: sketches built
+    per day, per partition or per run combine into the distinct count of
+    any window without rescanning the rows. Serialized as a compact string
+    (zlib-compressed registers in base64) storable in a table column.
+    """
+
+    def __init__(self, precision: int = 14, registers: np.ndarray | None = None):
+        if not 4 <= precision <= 18:
+            raise ValueError(f"HyperLogLog precision must be between 4 and 18, got {precision}")
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8) if registers is None else registers
+
+    @staticmethod
+    def precision_for(error: float) -> int:
+        """Smallest precision whose relative standard error is at most error."""
+        return max(4, math.ceil(2 * math.log2(1.04 / error)))
+
+    @classmethod
+    def for_error(cls, error: float) -> "HyperLogLog":
+        return cls(cls.precision_for(error))
+
+    @staticmethod
+    def _hash(values) -> np.ndarray:
+        values = np.asarray(values)
+        if values.dtype.kind in "iub":
+            # Même hash pour un id quel que soit la largeur de son type entier
+            values = values.astype(np.int64)
+        return pd.util.hash_array(values)
+
+    @staticmethod
+    def _index_and_rank(hashes: np.ndarray, precision: int) -> tuple[np.ndarray, np.ndarray]:
+        index = (hashes >> np.uint64(64 - precision)).astype(np.int64)
+        rest = hashes & np.uint64((1 << (64 - precision)) - 1)
+        # Longueur en bits de rest, calculée exactement sur ses deux moitiés de 32 bits
+        high = np.frexp((rest >> np.uint64(32)).astype(np.float64))[1]
+        low = np.frexp((rest & np.uint64(0xFFFFFFFF)).astype(np.float64))[1]
+        bit_length = np.where(high > 0, high + 32, low)
+        rank = (64 - precision) - bit_length + 1
+        return index, rank.astype(np.uint8)
+
+    def add(self, values) -> "HyperLogLog":
+        """Add a batch of values (hashed, so any hashable dtype works)."""
+        if len(values) == 0:
+            return self
+        index, rank = self._index_and_rank(self._hash(values), self.precision)
+        np.maximum.at(self.registers, index, rank)
+        return self
+
+    @classmethod
+    def group_registers(cls, codes: np.ndarray, n_groups: int, values, precision: int) -> np.ndarray:
+        """
+        Build the registers of one sketch per group in a single vectorized
+        pass.
+
+        Args:
+            codes: Group of each value, in [0, n_groups)
+            n_groups: Number of groups
+            values: Values to count
+            precision: Precision of the sketches
+
+        Returns:
+            uint8 array of shape (n_groups, 2^precision)
+        """
+        registers = np.zeros((n_groups, 1 << precision), dtype=np.uint8)
+        if len(codes) == 0:
+            return registers
+        index, rank = cls._index_and_rank(cls._hash(values), precision)
+        cells = np.asarray(codes, dtype=np.int64) * (1 << precision) + index
+        maxima = pd.Series(rank).groupby(cells).max()
+        registers.ravel()[maxima.index.to_numpy()] = maxima.to_numpy()
+        return registers
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        """Merge another sketch with the same precision into this one."""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches with different precisions")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    @staticmethod
+    def estimate(registers: np.ndarray) -> np.ndarray:
+        """Distinct counts of a (n, 2^precision) array of registers, one per row."""
+        registers = np.atleast_2d(registers)
+        m = registers.shape[1]
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -registers.astype(np.int64)), axis=1)
+        zeros = np.count_nonzero(registers == 0, axis=1)
+        # Petites cardinalités : comptage linéaire sur les registres vides
+        linear = m * np.log(m / np.maximum(zeros, 1))
+        return np.where((raw <= 2.5 * m) & (zeros > 0), linear, raw)
+
+    def count(self) -> int:
+        """Estimated number of distinct values added."""
+        return int(round(float(self.estimate(self.registers)[0])))
+
+    @staticmethod
+    def encode(registers: np.ndarray) -> str:
+        """Serialize registers to a compact string."""
+        return base64.b64encode(zlib.compress(np.ascontiguousarray(registers, dtype=np.uint8).tobytes())).decode("ascii")
+
+    def to_string(self) -> str:
+        return self.encode(self.registers)
+
+    @classmethod
+    def from_string(cls, data: str) -> "HyperLogLog":
+        registers = np.frombuffer(zlib.decompress(base64.b64decode(data)), dtype=np.uint8).copy()
+        return cls(int(math.log2(len(registers))), registers)
+
+    @classmethod
+    def merge_all(cls, sketches) -> "HyperLogLog":
+        """Merge serialized sketches (e.g. a sketch column over a date range)."""
+        merged = None
+        for data in sketches:
+            sketch = cls.from_string(data)
+            merged = sketch if merged is None else merged.merge(sketch)
+        if merged is None:
+            raise ValueError("No sketch to merge")
+        return merged
@@ -0,0 +1,46 @@
+import json
+import os
+from pathlib import Path
+
+# Gestion des imports pour fonctionner depuis flows/ ou depuis la racine
+try:
+    from .config import PIPELINE_STATE_DIR
+except ImportError:
+    from config import PIPELINE_STATE_DIR
+
+
+def get_state_path(name: str) -> Path:
+    return Path(PIPELINE_STATE_DIR) / f"{name}.json"
+
+
+def load_state(name: str) -> dict:
+    """
+    Load a persisted pipeline state document.
+
+    Args:
+        name: Name of the state document (e.g. 'bronze_manifest')
+
+    Returns:
+        State dictionary, empty if it was never saved
+    """
+    path = get_state_path(name)
+    if not path.exists():
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(name: str, state: dict) -> None:
+    """
+    Persist a pipeline state document atomically.
+
+    Args:
+        name: Name of the state document
+        state: JSON-serializable dictionary
+    """
+    path = get_state_path(name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+
+# Gestion des imports pour fonctionner depuis flows/ ou depuis la racine
+try:
+    from .engines import get_engine
+except ImportError:
+    from engines import get_engine
+
+# Colonne des motifs de rejet dans les lignes mises en quarantaine
+REASONS_COLUMN = "motifs_rejet"
+# Règle de déduplication, évaluée sur les lignes valides pour toutes les autres règles
+DUPLICATE_RULE = "doublon"
+
+
+def missing_values(columns: list[str]):
+    """Rule failing the rows with a missing value in one of the columns."""
+    return lambda df, valid: get_engine().null_mask(df, columns)
+
+
+def duplicate_keys(columns: list[str]):
+    """Rule failing the rows whose key was already seen on a previous valid row."""
+    def check(df: pd.DataFrame, valid: np.ndarray) -> np.ndarray:
+        fails = np.zeros(len(df), dtype=bool)
+        fails[valid] = get_engine().duplicated(df.loc[valid, columns], columns, keep='first')
+        return fails
+    return check
+
+
+class ValidationReport:
+    """
+    Result of a validation: one bitmask per row, bit i set when the row
+    fails the i-th rule.
+    """
+
+    def __init__(self, rules: list[str], bitmask: np.ndarray):
+        self.rules = rules
+        self.bitmask = bitmask
+
+    @property
+    def valid(self) -> np.ndarray:
+        """Mask of the rows passing every rule."""
+        return self.bitmask == 0
+
+    def counts(self) -> dict[str, int]:
+        """Number of rows failing each rule (a row may fail several)."""
+        return {name: int(np.count_nonzero(self.bitmask & (1 << bit))) for bit, name in enumerate(self.rules)}
+
+    def reasons(self) -> np.ndarray:
+        """Comma-separated names of the failed rules of each row ('' when valid)."""
+        # Peu de combinaisons distinctes : les libellés sont construits une fois par combinaison
+        codes, uniques = pd.factorize(self.bitmask)
+        labels = np.array([
+            ",".join(name for bit, name in enumerate(self.rules) if value & (1 << bit)) for value in uniques
+        ], dtype=object)
+        return labels[codes]
+
+    def rejected(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Rows of df failing at least one rule, with their reasons."""
+        invalid = ~self.valid
+        return df[invalid].assign(**{REASONS_COLUMN: self.reasons()[invalid]})
+
+
+def validate(df: pd.DataFrame, rules: dict) -> ValidationReport:
+    """
+    Evaluate every rule on the whole DataFrame in one pass, without
+    filtering it: each rule returns the mask of its failing rows, recorded
+    as one bit of a per-row bitmask.
+
+    Args:
+        df: DataFrame to validate
+        rules: Rule name -> check(df, valid) returning the mask of failing
+            rows, in evaluation order. valid is the mask of the rows passing
+            the previous rules, for rules depending on them (a threshold
+            computed on valid rows, duplicates among valid rows)
+
+    Returns:
+        ValidationReport of the rows of df
+    """
+    if len(rules) > 32:
+        raise ValueError(f"At most 32 validation rules are supported, got {len(rules)}")
+    bitmask = np.zeros(len(df), dtype=np.uint32)
+    for bit, check in enumerate(rules.values()):
+        fails = np.asarray(check(df, bitmask == 0), dtype=bool)
+        bitmask[fails] |= np.uint32(1 << bit)
+    return ValidationReport(list(rules), bitmask)
@@ -0,0 +1,95 @@
+"""
+Benchmark des modes de copie sources -> bronze (server, stream, memory).
+
+Génère un fichier CSV synthétique de la taille demandée, l'uploade dans le
+bucket sources puis mesure, pour chaque mode de `copy_to_bronze_layer`,
+la durée, le débit et le pic de mémoire Python (tracemalloc).
+
+Usage:
+    python script/benchmark_bronze_copy.py --size-mb 512
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from flows.bronze_ingestion import copy_to_bronze_layer
+from flows.config import BUCKET_SOURCES, get_minio_client
+
+MODES = ["memory", "stream", "server"]
+
+
+def generate_file(path: str, size_mb: int) -> int:
+    """
+    Write a synthetic achats-like CSV file of roughly size_mb megabytes.
+
+    Args:
+        path: Output file path
+        size_mb: Target size in megabytes
+
+    Returns:
+        Size of the generated file in bytes
+    """
+    target = size_mb * 1024 * 1024
+    line_id = 1
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("id_achat,id_client,date_achat,montant,produit\n")
+        while f.tell() < target:
+            f.writelines(
+                f"{i},{i % 1500 + 1},2025-01-{i % 28 + 1:02d},{i % 997 + 0.99},Laptop\n"
+                for i in range(line_id, line_id + 100_000)
+            )
+            line_id += 100_000
+    return os.path.getsize(path)
+
+
+def run_mode(object_name: str, mode: str) -> tuple[float, int]:
+    """
+    Run one copy mode outside of Prefect and measure it.
+
+    Args:
+        object_name: Object to copy from sources to bronze
+        mode: Copy mode passed to copy_to_bronze_layer
+
+    Returns:
+        Tuple (duration in seconds, peak traced memory in bytes)
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    copy_to_bronze_layer.fn(object_name, mode=mode)
+    duration = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return duration, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=256)
+    parser.add_argument("--object-name", default="benchmark_achats.csv")
+    args = parser.parse_args()
+
+    client = get_minio_client()
+    if not client.bucket_exists(BUCKET_SOURCES):
+        client.make_bucket(BUCKET_SOURCES)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, args.object_name)
+        size = generate_file(path, args.size_mb)
+        client.fput_object(BUCKET_SOURCES, args.object_name, path)
+
+    size_mb = size / (1024 * 1024)
+    print(f"Fichier: {args.object_name} ({size_mb:.1f} MB)")
+    print(f"{'mode':<8} {'durée (s)':>10} {'MB/s':>10} {'pic mémoire (MB)':>18}")
+    for mode in MODES:
+        duration, peak = run_mode(args.object_name, mode)
+        print(f"{mode:<8} {duration:>10.2f} {size_mb / duration:>10.1f} {peak / (1024 * 1024):>18.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark de la jointure clients/achats de la couche gold.
+
+Génère une dimension clients (identifiants denses) et des achats
+synthétiques, puis mesure pour chaque volume d'achats la durée et le pic
+de mémoire Python (tracemalloc) de la jointure générale (`left_join`,
+merge pandas) et de la jointure par recherche de dimension
+(`lookup_join`), avec toutes les colonnes clients puis avec les seules
+colonnes lues par les agrégats gold (FACT_CLIENT_COLUMNS). Les résultats
+sont comparés à ceux du merge.
+
+Usage:
+    python script/benchmark_gold_join.py --rows 1000000,10000000,50000000
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from flows.engines import get_engine
+from flows.gold_agregation import FACT_CLIENT_COLUMNS
+
+COUNTRIES = ["France", "Germany", "Spain", "Italy", "Belgium", "Switzerland", "Portugal", "Netherlands"]
+PRODUCTS = ["Laptop", "Phone", "Tablet", "Monitor", "Keyboard", "Mouse", "Headphones", "Webcam"]
+
+
+def generate_clients(n_clients: int, rng: np.random.Generator) -> pd.DataFrame:
+    """Synthetic silver clients with ids 1..n_clients."""
+    return pd.DataFrame({
+        "id_client": np.arange(1, n_clients + 1, dtype=np.int64),
+        "nom": pd.Series([f"Client {i}" for i in range(1, n_clients + 1)], dtype="str"),
+        "email": pd.Series([f"client{i}@example.com" for i in range(1, n_clients + 1)], dtype="str"),
+        "date_inscription": pd.to_datetime("2020-01-01") + pd.to_timedelta(rng.integers(0, 1500, n_clients), unit="D"),
+        "pays": pd.Categorical(rng.choice(COUNTRIES, n_clients)),
+    })
+
+
+def generate_achats(n_rows: int, n_clients: int, rng: np.random.Generator) -> pd.DataFrame:
+    """Synthetic silver achats referencing the clients."""
+    return pd.DataFrame({
+        "id_achat": np.arange(1, n_rows + 1, dtype=np.int64),
+        "id_client": rng.integers(1, n_clients + 1, n_rows),
+        "date_achat": pd.to_datetime("2024-01-01") + pd.to_timedelta(rng.integers(0, 365, n_rows), unit="D"),
+        "montant": rng.uniform(1, 1000, n_rows).round(2),
+        "produit": pd.Categorical.from_codes(rng.integers(0, len(PRODUCTS), n_rows), PRODUCTS),
+    })
+
+
+def measure(join, *args, **kwargs) -> tuple[pd.DataFrame, float, int]:
+    """
+    Run a join and measure it.
+
+    Returns:
+        Tuple (joined DataFrame, duration in seconds, peak traced memory in bytes)
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    joined = join(*args, **kwargs)
+    duration = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return joined, duration, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", default="1000000,10000000,50000000")
+    parser.add_argument("--clients", type=int, default=100_000)
+    parser.add_argument("--engine", default=None)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    engine = get_engine(args.engine)
+    rng = np.random.default_rng(args.seed)
+    clients = generate_clients(args.clients, rng)
+    suffixes = ("", "_client")
+
+    print(f"Moteur: {engine.name}, {args.clients} clients")
+    print(f"{'achats':>12} {'jointure':<20} {'durée (s)':>10} {'pic mémoire (MB)':>18} {'identique':>10}")
+    for n_rows in (int(value) for value in args.rows.split(",")):
+        achats = generate_achats(n_rows, args.clients, rng)
+        expected, duration, peak = measure(engine.left_join, achats, clients, on="id_client", suffixes=suffixes)
+        print(f"{n_rows:>12,} {'merge':<20} {duration:>10.2f} {peak / (1024 * 1024):>18.1f} {'-':>10}")
+
+        for label, columns in (("lookup", None), ("lookup (colonnes)", FACT_CLIENT_COLUMNS)):
+            joined, duration, peak = measure(
+                engine.lookup_join, achats, clients, on="id_client", columns=columns, suffixes=suffixes
+            )
+            identical = joined.equals(expected[joined.columns.tolist()])
+            print(f"{n_rows:>12,} {label:<20} {duration:>10.2f} {peak / (1024 * 1024):>18.1f} {str(identical):>10}")
+            del joined
+        del achats, expected
+
+
+if __name__ == "__main__":
+    main()
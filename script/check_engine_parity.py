@@ -0,0 +1,136 @@
+"""
+Vérification de parité des moteurs de DataFrame (DATAFRAME_ENGINE).
+
+Exécute les étapes silver (nettoyage, déduplication) et gold (jointure,
+KPIs, dimensions, agrégations temporelles, CA par pays) sur les fichiers
+sources avec chaque moteur, sans MinIO ni serveur Prefect (fonctions des
+tâches appelées directement, loggers de run désactivés), puis compare les
+tables obtenues à celles du moteur pandas : colonnes, ordre des lignes et
+types à l'identique, valeurs exactes sauf pour les flottants, comparés
+avec une tolérance relative (l'ordre de sommation diffère entre moteurs).
+Les jointures sont aussi comparées avec des clés id_client de largeurs
+différentes de chaque côté (int16 / int64), comme après compact_dtypes.
+Toute différence lève une AssertionError (code de sortie 1).
+
+Usage:
+    python script/check_engine_parity.py --data-dir data/sources
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+from prefect.logging import disable_run_logger
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from flows.engines import ENGINES, get_engine, set_default_engine
+from flows.gold_agregation import (
+    calculate_ca_by_country, calculate_kpis, calculate_temporal_aggregations, create_dimension_tables,
+    join_clients_and_achats
+)
+from flows.silver_transformation import transform_achats_data, transform_clients_data
+
+
+def run_engine(clients_source: pd.DataFrame, achats_source: pd.DataFrame) -> dict[str, pd.DataFrame]:
+    """
+    Run the silver and gold steps with the current default engine.
+
+    Args:
+        clients_source: Raw clients data
+        achats_source: Raw achats data
+
+    Returns:
+        Tables produced by each step, by name
+    """
+    clients = transform_clients_data(clients_source.copy())
+    achats = transform_achats_data(achats_source.copy())
+    fact_table = join_clients_and_achats.fn(clients, achats)
+
+    tables = {"silver_clients": clients, "silver_achats": achats}
+    tables["kpis"] = calculate_kpis.fn(fact_table)
+    tables.update(create_dimension_tables.fn(clients, fact_table))
+    tables.update(calculate_temporal_aggregations.fn(fact_table))
+    tables["ca_par_pays"] = calculate_ca_by_country.fn(fact_table)
+    tables["fact_achats"] = fact_table
+    tables.update(run_mixed_width_joins(clients, achats))
+    return tables
+
+
+def run_mixed_width_joins(clients: pd.DataFrame, achats: pd.DataFrame) -> dict[str, pd.DataFrame]:
+    """
+    Join achats to clients with id_client keys of different widths on
+    each side (narrowest integer type on one side, int64 on the other),
+    as compact_dtypes leaves them when the ids of the two tables span
+    different ranges.
+
+    Args:
+        clients: Silver clients
+        achats: Silver achats
+
+    Returns:
+        Joined tables, by name
+    """
+    engine = get_engine()
+    narrow_clients = clients.assign(id_client=pd.to_numeric(clients["id_client"], downcast="integer"))
+    narrow_achats = achats.assign(id_client=pd.to_numeric(achats["id_client"], downcast="integer"))
+    wide_clients = clients.assign(id_client=clients["id_client"].astype("int64"))
+    wide_achats = achats.assign(id_client=achats["id_client"].astype("int64"))
+    return {
+        "join_cles_int64_int_court": engine.left_join(wide_achats, narrow_clients[["id_client", "pays"]], on="id_client"),
+        "join_cles_int_court_int64": engine.left_join(narrow_achats, wide_clients[["id_client", "pays"]], on="id_client"),
+    }
+
+
+def check_engine_parity(clients_source: pd.DataFrame, achats_source: pd.DataFrame, rtol: float = 1e-9) -> None:
+    """
+    Run the steps with every engine and compare their tables to those of
+    the pandas engine.
+
+    Args:
+        clients_source: Raw clients data
+        achats_source: Raw achats data
+        rtol: Relative tolerance of the floating point columns
+
+    Raises:
+        AssertionError: If a table of an engine differs from the pandas one
+    """
+    results = {}
+    with disable_run_logger():
+        for name in ENGINES:
+            set_default_engine(name)
+            start = time.perf_counter()
+            results[name] = run_engine(clients_source, achats_source)
+            print(f"Moteur {name}: {time.perf_counter() - start:.2f}s")
+
+    reference = results.pop("pandas")
+    differences = []
+    for name, tables in results.items():
+        for table_name, expected in reference.items():
+            try:
+                pd.testing.assert_frame_equal(tables[table_name], expected, check_exact=False, rtol=rtol, atol=0)
+                print(f"  ✓ {name} / {table_name}: identique ({len(expected)} lignes)")
+            except AssertionError as e:
+                differences.append(f"{name} / {table_name}")
+                print(f"  ✗ {name} / {table_name}: différent\n{e}")
+    assert not differences, f"Tables différentes du moteur pandas: {', '.join(differences)}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-dir", default="./data/sources")
+    parser.add_argument("--rtol", type=float, default=1e-9)
+    args = parser.parse_args()
+
+    clients_source = pd.read_csv(Path(args.data_dir) / "clients.csv")
+    achats_source = pd.read_csv(Path(args.data_dir) / "achats.csv")
+    try:
+        check_engine_parity(clients_source, achats_source, args.rtol)
+    except AssertionError as e:
+        print(e)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()